@@ -0,0 +1,253 @@
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator
+import math
+import threading
+import time
+
+from tracing import DURATION_BUCKETS, METRICS_PREFIX
+
+# Полосы приоритета в порядке обслуживания: интерактивные запросы обслуживаются раньше пакетных
+LANES = ('interactive', 'batch')
+
+# Коэффициент сглаживания среднего времени обработки запроса
+_SERVICE_TIME_SMOOTHING = 0.2
+
+# Максимальное количество клиентов, для которых хранятся ограничители частоты
+_MAX_CLIENT_BUCKETS = 4096
+
+# Отказ в приеме запроса: HTTP-статус, причина и рекомендуемое время повтора, сек.
+class AdmissionRejected(Exception):
+    def __init__(self, status: int, reason: str, message: str, retry_after: float):
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+# Ограничитель частоты запросов (token bucket): rate запросов в секунду, не более burst подряд
+class TokenBucket():
+    def __init__(self, rate: float, burst: float):
+        self._rate = rate
+        self._burst = max(1.0, burst)
+        self._tokens = self._burst
+        self._updated = time.monotonic()
+
+    # Пополнение запаса на текущий момент
+    # Момент проверки может предшествовать созданию ограничителя: время назад не уменьшает запас
+    def _refill(self, now: float):
+        if now > self._updated:
+            self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+
+    # Получение разрешения, возвращает 0 или время до появления разрешения, сек.
+    def take(self, now: float) -> float:
+        self._refill(now)
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self._rate
+
+    # Запас полностью восстановлен: ограничитель можно удалить
+    def is_idle(self, now: float) -> bool:
+        self._refill(now)
+        return self._tokens >= self._burst
+
+# Очередь запросов с ограничением одновременной обработки
+# Запрос получает одно из slots мест обработки; если мест нет - ждет в очереди своей полосы приоритета.
+# Запрос отклоняется сразу, если очередь заполнена или ожидаемое время ожидания больше max_queue_time,
+# и по истечении max_queue_time в очереди. Частота запросов клиента ограничивается отдельно.
+class AdmissionController():
+    def __init__(
+        self, slots: int, queue_size: int, max_queue_time: float, client_rate: float = 0, client_burst: float = 10
+    ):
+        self.slots = slots
+        self.queue_size = queue_size
+        self.max_queue_time = max_queue_time
+        self._client_rate = client_rate
+        self._client_burst = client_burst
+
+        self._condition = threading.Condition()
+        self._active = 0 # Количество обрабатываемых запросов
+        self._queues: dict[str, deque] = {lane: deque() for lane in LANES} # Ожидающие запросы по полосам
+        self._service_time = 0.0 # Среднее время обработки запроса, сек.
+
+        self._buckets: dict[str, TokenBucket] = {} # Ограничители частоты по клиентам
+        self._buckets_lock = threading.Lock()
+
+        # Метрики: время ожидания по полосам, принятые и отклоненные запросы
+        self._waits: dict[str, list] = {lane: [[0] * len(DURATION_BUCKETS), 0.0, 0] for lane in LANES}
+        self._admitted: dict[str, int] = {lane: 0 for lane in LANES}
+        self._rejected: dict[str, int] = {}
+
+    # Количество ожидающих запросов
+    def _waiting(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    # Ожидающие запросы полос с приоритетом не ниже заданной
+    def _waiting_before(self, lane: str) -> int:
+        count = 0
+        for queue_lane in LANES:
+            count += len(self._queues[queue_lane])
+            if queue_lane == lane:
+                break
+        return count
+
+    # Ожидаемое время ожидания запроса, стоящего в очереди под номером position (с 0)
+    def _expected_wait(self, position: int) -> float:
+        return (position // self.slots + 1) * self._service_time
+
+    # Может ли запрос занять место обработки: есть свободное место и нет запросов впереди
+    def _can_start(self, lane: str, ticket: object) -> bool:
+        if self._active >= self.slots:
+            return False
+        for queue_lane in LANES:
+            queue = self._queues[queue_lane]
+            if queue_lane == lane:
+                return not queue or queue[0] is ticket
+            if queue:
+                return False
+        return False
+
+    # Учет отказа, возвращает исключение для вызова
+    def reject(self, status: int, reason: str, message: str, retry_after: float) -> AdmissionRejected:
+        with self._condition:
+            self._rejected[reason] = self._rejected.get(reason, 0) + 1
+        return AdmissionRejected(status, reason, message, retry_after)
+
+    # Учет времени ожидания
+    def _observe_wait(self, lane: str, seconds: float):
+        wait = self._waits[lane]
+        for index, bound in enumerate(DURATION_BUCKETS):
+            if seconds <= bound:
+                wait[0][index] += 1
+        wait[1] += seconds
+        wait[2] += 1
+
+    # Проверка частоты запросов клиента
+    def _check_rate(self, client: str):
+        if self._client_rate <= 0 or not client:
+            return
+        now = time.monotonic()
+        with self._buckets_lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                # Ограничители клиентов, которые давно не обращались, удаляются
+                if len(self._buckets) >= _MAX_CLIENT_BUCKETS:
+                    for key in [key for key, value in self._buckets.items() if value.is_idle(now)]:
+                        del self._buckets[key]
+                bucket = TokenBucket(self._client_rate, self._client_burst)
+                self._buckets[client] = bucket
+            retry_after = bucket.take(now)
+        if retry_after > 0:
+            raise self.reject(429, 'rate_limit', "Превышена частота запросов клиента", retry_after)
+
+    # Получение места обработки запроса на время контекста
+    # Вызывает AdmissionRejected, если запрос не может быть принят
+    @contextmanager
+    def admit(self, client: str = '', lane: str = LANES[0]) -> Iterator[None]:
+        # Неизвестная полоса (в том числе значение другого типа) - полоса по умолчанию
+        if not isinstance(lane, str) or lane not in self._queues:
+            lane = LANES[0]
+        self._check_rate(client)
+
+        ticket = object()
+        with self._condition:
+            if not self._can_start(lane, ticket):
+                waiting = self._waiting()
+                if waiting >= self.queue_size:
+                    raise self.reject(
+                        503, 'queue_full', "Очередь запросов заполнена", self._expected_wait(waiting) or self.max_queue_time
+                    )
+                expected_wait = self._expected_wait(self._waiting_before(lane))
+                if expected_wait > self.max_queue_time:
+                    raise self.reject(503, 'overload', "Сервис перегружен", expected_wait)
+
+            # Ожидание места в очереди своей полосы
+            queued = time.monotonic()
+            deadline = queued + self.max_queue_time
+            queue = self._queues[lane]
+            queue.append(ticket)
+            try:
+                while not self._can_start(lane, ticket):
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        raise self.reject(
+                            503, 'queue_timeout', "Превышено время ожидания в очереди",
+                            self._expected_wait(self._waiting_before(lane))
+                        )
+                    self._condition.wait(timeout)
+            finally:
+                queue.remove(ticket)
+                # Следующий в очереди мог получить возможность начать обработку
+                self._condition.notify_all()
+
+            self._active += 1
+            self._admitted[lane] += 1
+            started = time.monotonic()
+            self._observe_wait(lane, started - queued)
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                elapsed = time.monotonic() - started
+                if self._service_time:
+                    self._service_time += _SERVICE_TIME_SMOOTHING * (elapsed - self._service_time)
+                else:
+                    self._service_time = elapsed
+                self._condition.notify_all()
+
+    # Состояние очереди
+    def status(self) -> dict:
+        with self._condition:
+            return {
+                'active': self._active,
+                'slots': self.slots,
+                'queued': {lane: len(queue) for lane, queue in self._queues.items()},
+                'service_time': round(self._service_time, 3)
+            }
+
+    # Метрики в текстовом формате Prometheus
+    def render(self) -> str:
+        with self._condition:
+            active = self._active
+            queued = {lane: len(queue) for lane, queue in self._queues.items()}
+            waits = {lane: ([*counts], total, count) for lane, (counts, total, count) in self._waits.items()}
+            admitted = dict(self._admitted)
+            rejected = dict(self._rejected)
+
+        prefix = f'{METRICS_PREFIX}_admission'
+        lines = [
+            f'# HELP {prefix}_active Количество обрабатываемых запросов',
+            f'# TYPE {prefix}_active gauge',
+            f'{prefix}_active {active}',
+            f'# HELP {prefix}_slots Количество мест обработки запросов',
+            f'# TYPE {prefix}_slots gauge',
+            f'{prefix}_slots {self.slots}',
+            f'# HELP {prefix}_queue_depth Количество запросов в очереди',
+            f'# TYPE {prefix}_queue_depth gauge'
+        ]
+        for lane in LANES:
+            lines.append(f'{prefix}_queue_depth{{lane="{lane}"}} {queued[lane]}')
+
+        lines.append(f'# HELP {prefix}_wait_seconds Время ожидания запросов в очереди')
+        lines.append(f'# TYPE {prefix}_wait_seconds histogram')
+        for lane in LANES:
+            counts, total, count = waits[lane]
+            for bound, bucket_count in zip(DURATION_BUCKETS, counts):
+                lines.append(f'{prefix}_wait_seconds_bucket{{lane="{lane}",le="{bound}"}} {bucket_count}')
+            lines.append(f'{prefix}_wait_seconds_bucket{{lane="{lane}",le="+Inf"}} {count}')
+            lines.append(f'{prefix}_wait_seconds_sum{{lane="{lane}"}} {total}')
+            lines.append(f'{prefix}_wait_seconds_count{{lane="{lane}"}} {count}')
+
+        lines.append(f'# HELP {prefix}_admitted_total Количество принятых запросов')
+        lines.append(f'# TYPE {prefix}_admitted_total counter')
+        for lane in LANES:
+            lines.append(f'{prefix}_admitted_total{{lane="{lane}"}} {admitted[lane]}')
+
+        lines.append(f'# HELP {prefix}_rejected_total Количество отклоненных запросов по причинам')
+        lines.append(f'# TYPE {prefix}_rejected_total counter')
+        for reason, count in sorted(rejected.items()):
+            lines.append(f'{prefix}_rejected_total{{reason="{reason}"}} {count}')
+        return '\n'.join(lines) + '\n'
\ No newline at end of file
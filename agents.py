@@ -1,11 +1,22 @@
 from enum import Enum
 from typing import Any
 
+import asyncio
+import contextvars
+
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+from tracing import span, trace_request
 
 # Базовое перечисление типов функций
 class BaseAIFunctions(Enum):
     content = 'content' # Контент - запрос от пользователя или ответ пользователю
+    batch = 'batch' # Пакет независимых сообщений: контент - список сообщений AIAgentMessage
+
+# Имя функции сообщения для трассировки
+def _function_name(message) -> str:
+    return str(getattr(message.function, 'value', message.function))
 
 # Сообщение AI-агента
 class AIAgentMessage():
@@ -16,6 +27,7 @@ class AIAgentMessage():
         self.reply_to: str = '' # Обратный адрес для ответа
         self.done: bool = False # Флаг завершения работы
         self.error: Exception = None # Ошибка
+        self.verified: bool = True # Результат получен полной проверкой, а не по упрощенному варианту
 
     # Техническое представление сообщения
     def __repr__(self):
@@ -25,7 +37,8 @@ class AIAgentMessage():
                 is_answer={self._is_answer},
                 reply_to={self.reply_to},
                 done={self.done},
-                error={self.error}
+                error={self.error},
+                verified={self.verified}
             )'''
 
     # Тип функции 'Контент' не может быть ответом
@@ -38,6 +51,16 @@ class AIAgentMessage():
     def is_answer(self, value: bool):
         self._is_answer = value
 
+# Базовый наблюдатель за ходом работы AI-агентов
+class BaseAIAgentObserver():
+    # Очередное сообщение между AI-агентами
+    def on_message(self, message: AIAgentMessage):
+        pass
+
+    # Очередной фрагмент ответа модели
+    def on_token(self, token: str):
+        pass
+
 # Базовый абстрактный AI-агент
 class BaseAIAgent(ABC):
     # Возможность дать ответ
@@ -50,6 +73,15 @@ class BaseAIAgent(ABC):
     def answer(self, question: AIAgentMessage) -> AIAgentMessage:
         pass
 
+    # Асинхронный ответ на вопрос
+    # По умолчанию синхронный ответ выполняется в отдельном потоке, не блокируя цикл событий
+    async def aanswer(self, question: AIAgentMessage) -> AIAgentMessage:
+        return await asyncio.to_thread(self.answer, question)
+
+    # Установка наблюдателя за ходом работы
+    def set_observer(self, observer: BaseAIAgentObserver):
+        pass
+
     # Очистка контекста
     @abstractmethod
     def clear_context(self):
@@ -84,18 +116,127 @@ class BaseAIAgentManager():
             return None
         return best_agent
 
+    # Ответ на пакет сообщений: результаты собираются в порядке сообщений пакета
+    def _batch_answer(self, message: AIAgentMessage, answers: list[AIAgentMessage]) -> AIAgentMessage:
+        answer = AIAgentMessage()
+        answer.function = BaseAIFunctions.batch
+        answer.content = answers
+        answer.is_answer = True
+        answer.reply_to = message.reply_to
+        return answer
+
+    # Исполнители всех сообщений пакета, None - для какого-то сообщения исполнитель не найден
+    def _find_batch_contractors(self, message: AIAgentMessage) -> list:
+        agents = [self._find_contractor(question) for question in message.content]
+        if None in agents:
+            return None
+        return agents
+
+    # Параллельная обработка пакета сообщений
+    def _answer_batch(self, message: AIAgentMessage) -> AIAgentMessage:
+        agents = self._find_batch_contractors(message)
+        if agents is None:
+            message.error = ValueError("Не удалось найти исполнителя.")
+            return message
+
+        if len(agents) <= 1:
+            answers = [self._agent_answer(agent, question) for agent, question in zip(agents, message.content)]
+        else:
+            # Потоки пакета продолжают трассу запроса
+            with ThreadPoolExecutor(max_workers=len(agents), thread_name_prefix='AIAgentBatch') as executor:
+                futures = [
+                    executor.submit(contextvars.copy_context().run, self._agent_answer, agent, question)
+                    for agent, question in zip(agents, message.content)
+                ]
+                answers = [future.result() for future in futures]
+        return self._batch_answer(message, answers)
+
+    # Асинхронная параллельная обработка пакета сообщений
+    async def _aanswer_batch(self, message: AIAgentMessage) -> AIAgentMessage:
+        agents = self._find_batch_contractors(message)
+        if agents is None:
+            message.error = ValueError("Не удалось найти исполнителя.")
+            return message
+
+        answers = await asyncio.gather(
+            *(self._aagent_answer(agent, question) for agent, question in zip(agents, message.content))
+        )
+        return self._batch_answer(message, list(answers))
+
+    # Ответ AI-агента - этап трассы запроса
+    def _agent_answer(self, agent: BaseAIAgent, message: AIAgentMessage) -> AIAgentMessage:
+        with span(f'agent.{agent.__class__.__name__}', function=_function_name(message)):
+            return agent.answer(message)
+
+    # Асинхронный ответ AI-агента - этап трассы запроса
+    async def _aagent_answer(self, agent: BaseAIAgent, message: AIAgentMessage) -> AIAgentMessage:
+        with span(f'agent.{agent.__class__.__name__}', function=_function_name(message)):
+            return await agent.aanswer(message)
+
+    # Установка наблюдателя всем AI-агентам
+    def _set_observer(self, observer: BaseAIAgentObserver):
+        for agent in self._agents:
+            agent.set_observer(observer)
+
     # Ответ на вопрос
-    def answer(self, message: AIAgentMessage) -> AIAgentMessage:
-        # Цикл поиска ответа
-        while not message.done:
-            # Поиск исполнителя функции
-            agent = self._find_contractor(message)
-            if agent is None:
-                message.error = ValueError("Не удалось найти исполнителя.")
+    def answer(self, message: AIAgentMessage, observer: BaseAIAgentObserver = None) -> AIAgentMessage:
+        self._set_observer(observer)
+        try:
+            # Каждый переход между AI-агентами - этап трассы запроса
+            with trace_request():
+                # Цикл поиска ответа
+                while not message.done:
+                    # Пакет сообщений обрабатывается исполнителями параллельно
+                    if message.function == BaseAIFunctions.batch and not message.is_answer:
+                        with span('batch', size=len(message.content)):
+                            message = self._answer_batch(message)
+                        if message.error is not None:
+                            return message
+                    else:
+                        # Поиск исполнителя функции
+                        agent = self._find_contractor(message)
+                        if agent is None:
+                            message.error = ValueError("Не удалось найти исполнителя.")
+                            return message
+                        # Получение ответа
+                        message = self._agent_answer(agent, message)
+                    # Уведомление наблюдателя
+                    if observer is not None:
+                        observer.on_message(message)
+                return message
+
+        finally:
+            self._set_observer(None)
+
+    # Асинхронный ответ на вопрос
+    async def aanswer(self, message: AIAgentMessage, observer: BaseAIAgentObserver = None) -> AIAgentMessage:
+        self._set_observer(observer)
+        try:
+            # Каждый переход между AI-агентами - этап трассы запроса
+            with trace_request():
+                # Цикл поиска ответа
+                while not message.done:
+                    # Пакет сообщений обрабатывается исполнителями параллельно
+                    if message.function == BaseAIFunctions.batch and not message.is_answer:
+                        with span('batch', size=len(message.content)):
+                            message = await self._aanswer_batch(message)
+                        if message.error is not None:
+                            return message
+                    else:
+                        # Поиск исполнителя функции
+                        agent = self._find_contractor(message)
+                        if agent is None:
+                            message.error = ValueError("Не удалось найти исполнителя.")
+                            return message
+                        # Получение ответа
+                        message = await self._aagent_answer(agent, message)
+                    # Уведомление наблюдателя
+                    if observer is not None:
+                        observer.on_message(message)
                 return message
-            # Получение ответа
-            message = agent.answer(message)
-        return message
+
+        finally:
+            self._set_observer(None)
 
     # Очистка контекста
     def clear_context(self):
@@ -1,31 +1,52 @@
 from enum import Enum
+from typing import Union
 import json
 
+import asyncio
+import hashlib
 import os
+import re
 import subprocess
+import threading
+import time
 
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
 
 from gigachat.models import Function
 from gigachat.models.function_parameters import FunctionParameters
 
 from agents import AIAgentMessage, BaseAIFunctions, BaseAIAgent
+from caches import LRUCache, ResponseCache, TieredCache, open_sqlite_cache
 from gigagents import BaseGigaChatAIAgent
-from metadata import tables_list, table_description
-from utilities import main_folder, config_value, main_logger
+from metadata import MetadataStore, add_metadata_listener, compact_description, metadata_store, metadata_version
+from metadata import tables_list, render_descriptions, rendered_projection, rendered_value
+from queryparser import check_query_text
+from tracing import span
+from utilities import aclose_on_loop_shutdown, main_folder, config_value, main_logger
 
 # Перечисление дополнительных типов функций
 class AIFunctions(Enum):
     tables_list = 'tables_list' # функция получения списка таблиц
     table_description = 'table_description' # функция получения описания таблицы по имени
+    table_descriptions = 'table_descriptions' # функция получения описаний нескольких таблиц по именам
     check_query = 'check_query' # функция проверки запроса
 
 # Описание функций для API GigaChat
 GIGACHAT_FUNCTIONS: dict = {
     AIFunctions.tables_list: Function(
         name=AIFunctions.tables_list.value,
-        description='Возвращает список таблиц',
-        parameters=FunctionParameters(properties={}, required=[]),
+        description='Возвращает список таблиц, наиболее подходящих для решения задачи',
+        parameters=FunctionParameters(
+            properties={
+                'query': {
+                    'type': 'string',
+                    'description': 'Ключевые слова для отбора таблиц'
+                }
+            },
+            required=[]
+        ),
         return_parameters={
             'type': 'object',
             'properties': {
@@ -47,6 +68,15 @@ GIGACHAT_FUNCTIONS: dict = {
                 'table_name': {
                     'type': 'string',
                     'description': 'Имя таблицы'
+                },
+                'sections': {
+                    'type': 'array',
+                    'description': 'Разделы описания (Реквизиты, Измерения, Ресурсы, ВиртуальныеТаблицы, ТабличныеЧасти, '
+                                   'ЗначенияПеречисления) или имена полей, которые нужно вернуть. '
+                                   'Если не указаны - возвращается полное описание',
+                    'items': {
+                        'type': 'string'
+                    }
                 }
             },
             required=['table_name']
@@ -60,9 +90,68 @@ GIGACHAT_FUNCTIONS: dict = {
                 }
             }
         }
+    ),
+    AIFunctions.table_descriptions: Function(
+        name=AIFunctions.table_descriptions.value,
+        description='Возвращает описания нескольких таблиц по именам',
+        parameters=FunctionParameters(
+            properties={
+                'table_names': {
+                    'type': 'array',
+                    'description': 'Список имен таблиц',
+                    'items': {
+                        'type': 'string'
+                    }
+                },
+                'sections': {
+                    'type': 'array',
+                    'description': 'Разделы описания (Реквизиты, Измерения, Ресурсы, ВиртуальныеТаблицы, ТабличныеЧасти, '
+                                   'ЗначенияПеречисления) или имена полей, которые нужно вернуть. '
+                                   'Если не указаны - возвращается полное описание',
+                    'items': {
+                        'type': 'string'
+                    }
+                }
+            },
+            required=['table_names']
+        ),
+        return_parameters={
+            'type': 'object',
+            'properties': {
+                'table_descriptions': {
+                    'type': 'object',
+                    'description': 'Описания таблиц в формате JSON по именам таблиц'
+                }
+            }
+        }
     )
 }
 
+# Сжатие результата функции 'описание таблицы по имени' до компактного текстового представления
+def compact_table_description(content: str) -> str:
+    try:
+        description = json.loads(content)['table_description']
+    except (ValueError, KeyError, TypeError):
+        return content
+
+    if not isinstance(description, dict):
+        return content
+    return json.dumps({'table_description': compact_description(description)}, ensure_ascii=False)
+
+# Сжатие результата функции 'описания нескольких таблиц по именам'
+def compact_table_descriptions(content: str) -> str:
+    try:
+        descriptions = json.loads(content)['table_descriptions']
+    except (ValueError, KeyError, TypeError):
+        return content
+
+    if not isinstance(descriptions, dict):
+        return content
+    compacted = {}
+    for table_name, description in descriptions.items():
+        compacted[table_name] = compact_description(description) if isinstance(description, dict) else description
+    return json.dumps({'table_descriptions': compacted}, ensure_ascii=False)
+
 # Агент по составлению 1C-запросов
 class SQLAssistantAgent(BaseGigaChatAIAgent):
     # Описание функций для API GigaChat
@@ -85,15 +174,28 @@ class SQLAssistantAgent(BaseGigaChatAIAgent):
 
 ### Требования
 - Перед составлением запроса получи описание необходимых таблиц через функции.
+- Описания нескольких таблиц запрашивай одним вызовом функции table_descriptions.
+- Не запрашивай описания таблиц, которые уже приведены в техническом задании.
 - Убедиться, что есть описание всех необходимых таблиц.
 - Формат ответа - только текст на языке запросов 1С 8.3, больше абсолютно ничего не добавляй.'''
 
         # Получение описания функций для API GigaChat
         function_tables_list = self._gigachat_functions[AIFunctions.tables_list]
         function_table_description = self._gigachat_functions[AIFunctions.table_description]
+        function_table_descriptions = self._gigachat_functions[AIFunctions.table_descriptions]
+        functions = [function_tables_list, function_table_description, function_table_descriptions]
+
+        # Сжатие описаний таблиц при переполнении контекста
+        compactors = {
+            AIFunctions.table_description.value: compact_table_description,
+            AIFunctions.table_descriptions.value: compact_table_descriptions
+        }
+
+        # Количество описаний таблиц, передаваемых модели вместе с задачей (0 - не передавать)
+        self._prefetch_tables = config_value(None, 'GIGACHAT', 'prefetch_tables', 0)
 
         # Инициализация как у базового класса
-        super().__init__(system_prompt, model, [function_tables_list, function_table_description])
+        super().__init__(system_prompt, model, functions, compactors)
 
     # Возможность дать ответ
     def can_handle(self, question: AIAgentMessage) -> float:
@@ -106,41 +208,88 @@ class SQLAssistantAgent(BaseGigaChatAIAgent):
             return 1.0
         return -1.0
 
-    # Ответ на вопрос
-    def answer(self, question: AIAgentMessage) -> AIAgentMessage:
+    # Разбор вопроса
+    # Возвращает готовый ответ либо параметры обращения к GigaChat: контент, функцию и признак ответа функции
+    def _begin_answer(self, question: AIAgentMessage) -> Union[AIAgentMessage, tuple]:
         # Проверка возможности дать ответ
         if self.can_handle(question) == -1:
             raise Exception("Невозможно обработать запрос")
 
         # Логгирование на уровне отладки
-        self._logger.debug(f"Объект: {self.__class__.__name__}\n Запрос: {question}")
+        self._logger.debug("Объект: %s\n Запрос: %s", self.__class__.__name__, question)
 
         # Если это запрос от пользователя - отвечаем
         if question.function == BaseAIFunctions.content:
-            content = f'### Техническое задание:\n{question.content}'
-            answer = self._answer(question.content, BaseAIFunctions.content)
+            self._task = question.content
+            self._used_tokens = 0 # Бюджет токенов действует на каждую задачу
+            # Описания вероятно нужных таблиц передаются сразу, чтобы не запрашивать их через функции
+            prefetch = self._prefetch(question.content)
+            if prefetch:
+                content = f'### Техническое задание:\n{question.content}\n\n### Описания таблиц:\n{prefetch}'
+                return (content, BaseAIFunctions.content, False)
+            return (question.content, BaseAIFunctions.content, False)
         # Если это ответ от функции 'проверка запроса'
         elif question.function == AIFunctions.check_query:
             # Если запрос корректен - устанавливаем признак завершения работы
             if question.content == 'OK':
                 answer = AIAgentMessage()
                 answer.content = self._result
+                answer.verified = question.verified
                 answer.done = True
+                return answer
             # Просим исправить ошибку несколько раз
             elif self._trial_count < 3:
                 content = f'Исправь ошибку:\n{question.content}'
-                answer = self._answer(content, BaseAIFunctions.content)
+                return (content, BaseAIFunctions.content, False)
             # Не получилось исправить - честно признаемся и завершаем работу
             else:
                 answer = AIAgentMessage()
                 answer.content = f'Не удается исправить ошибки, последний вариант:\n{self._result}'
+                answer.error = ValueError("Не удается исправить ошибки запроса")
                 answer.done = True
+                return answer
         # Если это ответ на функций 'список таблиц' и 'описание таблицы по имени' - отвечаем
         elif question.function in [AIFunctions.tables_list, AIFunctions.table_description]:
-            answer = self._answer(question.content, question.function.value, question.is_answer)
+            return (question.content, question.function.value, question.is_answer)
+        # Если это ответы на пакет запросов описаний таблиц - объединяем их в один результат функции
+        elif question.function == BaseAIFunctions.batch:
+            descriptions = {}
+            for table_name, answer in zip(self._batch_names, question.content):
+                descriptions[table_name] = answer.content or ''
+                if rendered_value(descriptions[table_name]) is None:
+                    self._logger.warning("Неожиданный ответ на запрос описания таблицы %s: %s", table_name, answer.content)
+            content = render_descriptions(descriptions)
+            return (content, AIFunctions.table_descriptions.value, True)
         else:
             raise Exception("Невозможно обработать запрос")
 
+    # Компактные описания таблиц, наиболее подходящих для задачи
+    def _prefetch(self, task: str) -> str:
+        if self._prefetch_tables <= 0:
+            return ''
+        with span('metadata.prefetch') as lookup_span:
+            try:
+                store = metadata_store()
+                table_names = store.relevant_tables(task, self._prefetch_tables)
+            except Exception as e:
+                self._logger.error("Ошибка отбора таблиц для задачи: %s", e)
+                return ''
+
+            descriptions = []
+            for table_name in table_names:
+                try:
+                    description = store.compact_text(table_name)
+                except ValueError:
+                    continue
+                if description:
+                    descriptions.append(description)
+            result = '\n\n'.join(descriptions)
+            lookup_span.set('tables', len(descriptions))
+            lookup_span.set('result_chars', len(result))
+            return result
+
+    # Обработка ответа GigaChat
+    def _end_answer(self, answer: AIAgentMessage) -> AIAgentMessage:
         # Получаем функцию AI-агента пл имени функции GigaChat
         if answer.function != BaseAIFunctions.content:
             answer.function = AIFunctions[answer.function]
@@ -152,12 +301,26 @@ class SQLAssistantAgent(BaseGigaChatAIAgent):
                 answer.function = AIFunctions.check_query
                 self._result = answer.content
                 self._trial_count += 1
-            # Если это запрос функции 'список таблиц' - чистим контент, он не нужен
+            # Если это запрос функции 'список таблиц' - помещаем в контент задачу и ключевые слова для отбора таблиц
             elif answer.function == AIFunctions.tables_list:
-                answer.content = ''
-            # Если это запрос функции 'описание таблицы по имени' - помещаем имя таблицы в контент
+                query = (answer.content or {}).get('query', '')
+                answer.content = f'{self._task}\n{query}'.strip()
+            # Если это запрос функции 'описание таблицы по имени' - помещаем имя таблицы
+            # и запрошенные разделы в контент
             elif answer.function == AIFunctions.table_description:
-                answer.content = answer.content['table_name']
+                answer.content = self._table_description_content(answer.content['table_name'], answer.content)
+            # Если это запрос описаний нескольких таблиц - формируем пакет запросов 'описание таблицы по имени'
+            elif answer.function == AIFunctions.table_descriptions:
+                table_names = answer.content.get('table_names') or []
+                if isinstance(table_names, str):
+                    table_names = [table_names]
+                self._batch_names = list(dict.fromkeys(table_names))
+                content = answer.content
+                answer.function = BaseAIFunctions.batch
+                answer.content = [
+                    self._table_description_question(self._table_description_content(table_name, content))
+                    for table_name in self._batch_names
+                ]
             else:
                 raise Exception(f'Неизвестная функция: {answer.function}')
 
@@ -165,15 +328,68 @@ class SQLAssistantAgent(BaseGigaChatAIAgent):
         answer.reply_to = self.__class__.__name__
 
         # Логгирование на уровне отладки
-        self._logger.debug(f"Объект: {self.__class__.__name__}\n Ответ: {answer}")
+        self._logger.debug("Объект: %s\n Ответ: %s", self.__class__.__name__, answer)
+
+        return answer
 
+    # Контент запроса функции 'описание таблицы по имени': имя таблицы
+    # или, если модель запросила отдельные разделы и поля, имя таблицы с разделами
+    @staticmethod
+    def _table_description_content(table_name: str, arguments: dict) -> Union[str, dict]:
+        sections = arguments.get('sections') or []
+        if isinstance(sections, str):
+            sections = [sections]
+        if not sections:
+            return table_name
+        return {'table_name': table_name, 'sections': list(dict.fromkeys(sections))}
+
+    # Запрос функции 'описание таблицы по имени' для пакета запросов
+    def _table_description_question(self, content: Union[str, dict]) -> AIAgentMessage:
+        question = AIAgentMessage()
+        question.function = AIFunctions.table_description
+        question.content = content
+        question.reply_to = self.__class__.__name__
+        return question
+
+    # Завершение работы при исчерпании бюджета токенов запроса: последний вариант запроса, если он есть
+    def _budget_answer(self) -> AIAgentMessage:
+        self._logger.warning("Исчерпан бюджет токенов запроса: израсходовано %s", self._used_tokens)
+        answer = AIAgentMessage()
+        if self._result:
+            answer.content = f'Исчерпан бюджет токенов запроса, последний вариант:\n{self._result}'
+        else:
+            answer.content = 'Исчерпан бюджет токенов запроса, текст запроса не составлен'
+        answer.error = ValueError("Исчерпан бюджет токенов запроса")
+        answer.done = True
         return answer
 
+    # Ответ на вопрос
+    def answer(self, question: AIAgentMessage) -> AIAgentMessage:
+        answer = self._begin_answer(question)
+        if not isinstance(answer, AIAgentMessage):
+            if self._over_budget(answer[0]):
+                answer = self._budget_answer()
+            else:
+                answer = self._answer(*answer)
+        return self._end_answer(answer)
+
+    # Асинхронный ответ на вопрос
+    async def aanswer(self, question: AIAgentMessage) -> AIAgentMessage:
+        answer = self._begin_answer(question)
+        if not isinstance(answer, AIAgentMessage):
+            if self._over_budget(answer[0]):
+                answer = self._budget_answer()
+            else:
+                answer = await self._aanswer(*answer)
+        return self._end_answer(answer)
+
     # Очистка контекста
     def clear_context(self):
         super().clear_context()
+        self._task = ''
         self._result = ''
         self._trial_count = 0
+        self._batch_names = [] # Имена таблиц пакета запросов описаний
 
 # Агент по составлению списка таблиц
 # Функция: tables_list
@@ -182,6 +398,9 @@ class TablesListAgent(BaseAIAgent):
         # Получение логгер
         self._logger = main_logger()
 
+        # Максимальное количество таблиц в списке (0 - без ограничения)
+        self._top_k = config_value(None, 'MAIN', 'tables_list_top_k', 0)
+
     # Возможность дать ответ
     def can_handle(self, question: AIAgentMessage) -> float:
         # Если это запрос нашей функции - отвечаем
@@ -196,17 +415,20 @@ class TablesListAgent(BaseAIAgent):
             raise Exception("Невозможно обработать запрос")
         
         # Логгирование на уровне отладки
-        self._logger.debug(f"Объект: {self.__class__.__name__}\n Запрос: {question}")
+        self._logger.debug("Объект: %s\n Запрос: %s", self.__class__.__name__, question)
 
         # Получение списка таблиц и формирование ответа на обратный адрес
         answer = AIAgentMessage()
         answer.function = AIFunctions.tables_list
-        answer.content = json.dumps({'tables_list': tables_list()}, ensure_ascii=False)
+        with span('metadata.tables_list') as lookup_span:
+            names = tables_list(question.content, self._top_k)
+            lookup_span.set('tables', len(names))
+        answer.content = json.dumps({'tables_list': names}, ensure_ascii=False)
         answer.is_answer = True
         answer.reply_to = question.reply_to
 
         # Логгирование на уровне отладки
-        self._logger.debug(f"Объект: {self.__class__.__name__}\n Ответ: {answer}")
+        self._logger.debug("Объект: %s\n Ответ: %s", self.__class__.__name__, answer)
 
         return answer
 
@@ -235,24 +457,27 @@ class TableDescriptionAgent(BaseAIAgent):
             raise Exception("Невозможно обработать запрос")
 
         # Логгирование на уровне отладки
-        self._logger.debug(f"Объект: {self.__class__.__name__}\n Запрос: {question}")
+        self._logger.debug("Объект: %s\n Запрос: %s", self.__class__.__name__, question)
 
-        # Получение описания таблицы по имени
-        json_string = table_description(question.content)
-        if not json_string:
-            description = 'Описание таблицы не найдено'
-        else:
-            description = json.loads(json_string)
+        # Получение готового описания таблицы по имени, целиком или только запрошенных разделов
+        with span('metadata.table_description') as lookup_span:
+            if isinstance(question.content, dict):
+                content = rendered_projection(question.content['table_name'], question.content.get('sections'))
+            else:
+                content = rendered_projection(question.content, None)
+            lookup_span.set('result_chars', len(content))
+        if not content:
+            content = json.dumps({'table_description': 'Описание таблицы не найдено'}, ensure_ascii=False)
 
         # Формирование ответа на обратный адрес
         answer = AIAgentMessage()
         answer.function = AIFunctions.table_description
-        answer.content = json.dumps({'table_description': description}, ensure_ascii=False)
+        answer.content = content
         answer.is_answer = True
         answer.reply_to = question.reply_to
 
         # Логгирование на уровне отладки
-        self._logger.debug(f"Объект: {self.__class__.__name__}\n Ответ: {answer}")
+        self._logger.debug("Объект: %s\n Ответ: %s", self.__class__.__name__, answer)
 
         return answer
 
@@ -260,44 +485,309 @@ class TableDescriptionAgent(BaseAIAgent):
     def clear_context(self):
         pass
 
+# Строковые литералы и текст вне их в запросе 1С
+_QUERY_LITERAL_PATTERN = re.compile(r'("(?:[^"]|"")*")|([^"]+)')
+
+# Нормализованный текст запроса: язык запросов 1С не различает регистр и пробельные символы вне строковых литералов
+def normalize_query(query: str) -> str:
+    parts = []
+    for literal, text in _QUERY_LITERAL_PATTERN.findall(query):
+        if literal:
+            parts.append(literal)
+        else:
+            # Удаление комментариев и схлопывание пробельных символов
+            text = re.sub(r'//[^\n]*', ' ', text)
+            parts.append(re.sub(r'\s+', ' ', text).upper())
+    return ''.join(parts).strip()
+
+# Экземпляр кэша результатов проверки запросов
+_CHECK_QUERY_CACHE = None
+_CHECK_QUERY_CACHE_LOCK = threading.Lock()
+
+# Кэш результатов проверки запросов, общий для всех агентов и запросов
+def check_query_cache() -> TieredCache:
+    global _CHECK_QUERY_CACHE
+    with _CHECK_QUERY_CACHE_LOCK:
+        if _CHECK_QUERY_CACHE is None:
+            # Параметры кэша
+            cache_size = config_value(None, 'CHECK_QUERY', 'cache_size', 1000)
+            cache_ttl = config_value(None, 'CHECK_QUERY', 'cache_ttl', 86400)
+            cache_db_name = config_value(None, 'CHECK_QUERY', 'cache_db_name', None)
+
+            # Кэш в базе данных рядом с базой данных метаданных
+            persistent = None
+            if cache_db_name:
+                cache_db_path = os.path.join(main_folder(), cache_db_name)
+                persistent = open_sqlite_cache(cache_db_path, 'check_query_cache', cache_size, cache_ttl)
+
+            _CHECK_QUERY_CACHE = TieredCache(LRUCache(cache_size, cache_ttl), persistent)
+        return _CHECK_QUERY_CACHE
+
+# Экземпляр кэша ответов на запросы пользователей
+_RESPONSE_CACHE = None
+_RESPONSE_CACHE_LOCK = threading.Lock()
+
+# Кэш ответов на запросы пользователей, None - кэш отключен
+def response_cache() -> Union[ResponseCache, None]:
+    global _RESPONSE_CACHE
+    if not config_value(None, 'RESPONSE_CACHE', 'enabled', False):
+        return None
+    with _RESPONSE_CACHE_LOCK:
+        if _RESPONSE_CACHE is None:
+            # Параметры кэша
+            cache_size = config_value(None, 'RESPONSE_CACHE', 'cache_size', 1000)
+            cache_ttl = config_value(None, 'RESPONSE_CACHE', 'cache_ttl', 86400)
+            cache_db_name = config_value(None, 'RESPONSE_CACHE', 'cache_db_name', None)
+            similarity_threshold = config_value(None, 'RESPONSE_CACHE', 'similarity_threshold', 0.0)
+            ngram_size = config_value(None, 'RESPONSE_CACHE', 'ngram_size', 3)
+
+            # Кэш в базе данных рядом с базой данных метаданных
+            persistent = None
+            if cache_db_name:
+                cache_db_path = os.path.join(main_folder(), cache_db_name)
+                persistent = open_sqlite_cache(cache_db_path, 'response_cache', cache_size, cache_ttl)
+
+            cache = TieredCache(LRUCache(cache_size, cache_ttl), persistent)
+            _RESPONSE_CACHE = ResponseCache(cache, cache_size, similarity_threshold, ngram_size)
+        return _RESPONSE_CACHE
+
+# Область кэша ответов: ответы зависят от метаданных и модели
+def response_cache_scope() -> str:
+    model = config_value(None, 'GIGACHAT', 'model', '')
+    return f'{metadata_version()}\n{model}'
+
+# Сброс кэшей, зависящих от метаданных, после их перезагрузки
+def _on_metadata_changed(store: MetadataStore):
+    with _CHECK_QUERY_CACHE_LOCK:
+        if _CHECK_QUERY_CACHE is not None:
+            _CHECK_QUERY_CACHE.clear()
+    with _RESPONSE_CACHE_LOCK:
+        if _RESPONSE_CACHE is not None:
+            _RESPONSE_CACHE.clear()
+
+add_metadata_listener(_on_metadata_changed)
+
+# Автоматический выключатель: после нескольких ошибок подряд обращения к веб-сервису
+# прекращаются на время восстановления, затем пропускается одно пробное обращение
+class CircuitBreaker():
+    def __init__(self, failure_threshold: int, recovery_time: float):
+        self._failure_threshold = failure_threshold # Количество ошибок подряд до размыкания, 0 - не размыкать
+        self._recovery_time = recovery_time # Время в секундах до пробного обращения
+        self._failures = 0
+        self._opened_at = 0.0 # Время размыкания, 0 - цепь замкнута
+        self._lock = threading.Lock()
+
+    # Обращение разрешено
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at == 0.0:
+                return True
+            # Пробное обращение - остальные ждут следующего периода восстановления
+            if time.monotonic() - self._opened_at >= self._recovery_time:
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+    # Успешное обращение замыкает цепь
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = 0.0
+
+    # Ошибка обращения
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failure_threshold > 0 and self._failures >= self._failure_threshold:
+                self._opened_at = time.monotonic()
+
+# Клиент веб-сервиса проверки запросов с пулом постоянных соединений
+class CheckQueryClient():
+    # Коды ответа, при которых обращение повторяется
+    RETRY_STATUSES = (502, 503, 504)
+
+    def __init__(self, url: str, pool_size: int, connect_timeout: float, read_timeout: float,
+                 retries: int, retry_backoff: float, breaker: CircuitBreaker):
+        self._url = url
+        self._pool_size = pool_size
+        self._connect_timeout = connect_timeout
+        self._read_timeout = read_timeout
+        self._retries = retries # Количество повторов при ошибке соединения
+        self._retry_backoff = retry_backoff # Начальная задержка повтора в секундах, удваивается
+        self._breaker = breaker
+        self._headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json'
+        }
+
+        # Сессия с пулом соединений для синхронных обращений
+        self._session = requests.Session()
+        self._session.headers.update(self._headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+
+        # Асинхронный клиент привязан к циклу событий: у каждого цикла свой клиент
+        # и асинхронный генератор, закрывающий его при завершении цикла
+        self._lock = threading.Lock()
+        self._aclients: dict[asyncio.AbstractEventLoop, tuple] = {}
+
+    # Тело запроса JSON
+    def _body(self, query: str) -> bytes:
+        return json.dumps({'query': query}, ensure_ascii=False).encode('utf-8')
+
+    # Задержка перед повтором обращения
+    def _retry_delay(self, attempt: int) -> float:
+        return self._retry_backoff * 2 ** attempt
+
+    # Проверка доступности веб-сервиса перед обращением
+    def _check_breaker(self):
+        if not self._breaker.allow():
+            raise Exception("Веб-сервис проверки запроса временно недоступен")
+
+    # Ошибка, при которой обращение можно повторить
+    def _retryable(self, error: Exception) -> bool:
+        if isinstance(error, requests.exceptions.HTTPError):
+            return error.response is not None and error.response.status_code in self.RETRY_STATUSES
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code in self.RETRY_STATUSES
+        # Истечение времени чтения не повторяем: веб-сервис доступен, но не успевает ответить
+        return isinstance(error, (requests.exceptions.ConnectionError, httpx.ConnectError, httpx.ConnectTimeout))
+
+    # Учет ошибки обращения автоматическим выключателем
+    # Недоступность веб-сервиса - ошибки соединения, истечение времени ожидания и ответы 5xx;
+    # ответ 4xx означает, что веб-сервис доступен и отклонил запрос
+    def _record_error(self, error: Exception):
+        if isinstance(error, requests.exceptions.HTTPError):
+            unavailable = error.response is None or error.response.status_code >= 500
+        elif isinstance(error, httpx.HTTPStatusError):
+            unavailable = error.response.status_code >= 500
+        else:
+            unavailable = isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout, httpx.TransportError))
+        if unavailable:
+            self._breaker.failure()
+        else:
+            self._breaker.success()
+
+    # Асинхронный клиент для текущего цикла событий
+    async def _async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop in self._aclients:
+                return self._aclients[loop][0]
+            # Клиенты завершившихся циклов событий уже закрыты
+            for closed_loop in [key for key in self._aclients if key.is_closed()]:
+                del self._aclients[closed_loop]
+            client = httpx.AsyncClient(
+                headers=self._headers,
+                timeout=httpx.Timeout(self._read_timeout, connect=self._connect_timeout),
+                limits=httpx.Limits(max_connections=self._pool_size, max_keepalive_connections=self._pool_size)
+            )
+
+        # Клиент закрывается при завершении цикла событий, пока его соединения еще можно закрыть
+        closer = await aclose_on_loop_shutdown([client])
+        with self._lock:
+            self._aclients[loop] = (client, closer)
+        return client
+
+    # Проверка текста запроса
+    def check(self, query: str) -> str:
+        self._check_breaker()
+        body = self._body(query)
+        attempt = 0
+        with span('check_query.request', query_chars=len(body)) as request_span:
+            while True:
+                try:
+                    response = self._session.post(self._url, data=body, timeout=(self._connect_timeout, self._read_timeout))
+                    response.raise_for_status()
+                    break
+
+                except requests.exceptions.RequestException as e:
+                    if attempt < self._retries and self._retryable(e):
+                        time.sleep(self._retry_delay(attempt))
+                        attempt += 1
+                        request_span.set('retries', attempt)
+                        continue
+                    self._record_error(e)
+                    raise Exception(f"Ошибка при обращении к веб-сервису проверки запроса: {str(e)}")
+
+        self._breaker.success()
+        return json.loads(response.text)['result']
+
+    # Асинхронная проверка текста запроса
+    async def acheck(self, query: str) -> str:
+        self._check_breaker()
+        body = self._body(query)
+        client = await self._async_client()
+        attempt = 0
+        with span('check_query.request', query_chars=len(body)) as request_span:
+            while True:
+                try:
+                    response = await client.post(self._url, content=body)
+                    response.raise_for_status()
+                    break
+
+                except httpx.HTTPError as e:
+                    if attempt < self._retries and self._retryable(e):
+                        await asyncio.sleep(self._retry_delay(attempt))
+                        attempt += 1
+                        request_span.set('retries', attempt)
+                        continue
+                    self._record_error(e)
+                    raise Exception(f"Ошибка при обращении к веб-сервису проверки запроса: {str(e)}")
+
+        self._breaker.success()
+        return json.loads(response.text)['result']
+
+    # Закрытие соединений
+    def close(self):
+        self._session.close()
+
+# Экземпляр клиента веб-сервиса проверки запросов
+_CHECK_QUERY_CLIENT = None
+_CHECK_QUERY_CLIENT_LOCK = threading.Lock()
+
+# Клиент веб-сервиса проверки запросов, общий для всех агентов и запросов
+def check_query_client() -> CheckQueryClient:
+    global _CHECK_QUERY_CLIENT
+    with _CHECK_QUERY_CLIENT_LOCK:
+        if _CHECK_QUERY_CLIENT is None:
+            url = config_value(None, 'CHECK_QUERY', 'url', None)
+            if url is None:
+                raise Exception("Не указан адрес веб-сервиса проверки запроса")
+
+            # Параметры соединений, повторов и автоматического выключателя
+            breaker = CircuitBreaker(
+                config_value(None, 'CHECK_QUERY', 'failure_threshold', 5),
+                config_value(None, 'CHECK_QUERY', 'recovery_time', 30)
+            )
+            _CHECK_QUERY_CLIENT = CheckQueryClient(
+                url,
+                config_value(None, 'CHECK_QUERY', 'pool_size', 8),
+                config_value(None, 'CHECK_QUERY', 'connect_timeout', 3),
+                config_value(None, 'CHECK_QUERY', 'read_timeout', 10),
+                config_value(None, 'CHECK_QUERY', 'retries', 2),
+                config_value(None, 'CHECK_QUERY', 'retry_backoff', 0.5),
+                breaker
+            )
+        return _CHECK_QUERY_CLIENT
+
 # Агент по проверке таблиц
 # Функция: check_query
 class CheckQueryAgent(BaseAIAgent):
     def __init__(self):
         self._logger = main_logger()
+        # Предварительная проверка запроса без обращения к веб-сервису
+        self._local_check = config_value(None, 'CHECK_QUERY', 'local_check', True)
         self.clear_context()
 
     # Обращение к веб-сервису проверки запроса
     def _check_query(self, query: str) -> str:
-        # Получение адреса веб-сервиса проверки
-        url = config_value(None, 'CHECK_QUERY', 'url', None)
-        if url is None:
-            raise Exception("Не указан адрес веб-сервиса проверки запроса")
-
-        # Заголовок и тело запроса
-        headers = {
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
-        }
-        body = {
-            'query': query
-        }
+        return check_query_client().check(query)
 
-        try:
-            # Сериализуем тело запроса JSON
-            json_body = json.dumps(body, ensure_ascii=False)
-
-            # Получаем ответ от веб-сервиса проверки
-            response = requests.post(url, data=json_body, headers=headers, timeout=10)
-            response.raise_for_status()
-
-            # Десериализуем ответ из JSON
-            body = json.loads(response.text)
-
-            return body['result']
-
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"Ошибка при обращении к веб-сервису проверки запроса: {str(e)}")
+    # Асинхронное обращение к веб-сервису проверки запроса
+    async def _acheck_query(self, query: str) -> str:
+        return await check_query_client().acheck(query)
 
     # Возможность дать ответ
     def can_handle(self, question: AIAgentMessage) -> float:
@@ -313,34 +803,133 @@ class CheckQueryAgent(BaseAIAgent):
             raise Exception("Невозможно обработать запрос")
 
         # Логгирование на уровне отладки
-        self._logger.debug(f"Объект: {self.__class__.__name__}\n Запрос: {question}")
+        self._logger.debug("Объект: %s\n Запрос: %s", self.__class__.__name__, question)
 
-        try:
-            result = self._check_query(question.content)
-            if not result:
-                result = 'OK'
-            elif 'Ожидается выражение "ВЫБРАТЬ"' in result:
-                result = 'Нужен только текст на языке запросов 1С 8.3'
+        # Ошибки, найденные локально, возвращаются без обращения к веб-сервису
+        result = self._local_result(question.content)
+
+        # Результат проверки такого же запроса на тех же метаданных
+        if result is None:
+            result = self._cached_result(question.content)
+        verified = True
+        if result is None:
+            try:
+                result = self._check_result(self._check_query(question.content))
+
+            except Exception as e:
+                result = self._fallback_result(question.content, e)
+                verified = False
+
+            # Кэшируется только результат проверки веб-сервисом
+            if verified:
+                self._cache_result(question.content, result)
+
+        return self._check_answer(question, result, verified)
+
+    # Асинхронный ответ на вопрос
+    async def aanswer(self, question: AIAgentMessage) -> AIAgentMessage:
+        # Проверка возможности дать ответ
+        if self.can_handle(question) == -1:
+            raise Exception("Невозможно обработать запрос")
 
+        # Логгирование на уровне отладки
+        self._logger.debug("Объект: %s\n Запрос: %s", self.__class__.__name__, question)
+
+        # Ошибки, найденные локально, возвращаются без обращения к веб-сервису
+        result = self._local_result(question.content)
+
+        # Результат проверки такого же запроса на тех же метаданных
+        if result is None:
+            result = self._cached_result(question.content)
+        verified = True
+        if result is None:
+            try:
+                result = self._check_result(await self._acheck_query(question.content))
+
+            except Exception as e:
+                result = self._fallback_result(question.content, e)
+                verified = False
+
+            # Кэшируется только результат проверки веб-сервисом
+            if verified:
+                self._cache_result(question.content, result)
+
+        return self._check_answer(question, result, verified)
+
+    # Ключ кэша результатов проверки: версия метаданных и нормализованный текст запроса
+    def _cache_key(self, query: str) -> str:
+        key = f'{metadata_version()}\n{normalize_query(query)}'
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    # Результат проверки запроса из кэша, None - результата нет или кэш недоступен
+    def _cached_result(self, query: str) -> Union[str, None]:
+        with span('check_query.cache') as cache_span:
+            try:
+                result = check_query_cache().get(self._cache_key(query))
+            except Exception as e:
+                self._logger.warning("Ошибка чтения кэша результатов проверки запроса: %s", e)
+                result = None
+            cache_span.set('hits', int(result is not None))
+        return result
+
+    # Сохранение результата проверки запроса в кэше, ошибка кэша не влияет на ответ
+    def _cache_result(self, query: str, result: str):
+        try:
+            check_query_cache().put(self._cache_key(query), result)
         except Exception as e:
-            # Логгирование на уровне ошибки
-            self._logger.error(f"Ошибка при проверке текста запроса:\n {str(e)}")
+            self._logger.warning("Ошибка записи кэша результатов проверки запроса: %s", e)
 
-            # Базовая проверка
-            if question.content.upper().startswith('ВЫБРАТЬ'):
-                result = 'OK'
-            else:
-                result = 'Нужен только текст на языке запросов 1С 8.3'
+    # Локальная проверка запроса по метаданным, None - ошибок не найдено
+    def _local_result(self, query: str) -> Union[str, None]:
+        if not self._local_check:
+            return None
+
+        # Без загруженных метаданных проверяется только синтаксис
+        try:
+            store = metadata_store()
+        except Exception:
+            store = None
 
+        with span('check_query.local'):
+            result = check_query_text(query, store)
+        if not result:
+            return None
+
+        # Логгирование на уровне отладки
+        self._logger.debug("Объект: %s\n Локальная проверка: %s", self.__class__.__name__, result)
+
+        return self._check_result(result)
+
+    # Приведение результата веб-сервиса проверки к ответу для модели
+    def _check_result(self, result: str) -> str:
+        if not result:
+            return 'OK'
+        elif 'Ожидается выражение "ВЫБРАТЬ"' in result:
+            return 'Нужен только текст на языке запросов 1С 8.3'
+        return result
+
+    # Базовая проверка при недоступности веб-сервиса проверки
+    def _fallback_result(self, query: str, error: Exception) -> str:
+        # Логгирование на уровне ошибки
+        self._logger.error("Ошибка при проверке текста запроса:\n %s", error)
+
+        # Запрос уже прошел локальную проверку
+        if self._local_check or query.upper().startswith('ВЫБРАТЬ'):
+            return 'OK'
+        return 'Нужен только текст на языке запросов 1С 8.3'
+
+    # Формирование ответа на обратный адрес
+    def _check_answer(self, question: AIAgentMessage, result: str, verified: bool = True) -> AIAgentMessage:
         # Формирование ответа на обратный адрес
         answer = AIAgentMessage()
         answer.function = question.function
         answer.content = result
+        answer.verified = verified
         answer.is_answer = True
         answer.reply_to = question.reply_to
 
         # Логгирование на уровне отладки
-        self._logger.debug(f"Объект: {self.__class__.__name__}\n Ответ: {answer}")
+        self._logger.debug("Объект: %s\n Ответ: %s", self.__class__.__name__, answer)
 
         return answer
 
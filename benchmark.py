@@ -0,0 +1,486 @@
+import os
+import sys
+
+import argparse
+import configparser
+import itertools
+import json
+import re
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from metadata import load_metadata, metadata_store
+from utilities import set_main_folder, config_value
+
+# Путь к папке скрипта
+script_path = os.path.dirname(os.path.abspath(__file__))
+
+# Переменная окружения с основной папкой веб-сервиса (см. main.py)
+FOLDER_VARIABLE = 'SQL_ASSISTANT_FOLDER'
+
+# Счетчики обращений к заменителям сервисов
+class CallCounter():
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.tokens = 0
+
+    # Учет обращения
+    def add(self, tokens: int = 0):
+        with self._lock:
+            self.calls += 1
+            self.tokens += tokens
+
+    # Сброс счетчиков
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.tokens = 0
+
+# Заменитель GigaChat: выдает ответы модели из сценария с заданной задержкой
+# Номер шага сценария - количество ответов модели в истории чата, поэтому каждый запрос
+# веб-сервиса проходит сценарий с начала, а после последнего шага сценарий повторяется.
+# Подстановка {request} в тексте ответа заменяется номером запроса генератора нагрузки,
+# чтобы тексты запросов различались и проверка не отвечала из кэша
+class FakeGigaChatHandler(BaseHTTPRequestHandler):
+    scenario: list[dict] = [] # Ответы модели
+    latency = 0.0 # Задержка ответа, сек.
+    token_latency = 0.0 # Задержка между фрагментами потокового ответа, сек.
+    counter = CallCounter() # Обращения к модели и токены
+    chars_per_token = 3 # Оценка количества токенов по длине текста
+
+    # Подавление вывода журнала запросов
+    def log_message(self, format, *args):
+        pass
+
+    # Отправка ответа JSON
+    def _send_json(self, data: dict):
+        body = json.dumps(data, ensure_ascii=False).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # Очередной ответ модели по истории чата
+    def _next_message(self, chat: dict) -> dict:
+        step = sum(1 for message in chat.get('messages', []) if message.get('role') == 'assistant')
+        message = {'role': 'assistant', 'content': ''}
+        message.update(self.scenario[step % len(self.scenario)])
+        if '{request}' in message['content']:
+            message['content'] = message['content'].replace('{request}', str(self._request_number(chat)))
+        return message
+
+    # Номер запроса генератора нагрузки по задаче в истории чата
+    @staticmethod
+    def _request_number(chat: dict) -> int:
+        for message in chat.get('messages', []):
+            if message.get('role') == 'user':
+                match = re.search(r'#(\d+)', message.get('content', ''))
+                return int(match.group(1)) + 1 if match else 1
+        return 1
+
+    # Потоковый ответ: вызов функции одним фрагментом, текст - по словам
+    def _send_stream(self, message: dict):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+
+        chunk = {'choices': [], 'created': int(time.time()), 'model': 'benchmark', 'object': 'chat.completion'}
+        if message.get('function_call'):
+            chunk['choices'] = [{'delta': message, 'index': 0, 'finish_reason': 'function_call'}]
+            self.wfile.write(f'data: {json.dumps(chunk, ensure_ascii=False)}\n\n'.encode())
+        else:
+            words = message['content'].split(' ')
+            for number, word in enumerate(words):
+                delta = {'content': word if number == 0 else ' ' + word}
+                if number == 0:
+                    delta['role'] = 'assistant'
+                chunk['choices'] = [{'delta': delta, 'index': 0}]
+                self.wfile.write(f'data: {json.dumps(chunk, ensure_ascii=False)}\n\n'.encode())
+                self.wfile.flush()
+                if self.token_latency:
+                    time.sleep(self.token_latency)
+        self.wfile.write(b'data: [DONE]\n\n')
+
+    # Обработчик POST-запросов: токен доступа и чат
+    def do_POST(self):
+        content_length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(content_length)
+
+        # Токен доступа
+        if self.path.endswith('/oauth'):
+            self._send_json({'access_token': 'benchmark', 'expires_at': int((time.time() + 1800) * 1000)})
+            return
+
+        if not self.path.endswith('/chat/completions'):
+            self.send_error(404)
+            return
+
+        chat = json.loads(body)
+        message = self._next_message(chat)
+        prompt_tokens = len(body.decode()) // self.chars_per_token
+        completion_tokens = len(json.dumps(message, ensure_ascii=False)) // self.chars_per_token
+        self.counter.add(prompt_tokens + completion_tokens)
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if chat.get('stream'):
+            self._send_stream(message)
+            return
+
+        self._send_json({
+            'choices': [{
+                'message': message,
+                'index': 0,
+                'finish_reason': 'function_call' if message.get('function_call') else 'stop'
+            }],
+            'created': int(time.time()),
+            'model': 'benchmark',
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens
+            },
+            'object': 'chat.completion'
+        })
+
+# Заменитель HTTP-сервиса проверки запросов 1С: любой запрос корректен
+class FakeCheckQueryHandler(BaseHTTPRequestHandler):
+    latency = 0.0 # Задержка ответа, сек.
+    counter = CallCounter() # Обращения к сервису
+
+    # Подавление вывода журнала запросов
+    def log_message(self, format, *args):
+        pass
+
+    # Обработчик POST-запросов
+    def do_POST(self):
+        content_length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(content_length)
+        self.counter.add()
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        body = json.dumps({'result': 'OK'}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+# Запуск HTTP-сервера в отдельном потоке на свободном порту
+def start_server(handler_class) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler_class)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# Свободный порт для веб-сервиса
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+# Сценарий по умолчанию: список таблиц, описание первой таблицы, текст запроса по ней
+def default_scenario(table_name: str) -> list[dict]:
+    return [
+        {'function_call': {'name': 'tables_list', 'arguments': {}}},
+        {'function_call': {'name': 'table_description', 'arguments': {'table_name': table_name}}},
+        {'content': f'ВЫБРАТЬ ПЕРВЫЕ {{request}} * ИЗ {table_name} КАК Т'}
+    ]
+
+# Подготовка основной папки веб-сервиса: конфигурация с адресами заменителей и загруженные метаданные
+def prepare_folder(folder: str, args, gigachat_url: str, check_url: str, port: int) -> str:
+    config = configparser.ConfigParser()
+    config.optionxform = str
+    config.read(os.path.join(script_path, 'config.ini'), encoding='utf-8')
+    for section in ('MAIN', 'GIGACHAT', 'CHECK_QUERY', 'RESPONSE_CACHE'):
+        if not config.has_section(section):
+            config.add_section(section)
+
+    config['MAIN']['port'] = str(port)
+    config['MAIN']['max_workers'] = str(args.workers)
+    config['MAIN']['metadata_watch_interval'] = '0'
+    config['GIGACHAT']['base_url'] = f'{gigachat_url}/api/v1'
+    config['GIGACHAT']['auth_url'] = f'{gigachat_url}/api/v2/oauth'
+    config['CHECK_QUERY']['url'] = check_url
+    if args.remote_check:
+        config['CHECK_QUERY']['local_check'] = 'false'
+    config['RESPONSE_CACHE']['enabled'] = 'true' if args.response_cache else 'false'
+    with open(os.path.join(folder, 'config.ini'), 'w', encoding='utf-8') as config_file:
+        config.write(config_file)
+
+    with open(os.path.join(folder, 'gigakeys.ini'), 'w', encoding='utf-8') as keys_file:
+        keys_file.write('[GIGACHAT]\nauthorization_key=YmVuY2htYXJr\nsession_id=benchmark\n')
+
+    # Файл метаданных веб-сервиса загружается в новую базу данных
+    metadata_file = args.metadata or config['MAIN'].get('metadata_file_name', '')
+    metadata_path = metadata_file if os.path.isabs(metadata_file) else os.path.join(script_path, metadata_file)
+    if not os.path.isfile(metadata_path):
+        raise Exception(f'Файл метаданных не найден: {metadata_path}')
+    shutil.copy(metadata_path, os.path.join(folder, config['MAIN']['metadata_file_name']))
+    set_main_folder(folder)
+    load_metadata()
+
+    # Первая таблица метаданных для сценария по умолчанию
+    tables = metadata_store().tables_list()
+    if not tables:
+        raise Exception('Файл метаданных не содержит описаний таблиц')
+    return tables[0]
+
+# Память процесса, МБ: текущая и пиковая (только Linux)
+def process_memory(pid: int) -> dict:
+    memory = {'rss_mb': None, 'peak_rss_mb': None}
+    try:
+        with open(f'/proc/{pid}/status', encoding='utf-8') as status_file:
+            for line in status_file:
+                key, _, value = line.partition(':')
+                if key == 'VmRSS':
+                    memory['rss_mb'] = round(int(value.split()[0]) / 1024, 1)
+                elif key == 'VmHWM':
+                    memory['peak_rss_mb'] = round(int(value.split()[0]) / 1024, 1)
+    except OSError:
+        pass
+    return memory
+
+# Идентификаторы процесса и его дочерних процессов (только Linux)
+def process_tree(pid: int) -> list[int]:
+    pids = [pid]
+    for child_pid in pids:
+        try:
+            with open(f'/proc/{child_pid}/task/{child_pid}/children', encoding='utf-8') as children_file:
+                pids.extend(int(value) for value in children_file.read().split())
+        except OSError:
+            pass
+    return pids
+
+# Память веб-сервиса, МБ: сумма по главному процессу и процессам веб-сервиса
+def service_memory(pid: int) -> dict:
+    memory = {'rss_mb': None, 'peak_rss_mb': None}
+    for process_pid in process_tree(pid):
+        for key, value in process_memory(process_pid).items():
+            if value is not None:
+                memory[key] = round((memory[key] or 0) + value, 1)
+    return memory
+
+# Ожидание готовности веб-сервиса
+def wait_service(url: str, process: subprocess.Popen, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise Exception(f'Веб-сервис завершился с кодом {process.returncode}')
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.1)
+    raise Exception('Веб-сервис не запустился')
+
+# Генератор нагрузки: заданное количество запросов с заданным количеством одновременных клиентов
+class LoadGenerator():
+    def __init__(self, url: str, prompt: str, concurrency: int, stream: bool, timeout: float):
+        self._url = url
+        self._prompt = prompt
+        self._concurrency = concurrency
+        self._stream = stream
+        self._timeout = timeout
+        self._local = threading.local() # Сессия HTTP каждого клиента
+        self._numbers = itertools.count() # Номера запросов, сквозные для всех прогонов
+
+    # Сессия HTTP текущего клиента
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            self._local.session = session
+        return session
+
+    # Один запрос: время выполнения в секундах или исключение
+    def _request(self, number: int) -> float:
+        # Задачи различаются, чтобы не срабатывал кэш ответов
+        body = {'prompt': f'{self._prompt} #{number}'}
+        if self._stream:
+            body['stream'] = True
+
+        started = time.perf_counter()
+        response = self._session().post(self._url, json=body, timeout=self._timeout, stream=self._stream)
+        response.raise_for_status()
+        if self._stream:
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith('event: '):
+                    event = line[7:]
+                    if event in ('result', 'error'):
+                        break
+            response.close()
+            if event != 'result':
+                raise Exception(f'Потоковый ответ без результата: {event}')
+        elif 'response' not in response.json():
+            raise Exception('Ответ без результата')
+        return time.perf_counter() - started
+
+    # Выполнение запросов: (времена выполнения успешных запросов, ошибки, общее время)
+    def run(self, count: int) -> tuple[list[float], list[str], float]:
+        latencies = []
+        errors = []
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self._concurrency) as executor:
+            futures = [executor.submit(self._request, next(self._numbers)) for _ in range(count)]
+            for future in futures:
+                try:
+                    latencies.append(future.result())
+                except Exception as e:
+                    errors.append(str(e))
+        return latencies, errors, time.perf_counter() - started
+
+# Процентиль по отсортированному списку (ближайший ранг)
+def percentile(values: list[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, int(round(percent / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+# Отчет о прогоне
+def make_report(latencies: list[float], errors: list[str], duration: float, memory: dict) -> dict:
+    latencies = sorted(latencies)
+    completed = len(latencies)
+    milliseconds = lambda value: round(value * 1000, 1)
+    return {
+        'requests': completed + len(errors),
+        'errors': len(errors),
+        'duration_s': round(duration, 3),
+        'throughput_rps': round(completed / duration, 2) if duration else 0.0,
+        'latency_ms': {
+            'p50': milliseconds(percentile(latencies, 50)),
+            'p95': milliseconds(percentile(latencies, 95)),
+            'p99': milliseconds(percentile(latencies, 99)),
+            'mean': milliseconds(sum(latencies) / completed) if completed else 0.0,
+            'max': milliseconds(latencies[-1]) if completed else 0.0
+        },
+        'llm_hops_per_request': round(FakeGigaChatHandler.counter.calls / completed, 2) if completed else 0.0,
+        'llm_tokens_per_request': round(FakeGigaChatHandler.counter.tokens / completed) if completed else 0,
+        'checks_per_request': round(FakeCheckQueryHandler.counter.calls / completed, 2) if completed else 0.0,
+        'memory': memory,
+        'first_errors': list(dict.fromkeys(errors))[:5]
+    }
+
+# Вывод отчета в текстовом виде
+def print_report(report: dict):
+    latency = report['latency_ms']
+    memory = report['memory']
+    print(f"Запросов: {report['requests']}, ошибок: {report['errors']}, время: {report['duration_s']} сек.")
+    print(f"Пропускная способность: {report['throughput_rps']} запросов/сек.")
+    print(f"Время ответа, мс: p50 {latency['p50']}, p95 {latency['p95']}, p99 {latency['p99']}, "
+          f"среднее {latency['mean']}, максимум {latency['max']}")
+    print(f"Обращений к модели на запрос: {report['llm_hops_per_request']}, "
+          f"токенов на запрос: {report['llm_tokens_per_request']}, "
+          f"проверок на запрос: {report['checks_per_request']}")
+    print(f"Память веб-сервиса, МБ: до нагрузки {memory['before_rss_mb']}, после {memory['rss_mb']}, "
+          f"пиковая {memory['peak_rss_mb']}")
+    for error in report['first_errors']:
+        print(f'Ошибка: {error}')
+
+# Разбор параметров командной строки
+def parse_args():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест веб-сервиса с заменителями GigaChat и проверки запросов 1С')
+    parser.add_argument('--requests', type=int, default=100, help='количество запросов (по умолчанию 100)')
+    parser.add_argument('--concurrency', type=int, default=8, help='количество одновременных клиентов (по умолчанию 8)')
+    parser.add_argument('--warmup', type=int, default=5, help='запросы прогрева, не входят в отчет (по умолчанию 5)')
+    parser.add_argument('--workers', type=int, default=8, help='параметр max_workers веб-сервиса (по умолчанию 8)')
+    parser.add_argument('--processes', type=int, default=1, help='количество процессов веб-сервиса (по умолчанию 1)')
+    parser.add_argument('--stream', action='store_true', help='потоковые запросы (Server-Sent Events)')
+    parser.add_argument('--prompt', default='Продажи за неделю с отбором по контрагенту', help='описание задачи')
+    parser.add_argument('--scenario', help='файл JSON со списком ответов модели (content или function_call), {request} - номер запроса')
+    parser.add_argument('--metadata', help='файл метаданных (по умолчанию metadata_file_name из config.ini)')
+    parser.add_argument('--llm-latency', type=float, default=0.05, help='задержка ответа модели, сек. (по умолчанию 0.05)')
+    parser.add_argument('--token-latency', type=float, default=0.0, help='задержка между фрагментами потокового ответа, сек.')
+    parser.add_argument('--check-latency', type=float, default=0.01, help='задержка проверки запроса, сек. (по умолчанию 0.01)')
+    parser.add_argument('--remote-check', action='store_true', help='отключить локальную проверку запросов')
+    parser.add_argument('--response-cache', action='store_true', help='не отключать кэш ответов')
+    parser.add_argument('--timeout', type=float, default=120, help='время ожидания ответа, сек. (по умолчанию 120)')
+    parser.add_argument('--json', action='store_true', help='вывести отчет в формате JSON')
+    parser.add_argument('--max-p95', type=float, help='допустимое время ответа p95, мс: при превышении код завершения 1')
+    parser.add_argument('--min-throughput', type=float, help='допустимая пропускная способность, запросов/сек.: при снижении код завершения 1')
+    return parser.parse_args()
+
+# Нагрузочный тест
+def main() -> int:
+    args = parse_args()
+
+    # Заменители сервисов
+    FakeGigaChatHandler.latency = args.llm_latency
+    FakeGigaChatHandler.token_latency = args.token_latency
+    FakeCheckQueryHandler.latency = args.check_latency
+    gigachat_server = start_server(FakeGigaChatHandler)
+    check_server = start_server(FakeCheckQueryHandler)
+    gigachat_url = f'http://127.0.0.1:{gigachat_server.server_address[1]}'
+    check_url = f'http://127.0.0.1:{check_server.server_address[1]}/hs/CheckQuery/Check'
+
+    folder = tempfile.mkdtemp(prefix='sql_assistant_benchmark_')
+    process = None
+    try:
+        port = free_port()
+        table_name = prepare_folder(folder, args, gigachat_url, check_url, port)
+        if args.scenario:
+            with open(args.scenario, 'r', encoding='utf-8') as scenario_file:
+                FakeGigaChatHandler.scenario = json.load(scenario_file)
+        else:
+            FakeGigaChatHandler.scenario = default_scenario(table_name)
+        FakeGigaChatHandler.chars_per_token = config_value(None, 'GIGACHAT', 'chars_per_token', 3)
+
+        # Веб-сервис в отдельном процессе
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(script_path, 'main.py'), 'start', '--workers', str(args.processes)],
+            env={**os.environ, FOLDER_VARIABLE: folder}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        url = f'http://127.0.0.1:{port}/'
+        wait_service(url, process, 30)
+
+        generator = LoadGenerator(url, args.prompt, args.concurrency, args.stream, args.timeout)
+        if args.warmup > 0:
+            generator.run(args.warmup)
+        FakeGigaChatHandler.counter.reset()
+        FakeCheckQueryHandler.counter.reset()
+
+        before = service_memory(process.pid)
+        latencies, errors, duration = generator.run(args.requests)
+        memory = service_memory(process.pid)
+        memory['before_rss_mb'] = before['rss_mb']
+
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        gigachat_server.shutdown()
+        check_server.shutdown()
+        shutil.rmtree(folder, ignore_errors=True)
+
+    report = make_report(latencies, errors, duration, memory)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+
+    # Проверка допустимых значений для CI
+    failed = report['errors'] > 0
+    if args.max_p95 is not None and report['latency_ms']['p95'] > args.max_p95:
+        failed = True
+    if args.min_throughput is not None and report['throughput_rps'] < args.min_throughput:
+        failed = True
+    return 1 if failed else 0
+
+# Код главного скрипта
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
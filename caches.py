@@ -0,0 +1,340 @@
+from collections import Counter, OrderedDict
+from typing import Any, Union
+
+import hashlib
+import json
+import math
+import sqlite3
+import threading
+import time
+
+from utilities import main_logger
+
+# Ожидание снятия блокировки базы данных кэша другим соединением, сек.
+SQLITE_CACHE_TIMEOUT = 5
+# Количество отложенных отметок об использовании записей, при котором они записываются в базу данных
+SQLITE_CACHE_ACCESS_BATCH = 100
+
+# Кэш в памяти с вытеснением давно не использованных записей и ограничением времени жизни
+class LRUCache():
+    def __init__(self, max_size: int, ttl: float):
+        self._max_size = max_size # Максимальное количество записей
+        self._ttl = ttl # Время жизни записи, сек. (0 - без ограничения)
+        self._items: OrderedDict = OrderedDict() # Ключ -> (время записи, значение)
+        self._lock = threading.Lock()
+
+    # Количество записей для функции len()
+    def __len__(self) -> int:
+        return len(self._items)
+
+    # Значение по ключу, None при отсутствии или истечении времени жизни
+    def get(self, key: str) -> Any:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+
+            created, value = item
+            if self._ttl and time.time() - created > self._ttl:
+                del self._items[key]
+                return None
+
+            self._items.move_to_end(key)
+            return value
+
+    # Запись значения по ключу
+    def put(self, key: str, value: Any):
+        with self._lock:
+            self._items[key] = (time.time(), value)
+            self._items.move_to_end(key)
+            while len(self._items) > self._max_size:
+                self._items.popitem(last=False)
+
+    # Очистка кэша
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+# Кэш в базе данных SQLite с вытеснением давно не использованных записей и ограничением времени жизни
+class SQLiteCache():
+    def __init__(self, db_path: str, table: str, max_size: int, ttl: float):
+        self._table = table
+        self._max_size = max_size # Максимальное количество записей
+        self._ttl = ttl # Время жизни записи, сек. (0 - без ограничения)
+        self._lock = threading.Lock()
+        self._accessed: dict[str, float] = {} # Отложенные отметки об использовании: ключ -> время
+
+        # Одно соединение на кэш, доступ из разных потоков под блокировкой
+        # Журнал WAL позволяет читать из других процессов во время записи, запись ждет снятия блокировки
+        self._connection = sqlite3.connect(db_path, timeout=SQLITE_CACHE_TIMEOUT, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        with self._connection:
+            self._connection.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    Key TEXT PRIMARY KEY,
+                    Value TEXT,
+                    Created REAL NOT NULL,
+                    Accessed REAL NOT NULL
+                )
+            """)
+            self._connection.execute(f"""
+                CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (Accessed)
+            """)
+
+    # Значение по ключу, None при отсутствии или истечении времени жизни
+    # Чтение не пишет в базу данных: отметки об использовании накапливаются и записываются пакетом,
+    # просроченные записи удаляются при записи
+    def get(self, key: str) -> Any:
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT Value, Created FROM {self._table} WHERE Key=?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, created = row
+            if self._ttl and now - created > self._ttl:
+                return None
+
+            self._accessed[key] = now
+            if len(self._accessed) >= SQLITE_CACHE_ACCESS_BATCH:
+                with self._connection:
+                    self._flush_accessed()
+            return value
+
+    # Запись отложенных отметок об использовании, вызывается под блокировкой в транзакции
+    def _flush_accessed(self):
+        if self._accessed:
+            accessed = [(accessed, key) for key, accessed in self._accessed.items()]
+            self._accessed.clear()
+            self._connection.executemany(
+                f"UPDATE {self._table} SET Accessed=MAX(Accessed, ?) WHERE Key=?", accessed
+            )
+
+    # Запись значения по ключу
+    def put(self, key: str, value: Any):
+        now = time.time()
+        with self._lock, self._connection:
+            self._accessed.pop(key, None)
+            self._flush_accessed()
+            self._connection.execute(f"""
+                INSERT OR REPLACE INTO {self._table} (Key, Value, Created, Accessed)
+                VALUES (?, ?, ?, ?)
+            """, (key, value, now, now))
+
+            # Удаление просроченных записей и вытеснение давно не использованных
+            if self._ttl:
+                self._connection.execute(f"DELETE FROM {self._table} WHERE Created<?", (now - self._ttl,))
+            self._connection.execute(f"""
+                DELETE FROM {self._table} WHERE Key IN (
+                    SELECT Key FROM {self._table} ORDER BY Accessed DESC LIMIT -1 OFFSET ?
+                )
+            """, (self._max_size,))
+
+    # Действующие записи (ключ, значение), начиная с недавно использованных
+    def items(self) -> list[tuple[str, Any]]:
+        now = time.time()
+        with self._lock:
+            with self._connection:
+                self._flush_accessed()
+            rows = self._connection.execute(
+                f"SELECT Key, Value, Created FROM {self._table} ORDER BY Accessed DESC LIMIT ?", (self._max_size,)
+            ).fetchall()
+        return [(key, value) for key, value, created in rows if not self._ttl or now - created <= self._ttl]
+
+    # Очистка кэша
+    def clear(self):
+        with self._lock, self._connection:
+            self._accessed.clear()
+            self._connection.execute(f"DELETE FROM {self._table}")
+
+# Двухуровневый кэш: в памяти и, при наличии, в базе данных
+# Ошибки базы данных не прерывают работу: кэш продолжает работать только в памяти
+class TieredCache():
+    def __init__(self, memory: LRUCache, persistent: SQLiteCache = None):
+        self._memory = memory
+        self._persistent = persistent
+
+    # Значение по ключу, None при отсутствии
+    def get(self, key: str) -> Any:
+        value = self._memory.get(key)
+        if value is None and self._persistent is not None:
+            try:
+                value = self._persistent.get(key)
+            except sqlite3.Error as e:
+                main_logger().warning('Ошибка чтения кэша из базы данных: %s', e)
+                return None
+            # Найденное в базе данных значение поднимается в память
+            if value is not None:
+                self._memory.put(key, value)
+        return value
+
+    # Запись значения по ключу
+    def put(self, key: str, value: Any):
+        self._memory.put(key, value)
+        if self._persistent is not None:
+            try:
+                self._persistent.put(key, value)
+            except sqlite3.Error as e:
+                main_logger().warning('Ошибка записи кэша в базу данных: %s', e)
+
+    # Действующие записи базы данных, пустой список для кэша только в памяти
+    def persistent_items(self) -> list[tuple[str, Any]]:
+        if self._persistent is None:
+            return []
+        try:
+            return self._persistent.items()
+        except sqlite3.Error as e:
+            main_logger().warning('Ошибка чтения кэша из базы данных: %s', e)
+            return []
+
+    # Очистка кэша
+    def clear(self):
+        self._memory.clear()
+        if self._persistent is not None:
+            try:
+                self._persistent.clear()
+            except sqlite3.Error as e:
+                main_logger().warning('Ошибка очистки кэша в базе данных: %s', e)
+
+# Кэш в базе данных SQLite или None, если базу данных открыть не удалось: кэш работает только в памяти
+def open_sqlite_cache(db_path: str, table: str, max_size: int, ttl: float) -> Union[SQLiteCache, None]:
+    try:
+        return SQLiteCache(db_path, table, max_size, ttl)
+    except sqlite3.Error as e:
+        main_logger().warning('Ошибка открытия кэша в базе данных %s: %s', db_path, e)
+        return None
+
+# Нормализация текста запроса пользователя: нижний регистр, ё -> е, без лишних пробелов
+# Знаки препинания и сравнения сохраняются: "сумма > 100" и "сумма < 100" - разные запросы
+def normalize_prompt(prompt: str) -> str:
+    text = prompt.lower().replace('ё', 'е')
+    return ' '.join(text.split())
+
+# Вектор символьных n-грамм текста: n-грамма -> количество
+def ngram_vector(text: str, ngram_size: int) -> Counter:
+    padded = f' {text} '
+    return Counter(padded[i:i + ngram_size] for i in range(max(len(padded) - ngram_size + 1, 1)))
+
+# Кэш ответов на запросы пользователей
+# Ответ находится по нормализованному тексту запроса, а при заданном пороге сходства -
+# и по близкому запросу: косинусной мере векторов символьных n-грамм.
+# Область (версия метаданных, модель) входит в ключ - ответы другой области не находятся
+class ResponseCache():
+    def __init__(self, cache: TieredCache, max_size: int, similarity_threshold: float = 0.0, ngram_size: int = 3):
+        self._cache = cache
+        self._max_size = max_size # Максимальное количество запросов в индексе сходства
+        self._similarity_threshold = similarity_threshold # Порог сходства, 0 - только точное совпадение
+        self._ngram_size = ngram_size
+        self._vectors: OrderedDict = OrderedDict() # Ключ -> (область, вектор, норма вектора)
+        self._postings: dict[str, set[str]] = {} # n-грамма -> ключи запросов
+        self._lock = threading.Lock()
+
+        # Индекс сходства по записям, сохраненным в базе данных
+        if self._similarity_threshold > 0:
+            for key, value in reversed(self._cache.persistent_items()):
+                entry = self._entry(value)
+                if entry is not None:
+                    self._index(key, entry['scope'], entry['prompt'])
+
+    # Ключ записи по области и нормализованному запросу
+    def _key(self, scope: str, normalized: str) -> str:
+        return hashlib.sha1(f'{scope}\n{normalized}'.encode()).hexdigest()
+
+    # Разбор сохраненной записи
+    def _entry(self, value: Any) -> dict:
+        try:
+            entry = json.loads(value)
+        except (TypeError, ValueError):
+            return None
+        return entry if isinstance(entry, dict) else None
+
+    # Добавление запроса в индекс сходства
+    def _index(self, key: str, scope: str, normalized: str):
+        if self._similarity_threshold <= 0:
+            return
+        vector = ngram_vector(normalized, self._ngram_size)
+        norm = math.sqrt(sum(count * count for count in vector.values()))
+        with self._lock:
+            if key in self._vectors:
+                self._vectors.move_to_end(key)
+                return
+            self._vectors[key] = (scope, vector, norm)
+            for ngram in vector:
+                self._postings.setdefault(ngram, set()).add(key)
+            # Вытеснение давно добавленных запросов
+            while len(self._vectors) > self._max_size:
+                self._unindex_locked(next(iter(self._vectors)))
+
+    # Удаление запроса из индекса сходства (под блокировкой)
+    def _unindex_locked(self, key: str):
+        item = self._vectors.pop(key, None)
+        if item is None:
+            return
+        for ngram in item[1]:
+            keys = self._postings.get(ngram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[ngram]
+
+    # Ключ наиболее похожего запроса той же области, None - похожих нет
+    def _similar(self, scope: str, normalized: str) -> str:
+        vector = ngram_vector(normalized, self._ngram_size)
+        norm = math.sqrt(sum(count * count for count in vector.values()))
+        if norm == 0:
+            return None
+
+        with self._lock:
+            # Скалярные произведения только с запросами, имеющими общие n-граммы
+            products: Counter = Counter()
+            for ngram, count in vector.items():
+                for key in self._postings.get(ngram, ()):
+                    products[key] += count * self._vectors[key][1][ngram]
+
+            best_key, best_similarity = None, 0.0
+            for key, product in products.items():
+                key_scope, _, key_norm = self._vectors[key]
+                if key_scope != scope:
+                    continue
+                similarity = product / (norm * key_norm)
+                if similarity > best_similarity:
+                    best_key, best_similarity = key, similarity
+
+        if best_similarity >= self._similarity_threshold:
+            return best_key
+        return None
+
+    # Ответ на запрос, None при отсутствии
+    def get(self, scope: str, prompt: str) -> Any:
+        normalized = normalize_prompt(prompt)
+        key = self._key(scope, normalized)
+        entry = self._entry(self._cache.get(key))
+        if entry is None and self._similarity_threshold > 0:
+            key = self._similar(scope, normalized)
+            if key is not None:
+                entry = self._entry(self._cache.get(key))
+                # Запись вытеснена из кэша - убираем ее и из индекса
+                if entry is None:
+                    with self._lock:
+                        self._unindex_locked(key)
+        if entry is None:
+            return None
+        self._index(key, scope, entry['prompt'])
+        return entry['response']
+
+    # Запись ответа на запрос
+    def put(self, scope: str, prompt: str, response: Any):
+        normalized = normalize_prompt(prompt)
+        key = self._key(scope, normalized)
+        entry = {'scope': scope, 'prompt': normalized, 'response': response}
+        self._cache.put(key, json.dumps(entry, ensure_ascii=False))
+        self._index(key, scope, normalized)
+
+    # Очистка кэша
+    def clear(self):
+        self._cache.clear()
+        with self._lock:
+            self._vectors.clear()
+            self._postings.clear()
\ No newline at end of file
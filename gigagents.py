@@ -1,24 +1,77 @@
 from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Callable, Iterator
 
+from abc import ABC, abstractmethod
+
+import asyncio
+import json
+import math
 import os
+import queue
+import threading
+import time
 
 from gigachat import GigaChat
 import gigachat.context
 from gigachat.exceptions import AuthenticationError, ResponseError
-from gigachat.models import Chat, Messages, MessagesRole
-
-from utilities import config_value, main_folder
-
-from agents import AIAgentMessage, BaseAIFunctions, BaseAIAgent
+from gigachat.models import AccessToken, Chat, ChatCompletionChunk, Messages, MessagesRole
+
+from tracing import span
+from utilities import aclose_on_loop_shutdown, config_value, main_folder
+
+from agents import AIAgentMessage, BaseAIFunctions, BaseAIAgent, BaseAIAgentObserver
+
+# Базовый счетчик токенов
+class BaseTokenCounter(ABC):
+    # Количество токенов в тексте
+    @abstractmethod
+    def count(self, text: str) -> int:
+        pass
+
+# Оценка количества токенов по длине текста
+class EstimateTokenCounter(BaseTokenCounter):
+    def __init__(self, chars_per_token: float):
+        self._chars_per_token = chars_per_token # Среднее количество символов в токене
+
+    # Количество токенов в тексте
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        return math.ceil(len(text) / self._chars_per_token)
+
+# Экземпляр счетчика токенов
+_TOKEN_COUNTER = None
+
+# Установка счетчика токенов, например, на основе локального токенизатора модели
+def set_token_counter(counter: BaseTokenCounter):
+    global _TOKEN_COUNTER
+    _TOKEN_COUNTER = counter
+
+# Счетчик токенов
+def token_counter() -> BaseTokenCounter:
+    global _TOKEN_COUNTER
+    if _TOKEN_COUNTER is None:
+        chars_per_token = config_value(None, 'GIGACHAT', 'chars_per_token', 3)
+        _TOKEN_COUNTER = EstimateTokenCounter(chars_per_token)
+    return _TOKEN_COUNTER
+
+# Результат функции, повторенный позже в истории
+_REPEATED_RESULT = json.dumps({'result': 'Результат повторяется далее'}, ensure_ascii=False)
 
 # История сообщений GigaChat
 class GigaChatHistory():
-    def __init__(self, system_prompt: str):
-        # Ограничение максимального размера контекста
+    def __init__(self, system_prompt: str, counter: BaseTokenCounter = None, compactors: dict[str, Callable[[str], str]] = None):
+        # Ограничение максимального размера контекста в токенах
         max_context_length = config_value(None, 'GIGACHAT', 'max_context_length', None)
         if max_context_length is None:
             raise Exception('Максимальная длина контекста GigaChat не установлена')
         self._max_context_length = max_context_length
+        self._counter = token_counter() if counter is None else counter
+
+        # Сжатие результатов функций при переполнении контекста: имя функции -> функция сжатия
+        self._compaction = config_value(None, 'GIGACHAT', 'context_compaction', True) is True
+        self._compactors = {} if compactors is None else compactors
 
         # Первое сообщение всегда системный промпт
         message = Messages(
@@ -27,28 +80,103 @@ class GigaChatHistory():
         )
         self._messages = deque([message])
 
+        # Размеры сообщений и их сумма поддерживаются при добавлении и удалении
+        size = self._message_size(message)
+        self._sizes = deque([size])
+        self._context_size = size
+
+        # Признаки сжатия сообщений и количество еще не сжатых результатов функций
+        self._compacted = deque([True])
+        self._uncompacted_count = 0
+
     # Количество сообщений в истории для функции len()
     def __len__(self) -> int:
         return len(self._messages)
 
-    # Размер контекста как сумма длины всех сообщений
-    def _context_length(self) -> int:
-        return sum(len(message.content) for message in self._messages)
+    # Размер сообщения в токенах
+    def _message_size(self, message: Messages) -> int:
+        size = self._counter.count(message.content)
+        if message.function_call is not None:
+            size += self._counter.count(message.function_call.name)
+            if message.function_call.arguments:
+                size += self._counter.count(json.dumps(message.function_call.arguments, ensure_ascii=False))
+        return size
+
+    # Размер контекста в токенах
+    def context_length(self) -> int:
+        return self._context_size
+
+    # Удаление самого старого сообщения (кроме системного промта)
+    def _del_oldest_message(self):
+        if not self._compacted[1]:
+            self._uncompacted_count -= 1
+        del self._messages[1]
+        self._context_size -= self._sizes[1]
+        del self._sizes[1]
+        del self._compacted[1]
+
+    # Сжатие результатов функций без потери нужной модели информации
+    def _compact(self):
+        # Проход от новых сообщений к старым: более старый повтор результата заменяется ссылкой
+        seen = set()
+        for index in range(len(self._messages) - 1, 0, -1):
+            message = self._messages[index]
+            if message.role != MessagesRole.FUNCTION:
+                continue
+
+            # Сжатие содержимого результата
+            content = message.content
+            if not self._compacted[index]:
+                compactor = self._compactors.get(message.name)
+                if compactor is not None:
+                    content = compactor(content)
+                self._compacted[index] = True
+                self._uncompacted_count -= 1
+
+            # Удаление повторов
+            key = (message.name, content)
+            if key in seen:
+                content = _REPEATED_RESULT
+            else:
+                seen.add(key)
+
+            # Замена сообщения сжатым
+            if content != message.content:
+                message = Messages(
+                    role=MessagesRole.FUNCTION,
+                    content=content,
+                    name=message.name
+                )
+                size = self._message_size(message)
+                self._messages[index] = message
+                self._context_size += size - self._sizes[index]
+                self._sizes[index] = size
 
     # Ограничение максимального размера контекста
     def _enforce_context_limit(self):
+        # Сначала сжатие результатов функций
+        if self._compaction and self._uncompacted_count > 0 and self.context_length() > self._max_context_length:
+            self._compact()
+
         # Удаление самого старого сообщение (кроме системного промта)
-        while len(self) > 2 and self._context_length() > self._max_context_length:
-            del self._messages[1]
+        while len(self) > 2 and self.context_length() > self._max_context_length:
+            self._del_oldest_message()
 
         # Контроль: втрое сообщение должно быть от пользователя
         if len(self) > 2 and self._messages[1].role != MessagesRole.USER:
-            del self._messages[1]
+            self._del_oldest_message()
 
     # Добавление любого сообщения GigaChat
     def add_message(self, message: Messages):
         # Добавление сообщения
+        size = self._message_size(message)
         self._messages.append(message)
+        self._sizes.append(size)
+        self._context_size += size
+        is_function = message.role == MessagesRole.FUNCTION
+        self._compacted.append(not is_function)
+        if is_function:
+            self._uncompacted_count += 1
         # Контроль размера контекста
         self._enforce_context_limit()
 
@@ -90,9 +218,345 @@ class GigaChatHistory():
     def messages(self) -> list[Messages]:
         return list(self._messages)
 
+# Асинхронные клиенты GigaChat одного цикла событий
+class _AsyncClients():
+    def __init__(self):
+        self.free = asyncio.LifoQueue() # Свободные клиенты
+        self.created: list[GigaChat] = [] # Созданные клиенты, закрываются при завершении цикла событий
+        self.closer: AsyncIterator = None # Асинхронный генератор, закрывающий клиенты
+        self.token_lock = asyncio.Lock() # Токен обновляет одна сопрограмма, остальные ждут ее результата
+
+# Пул клиентов GigaChat
+# Клиенты переиспользуются между агентами и запросами: соединения остаются открытыми,
+# токен доступа общий для всех клиентов пула и обновляется заранее до истечения срока действия
+class GigaChatClientPool():
+    def __init__(self, authorization_key: str, pool_size: int, token_refresh_margin: float,
+                 base_url: str = None, auth_url: str = None):
+        self._authorization_key = authorization_key
+        self._pool_size = pool_size # Максимальное количество клиентов
+        self._token_refresh_margin = token_refresh_margin # Запас времени до истечения токена, сек.
+
+        # Адреса API и получения токена, если отличаются от адресов сервиса GigaChat
+        self._urls = {}
+        if base_url:
+            self._urls['base_url'] = base_url
+        if auth_url:
+            self._urls['auth_url'] = auth_url
+
+        self._clients = queue.LifoQueue() # Свободные клиенты
+        self._clients_count = 0 # Количество созданных клиентов
+        self._access_token: AccessToken = None # Общий токен доступа
+        self._lock = threading.Lock()
+        self._token_lock = threading.Lock()
+
+        # Асинхронные клиенты привязаны к циклу событий, в котором созданы: у каждого цикла свои клиенты
+        self._apools: dict[asyncio.AbstractEventLoop, _AsyncClients] = {}
+
+    # Создание клиента GigaChat
+    def _create_client(self) -> GigaChat:
+        return GigaChat(
+            credentials=self._authorization_key,
+            scope="GIGACHAT_API_PERS",
+            verify_ssl_certs=False,
+            **self._urls
+        )
+
+    # Получение свободного клиента
+    def _acquire(self) -> GigaChat:
+        # Свободный клиент из пула
+        try:
+            return self._clients.get_nowait()
+        except queue.Empty:
+            pass
+
+        # Новый клиент, если пул еще не заполнен
+        with self._lock:
+            can_create = self._clients_count < self._pool_size
+            if can_create:
+                self._clients_count += 1
+        if can_create:
+            try:
+                return self._create_client()
+            except Exception:
+                with self._lock:
+                    self._clients_count -= 1
+                raise
+
+        # Ожидание освобождения клиента
+        return self._clients.get()
+
+    # Асинхронные клиенты текущего цикла событий
+    async def _async_clients(self) -> _AsyncClients:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = self._apools.get(loop)
+            if clients is not None:
+                return clients
+            # Клиенты завершившихся циклов событий уже закрыты
+            for closed_loop in [key for key in self._apools if key.is_closed()]:
+                del self._apools[closed_loop]
+            clients = self._apools[loop] = _AsyncClients()
+
+        # Клиенты закрываются при завершении цикла событий, пока их соединения еще можно закрыть
+        clients.closer = await aclose_on_loop_shutdown(clients.created)
+        return clients
+
+    # Получение свободного асинхронного клиента
+    async def _aacquire(self) -> GigaChat:
+        clients = await self._async_clients()
+        with self._lock:
+            # Свободный клиент из пула
+            if not clients.free.empty():
+                return clients.free.get_nowait()
+
+            # Новый клиент, если пул еще не заполнен
+            if len(clients.created) < self._pool_size:
+                giga = self._create_client()
+                clients.created.append(giga)
+                return giga
+
+        # Ожидание освобождения клиента
+        return await clients.free.get()
+
+    # Сохранение токена, обновленного клиентом
+    def _keep_token(self, giga: GigaChat):
+        # Клиент мог сам обновить токен после ошибки авторизации - запоминаем новый токен
+        access_token = giga._access_token
+        if access_token is not None:
+            with self._token_lock:
+                if self._access_token is None or access_token.expires_at > self._access_token.expires_at:
+                    self._access_token = access_token
+
+    # Возврат клиента в пул
+    def _release(self, giga: GigaChat):
+        self._keep_token(giga)
+        self._clients.put(giga)
+
+    # Возврат асинхронного клиента в пул
+    def _arelease(self, giga: GigaChat, loop: asyncio.AbstractEventLoop):
+        self._keep_token(giga)
+        clients = self._apools.get(loop)
+        if clients is not None:
+            clients.free.put_nowait(giga)
+
+    # Токен требует обновления
+    def _token_expiring(self) -> bool:
+        if self._access_token is None:
+            return True
+        return self._access_token.expires_at / 1000 - time.time() < self._token_refresh_margin
+
+    # Установка действующего токена доступа клиенту
+    # Общий токен передается клиенту напрямую: библиотека принимает токен только при создании клиента
+    def _set_token(self, giga: GigaChat):
+        if self._token_expiring():
+            with self._token_lock:
+                # Токен мог обновить другой поток, пока ожидали блокировку
+                if self._token_expiring():
+                    with span('gigachat.token'):
+                        self._access_token = giga.get_token()
+        giga._access_token = self._access_token
+
+    # Асинхронная установка действующего токена доступа клиенту
+    async def _aset_token(self, giga: GigaChat):
+        if self._token_expiring():
+            clients = await self._async_clients()
+            async with clients.token_lock:
+                # Токен могла обновить другая сопрограмма, пока ожидали блокировку
+                if self._token_expiring():
+                    with span('gigachat.token'):
+                        access_token = await giga.aget_token()
+                    with self._token_lock:
+                        if self._access_token is None or access_token.expires_at > self._access_token.expires_at:
+                            self._access_token = access_token
+        giga._access_token = self._access_token
+
+    # Клиент GigaChat из пула
+    @contextmanager
+    def client(self) -> Iterator[GigaChat]:
+        giga = self._acquire()
+        try:
+            self._set_token(giga)
+            yield giga
+        finally:
+            self._release(giga)
+
+    # Асинхронный клиент GigaChat из пула
+    @asynccontextmanager
+    async def aclient(self) -> AsyncIterator[GigaChat]:
+        loop = asyncio.get_running_loop()
+        giga = await self._aacquire()
+        try:
+            await self._aset_token(giga)
+            yield giga
+        finally:
+            self._arelease(giga, loop)
+
+    # Закрытие всех свободных клиентов
+    def close(self):
+        while True:
+            try:
+                giga = self._clients.get_nowait()
+            except queue.Empty:
+                break
+            giga.close()
+            with self._lock:
+                self._clients_count -= 1
+
+# Экземпляр пула клиентов GigaChat
+_GIGACHAT_CLIENT_POOL = None
+_GIGACHAT_CLIENT_POOL_LOCK = threading.Lock()
+
+# Пул клиентов GigaChat, общий для всех агентов и запросов
+def gigachat_client_pool(authorization_key: str) -> GigaChatClientPool:
+    global _GIGACHAT_CLIENT_POOL
+    with _GIGACHAT_CLIENT_POOL_LOCK:
+        if _GIGACHAT_CLIENT_POOL is None:
+            # Параметры пула
+            pool_size = config_value(None, 'GIGACHAT', 'client_pool_size', 8)
+            token_refresh_margin = config_value(None, 'GIGACHAT', 'token_refresh_margin', 60)
+            base_url = config_value(None, 'GIGACHAT', 'base_url', None)
+            auth_url = config_value(None, 'GIGACHAT', 'auth_url', None)
+            _GIGACHAT_CLIENT_POOL = GigaChatClientPool(
+                authorization_key, pool_size, token_refresh_margin, base_url, auth_url
+            )
+        return _GIGACHAT_CLIENT_POOL
+
+# Ограничитель обращений к GigaChat, общий для всех агентов и запросов процесса
+# Два ограничителя (token bucket): запросы в секунду и оценка токенов в минуту. Запрос с большой оценкой токенов
+# допускается при положительном запасе и уводит запас в минус, после ответа оценка заменяется фактическим расходом.
+# При ответе 429 обращения приостанавливаются (пауза удваивается при повторах, заголовок Retry-After имеет приоритет),
+# допустимая частота снижается вдвое и восстанавливается после успешных ответов
+class GigaChatRateLimiter():
+    def __init__(self, requests_per_second: float, tokens_per_minute: float, backoff: float, max_backoff: float):
+        self._request_rate = requests_per_second # 0 - без ограничения
+        self._token_rate = tokens_per_minute / 60 # 0 - без ограничения
+        self._request_burst = max(1.0, requests_per_second)
+        self._token_burst = tokens_per_minute
+        self._requests = self._request_burst # Запас запросов
+        self._tokens = self._token_burst # Запас токенов
+        self._updated = time.monotonic()
+
+        self._initial_backoff = backoff
+        self._max_backoff = max_backoff
+        self._backoff = backoff # Пауза при следующем ответе 429, сек.
+        self._blocked_until = 0.0 # Обращения приостановлены до
+        self._factor = 1.0 # Доля допустимой частоты после ответов 429
+        self._lock = threading.Lock()
+
+    # Пополнение запасов на текущий момент
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        if self._request_rate > 0:
+            self._requests = min(self._request_burst, self._requests + elapsed * self._request_rate * self._factor)
+        if self._token_rate > 0:
+            self._tokens = min(self._token_burst, self._tokens + elapsed * self._token_rate * self._factor)
+
+    # Резервирование обращения, возвращает 0 или время ожидания до следующей попытки, сек.
+    def _reserve(self, tokens: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            self._refill(now)
+
+            wait = 0.0
+            if self._request_rate > 0 and self._requests < 1:
+                wait = (1 - self._requests) / (self._request_rate * self._factor)
+            if self._token_rate > 0 and self._tokens <= 0:
+                wait = max(wait, (1 - self._tokens) / (self._token_rate * self._factor))
+            if wait > 0:
+                return wait
+
+            if self._request_rate > 0:
+                self._requests -= 1
+            if self._token_rate > 0:
+                self._tokens -= tokens
+            return 0.0
+
+    # Ожидание возможности обращения с оценкой расхода токенов, возвращает время ожидания, сек.
+    def acquire(self, tokens: int) -> float:
+        started = time.monotonic()
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return time.monotonic() - started
+            time.sleep(wait)
+
+    # Асинхронное ожидание возможности обращения
+    async def aacquire(self, tokens: int) -> float:
+        started = time.monotonic()
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return time.monotonic() - started
+            await asyncio.sleep(wait)
+
+    # Учет успешного ответа: оценка токенов заменяется фактическим расходом, частота восстанавливается
+    def settle(self, estimated: int, used: int):
+        with self._lock:
+            if self._token_rate > 0:
+                self._tokens += estimated - used
+            self._backoff = self._initial_backoff
+            self._factor = min(1.0, self._factor * 1.1)
+
+    # Учет ответа GigaChat с ошибкой: токены, зарезервированные неудачным обращением, возвращаются
+    # Возвращает паузу перед повтором при превышении лимитов сервиса (429), None - ошибка другого рода
+    def throttled(self, error: ResponseError, estimated: int = 0):
+        with self._lock:
+            if self._token_rate > 0:
+                self._tokens = min(self._token_burst, self._tokens + estimated)
+        if len(error.args) < 2 or error.args[1] != 429:
+            return None
+        headers = error.args[3] if len(error.args) > 3 and error.args[3] is not None else {}
+        with self._lock:
+            try:
+                delay = float(headers.get('Retry-After'))
+            except (TypeError, ValueError):
+                delay = self._backoff
+                self._backoff = min(self._max_backoff, self._backoff * 2)
+            self._factor = max(0.1, self._factor / 2)
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+        return delay
+
+# Экземпляр ограничителя обращений к GigaChat
+_GIGACHAT_RATE_LIMITER = None
+_GIGACHAT_RATE_LIMITER_LOCK = threading.Lock()
+
+# Ограничитель обращений к GigaChat, общий для всех агентов и запросов
+def gigachat_rate_limiter() -> GigaChatRateLimiter:
+    global _GIGACHAT_RATE_LIMITER
+    with _GIGACHAT_RATE_LIMITER_LOCK:
+        if _GIGACHAT_RATE_LIMITER is None:
+            _GIGACHAT_RATE_LIMITER = GigaChatRateLimiter(
+                config_value(None, 'GIGACHAT', 'requests_per_second', 0),
+                config_value(None, 'GIGACHAT', 'tokens_per_minute', 0),
+                config_value(None, 'GIGACHAT', 'rate_limit_backoff', 1),
+                config_value(None, 'GIGACHAT', 'rate_limit_max_backoff', 60)
+            )
+        return _GIGACHAT_RATE_LIMITER
+
+# Размер запроса к чату в символах для трассировки
+def _prompt_chars(chat: Chat) -> int:
+    return sum(len(message.content or '') for message in chat.messages)
+
+# Размер ответа чата в символах для трассировки
+def _completion_chars(chat_message: Messages) -> int:
+    size = len(chat_message.content or '')
+    if chat_message.function_call is not None:
+        size += len(json.dumps(chat_message.function_call.arguments, ensure_ascii=False))
+    return size
+
+# Расход токенов по ответу GigaChat для трассировки
+def _trace_usage(chat_span, completion):
+    usage = getattr(completion, 'usage', None)
+    if usage is not None:
+        chat_span.set('prompt_tokens', usage.prompt_tokens)
+        chat_span.set('completion_tokens', usage.completion_tokens)
+
 # Базовый класс GigaChat AI-агента
 class BaseGigaChatAIAgent(BaseAIAgent):
-    def __init__(self, system_prompt: str, model: str, functions: list):
+    def __init__(self, system_prompt: str, model: str, functions: list, compactors: dict[str, Callable[[str], str]] = None):
         # Личные данные храним в отдельном файле
         config_path = os.path.join(main_folder(), 'gigakeys.ini')
 
@@ -112,12 +576,20 @@ class BaseGigaChatAIAgent(BaseAIAgent):
         self._model = model
         self._system_prompt = system_prompt
         self._functions = functions
+        self._compactors = compactors # Функции сжатия результатов функций
+
+        # Наблюдатель, получающий фрагменты ответа модели по мере генерации
+        self._observer: BaseAIAgentObserver = None
+
+        # Повторы обращения при превышении лимитов GigaChat и бюджет токенов запроса (0 - без ограничения)
+        self._rate_limit_retries = config_value(None, 'GIGACHAT', 'rate_limit_retries', 3)
+        self._token_budget = config_value(None, 'GIGACHAT', 'request_token_budget', 0)
 
         # Очистка контекста
         self.clear_context()
 
-    # Ответ на вопрос
-    def _answer(self, content: str, function: str, is_answer: bool = False) -> AIAgentMessage:
+    # Добавление вопроса в историю и формирование запроса к чату
+    def _chat(self, content: str, function: str, is_answer: bool) -> Chat:
         # Добавление резултата функции в чат
         if is_answer:
             self._chat_history.add_function_content(content, function)
@@ -126,33 +598,33 @@ class BaseGigaChatAIAgent(BaseAIAgent):
         else:
             self._chat_history.add_user_content(content)
         
-        # Экземпляр чата с GigaChat
-        with GigaChat(
-            credentials=self._authorization_key,
-            scope="GIGACHAT_API_PERS",
-            verify_ssl_certs=False
-        ) as giga:
-            gigachat.context.session_id_cvar.set(self._headers.get("X-Session-ID"))
-
-            # Новое сообщение в чат
-            chat = Chat(
-                messages=self._chat_history.messages(),
-                model=self._model,
-                functions=self._functions
-            )
-
-            # Получение ответа от чата
-            try:
-                response = giga.chat(chat)
-
-            except AuthenticationError as e:
-                raise Exception(f"Ошибка авторизации в GigaChat: {e}")
-
-            except ResponseError as e:
-                raise Exception(f"Ошибка получения ответа GigaChat: {e}")
+        # Новое сообщение в чат
+        return Chat(
+            messages=self._chat_history.messages(),
+            model=self._model,
+            functions=self._functions
+        )
 
+    # Добавление фрагмента потокового ответа к сообщению чата
+    def _add_chunk(self, chat_message: Messages, chunk: ChatCompletionChunk):
+        if not chunk.choices:
+            return
+        delta = chunk.choices[0].delta
+
+        # Текст ответа передаем наблюдателю сразу по получении
+        if delta.content:
+            chat_message.content += delta.content
+            self._observer.on_token(delta.content)
+
+        # Вызов функции приходит целиком
+        if delta.function_call is not None:
+            chat_message.function_call = delta.function_call
+        if delta.functions_state_id:
+            chat_message.functions_state_id = delta.functions_state_id
+
+    # Добавление ответа чата в историю и формирование сообщения AI-агента
+    def _chat_answer(self, chat_message: Messages) -> AIAgentMessage:
         # Добавление ответа ассистента в чат
-        chat_message = response.choices[0].message
         self._chat_history.add_message(chat_message)
 
         answer = AIAgentMessage()
@@ -167,12 +639,133 @@ class BaseGigaChatAIAgent(BaseAIAgent):
 
         return answer
 
+    # Ответ на вопрос
+    def _answer(self, content: str, function: str, is_answer: bool = False) -> AIAgentMessage:
+        chat = self._chat(content, function, is_answer)
+        limiter = gigachat_rate_limiter()
+        estimated = self._chat_history.context_length() # Оценка токенов запроса
+        attempt = 0
+
+        try:
+            while True:
+                # Ожидание возможности обращения в пределах лимитов GigaChat
+                with span('gigachat.rate_limit', estimated_tokens=estimated):
+                    limiter.acquire(estimated)
+
+                chat_message = Messages(role=MessagesRole.ASSISTANT, content='')
+                try:
+                    # Клиент GigaChat из общего пула
+                    with gigachat_client_pool(self._authorization_key).client() as giga:
+                        gigachat.context.session_id_cvar.set(self._headers.get("X-Session-ID"))
+
+                        with span('gigachat.chat', prompt_chars=_prompt_chars(chat)) as chat_span:
+                            # Получение ответа от чата целиком
+                            if self._observer is None:
+                                completion = giga.chat(chat)
+                                chat_message = completion.choices[0].message
+                                _trace_usage(chat_span, completion)
+
+                            # Получение ответа от чата по частям
+                            else:
+                                completion = None
+                                for chunk in giga.stream(chat):
+                                    self._add_chunk(chat_message, chunk)
+                            chat_span.set('completion_chars', _completion_chars(chat_message))
+                    break
+
+                except ResponseError as e:
+                    # При превышении лимитов сервиса обращение повторяется после паузы,
+                    # если наблюдатель еще не получил части ответа
+                    if limiter.throttled(e, estimated) is None or attempt >= self._rate_limit_retries or chat_message.content:
+                        raise
+                    attempt += 1
+
+        except AuthenticationError as e:
+            raise Exception(f"Ошибка авторизации в GigaChat: {e}")
+
+        except ResponseError as e:
+            raise Exception(f"Ошибка получения ответа GigaChat: {e}")
+
+        self._spend_tokens(limiter, estimated, completion, chat_message)
+        return self._chat_answer(chat_message)
+
+    # Асинхронный ответ на вопрос
+    async def _aanswer(self, content: str, function: str, is_answer: bool = False) -> AIAgentMessage:
+        chat = self._chat(content, function, is_answer)
+        limiter = gigachat_rate_limiter()
+        estimated = self._chat_history.context_length() # Оценка токенов запроса
+        attempt = 0
+
+        try:
+            while True:
+                # Ожидание возможности обращения в пределах лимитов GigaChat
+                with span('gigachat.rate_limit', estimated_tokens=estimated):
+                    await limiter.aacquire(estimated)
+
+                chat_message = Messages(role=MessagesRole.ASSISTANT, content='')
+                try:
+                    # Асинхронный клиент GigaChat из общего пула
+                    async with gigachat_client_pool(self._authorization_key).aclient() as giga:
+                        gigachat.context.session_id_cvar.set(self._headers.get("X-Session-ID"))
+
+                        with span('gigachat.chat', prompt_chars=_prompt_chars(chat)) as chat_span:
+                            # Получение ответа от чата целиком
+                            if self._observer is None:
+                                completion = await giga.achat(chat)
+                                chat_message = completion.choices[0].message
+                                _trace_usage(chat_span, completion)
+
+                            # Получение ответа от чата по частям
+                            else:
+                                completion = None
+                                async for chunk in giga.astream(chat):
+                                    self._add_chunk(chat_message, chunk)
+                            chat_span.set('completion_chars', _completion_chars(chat_message))
+                    break
+
+                except ResponseError as e:
+                    # При превышении лимитов сервиса обращение повторяется после паузы,
+                    # если наблюдатель еще не получил части ответа
+                    if limiter.throttled(e, estimated) is None or attempt >= self._rate_limit_retries or chat_message.content:
+                        raise
+                    attempt += 1
+
+        except AuthenticationError as e:
+            raise Exception(f"Ошибка авторизации в GigaChat: {e}")
+
+        except ResponseError as e:
+            raise Exception(f"Ошибка получения ответа GigaChat: {e}")
+
+        self._spend_tokens(limiter, estimated, completion, chat_message)
+        return self._chat_answer(chat_message)
+
+    # Учет расхода токенов обращения: фактический по ответу GigaChat или оценка для потокового ответа
+    def _spend_tokens(self, limiter: GigaChatRateLimiter, estimated: int, completion, chat_message: Messages):
+        usage = getattr(completion, 'usage', None)
+        if usage is not None:
+            used = usage.total_tokens
+        else:
+            used = estimated + token_counter().count(chat_message.content)
+        limiter.settle(estimated, used)
+        self._used_tokens += used
+
+    # Превышает ли обращение к GigaChat с заданным сообщением бюджет токенов запроса
+    def _over_budget(self, content: str) -> bool:
+        if self._token_budget <= 0:
+            return False
+        estimated = self._chat_history.context_length() + token_counter().count(content)
+        return self._used_tokens + estimated > self._token_budget
+
     # Возможность дать ответ
     def can_handle(self, question: AIAgentMessage) -> float:
         if question.function == BaseAIFunctions.content:
             return 1.0
         return 0.0
 
+    # Установка наблюдателя за ходом работы
+    def set_observer(self, observer: BaseAIAgentObserver):
+        self._observer = observer
+
     # Ответ на вопрос
     def answer(self, question: AIAgentMessage) -> AIAgentMessage:
         # Получение ответа на вопрос
@@ -182,7 +775,17 @@ class BaseGigaChatAIAgent(BaseAIAgent):
             answer.done = True
         return answer
 
+    # Асинхронный ответ на вопрос
+    async def aanswer(self, question: AIAgentMessage) -> AIAgentMessage:
+        # Получение ответа на вопрос
+        answer = await self._aanswer(question.content, question.function, question.is_answer)
+        # По умолчанию обычный контент (не вызов функции) провоцирует завершение работы
+        if answer.function == BaseAIFunctions.content:
+            answer.done = True
+        return answer
+
     # Очистка контекста
     def clear_context(self):
         # Новая история чата с GigaChat
-        self._chat_history = GigaChatHistory(self._system_prompt)
\ No newline at end of file
+        self._chat_history = GigaChatHistory(self._system_prompt, compactors=self._compactors)
+        self._used_tokens = 0 # Расход токенов запроса
\ No newline at end of file
@@ -1,22 +1,35 @@
 import os
 import sys
 
+import hmac
 import json
+import multiprocessing
+import re
+import signal
+import socket
+import threading
+import time
+import uuid
 
 import logging
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from http.server import BaseHTTPRequestHandler, HTTPServer
 
-from agents import BaseAIAgentManager, AIAgentMessage
-from assistagents import TablesListAgent, TableDescriptionAgent, SQLAssistantAgent, CheckQueryAgent
-from metadata import load_metadata
-from utilities import set_main_folder, config_value, set_logging_level, main_logger
+from admission import LANES, AdmissionController, AdmissionRejected
+from agents import BaseAIAgentManager, BaseAIAgentObserver, BaseAIFunctions, AIAgentMessage
+from assistagents import AIFunctions, TablesListAgent, TableDescriptionAgent, SQLAssistantAgent, CheckQueryAgent
+from assistagents import response_cache, response_cache_scope
+from metadata import load_metadata, metadata_reloader, prepare_metadata_snapshot, use_metadata_snapshot
+from tracing import metrics_registry, span, trace_request
+from utilities import set_main_folder, config_value, install_reload_signal, set_logging_level, main_logger
 
 # Путm к папкам скрипта
 script_path = os.path.dirname(os.path.abspath(__file__))
 
-# Устанавливаем основную папку проекта
-set_main_folder(script_path)
+# Устанавливаем основную папку проекта: папка скрипта, если другая не задана переменной окружения
+set_main_folder(os.environ.get('SQL_ASSISTANT_FOLDER') or script_path)
 
 # Определение режима запуска
 DEBUG_MODE = True
@@ -27,6 +40,21 @@ for arg in reversed(sys.argv):
     if arg == 'load_md':
         LOAD_MD_MODE = True
 
+# Количество процессов веб-сервиса из параметра запуска --workers N (--workers=N), None - не задано
+def _workers_argument():
+    for index, arg in enumerate(sys.argv):
+        if arg.startswith('--workers='):
+            value = arg.split('=', 1)[1]
+        elif arg == '--workers' and index + 1 < len(sys.argv):
+            value = sys.argv[index + 1]
+        else:
+            continue
+        try:
+            return int(value)
+        except ValueError:
+            raise ValueError("Некорректное количество процессов веб-сервиса")
+    return None
+
 # Установка уровня логгирования
 if DEBUG_MODE:
     set_logging_level(logging.DEBUG)
@@ -43,13 +71,98 @@ class AIAgentManager(BaseAIAgentManager):
                 CheckQueryAgent()
             ]
         )
-# Экземпляр менеджера AI-агентов
-AGENT_MANAGER = AIAgentManager()
+
+    # Готовый ответ из кэша ответов, None при отсутствии
+    def _cached_answer(self, message: AIAgentMessage) -> AIAgentMessage:
+        cache = response_cache()
+        if cache is None or message.function != BaseAIFunctions.content:
+            return None
+        with span('response_cache') as cache_span:
+            content = cache.get(response_cache_scope(), message.content)
+            cache_span.set('hits', int(content is not None))
+        if content is None:
+            return None
+
+        answer = AIAgentMessage()
+        answer.content = content
+        answer.done = True
+        return answer
+
+    # Запоминание успешного ответа в кэше ответов
+    # Ответ, проверенный упрощенно при недоступности веб-сервиса проверки, не запоминается
+    def _cache_answer(self, prompt: str, answer: AIAgentMessage):
+        cache = response_cache()
+        if cache is not None and answer.error is None and answer.verified:
+            cache.put(response_cache_scope(), prompt, answer.content)
+
+    # Ответ на вопрос с использованием кэша ответов
+    def answer(self, message: AIAgentMessage, observer: BaseAIAgentObserver = None) -> AIAgentMessage:
+        with trace_request():
+            answer = self._cached_answer(message)
+            if answer is None:
+                prompt = message.content
+                answer = super().answer(message, observer)
+                self._cache_answer(prompt, answer)
+            return answer
+
+    # Асинхронный ответ на вопрос с использованием кэша ответов
+    async def aanswer(self, message: AIAgentMessage, observer: BaseAIAgentObserver = None) -> AIAgentMessage:
+        with trace_request():
+            answer = self._cached_answer(message)
+            if answer is None:
+                prompt = message.content
+                answer = await super().aanswer(message, observer)
+                self._cache_answer(prompt, answer)
+            return answer
+
+# Наблюдатель, передающий ход работы AI-агентов клиенту в виде событий Server-Sent Events
+class SSEObserver(BaseAIAgentObserver):
+    def __init__(self, handler: 'HTTPRequestHandler'):
+        self._handler = handler
+        self._draft = 1 # Номер черновика: текст модели становится ответом, только если проверка прошла
+
+    # Событие по сообщению между AI-агентами
+    def on_message(self, message: AIAgentMessage):
+        if message.done:
+            return
+
+        # Пакет сообщений - событие по каждому сообщению пакета
+        if message.function == BaseAIFunctions.batch:
+            for batch_message in message.content:
+                self.on_message(batch_message)
+
+        elif message.function == AIFunctions.tables_list:
+            # Запрошен или получен список таблиц
+            event = 'tables_list_result' if message.is_answer else 'tables_list'
+            self._handler._send_event(event, {})
+
+        elif message.function == AIFunctions.table_description:
+            # Запрошено или получено описание таблицы
+            if message.is_answer:
+                self._handler._send_event('table_description_result', {})
+            else:
+                content = message.content
+                self._handler._send_event('table_description', content if isinstance(content, dict) else {'table_name': content})
+
+        elif message.function == AIFunctions.check_query:
+            # Черновик запроса или результат его проверки, после проверки модель пишет следующий черновик
+            if message.is_answer:
+                self._handler._send_event('check_result', {'result': message.content, 'draft': self._draft})
+                self._draft += 1
+            else:
+                self._handler._send_event('draft_query', {'query': message.content, 'draft': self._draft})
+
+    # Событие по фрагменту текста модели
+    # Это фрагмент черновика: итоговый ответ передается событием result
+    def on_token(self, token: str):
+        self._handler._send_event('draft_token', {'text': token, 'draft': self._draft})
+
+# Допустимый идентификатор запроса, переданный клиентом
+_REQUEST_ID_PATTERN = re.compile(r'[A-Za-z0-9._-]{1,64}')
 
 # Обработчик http-запросов
 class HTTPRequestHandler(BaseHTTPRequestHandler):
     _logger = main_logger() # Экземпляр логгера
-    _agent_manadger = AGENT_MANAGER # Экземпляр менеджера AI-агентов
 
     # Десериализация JSON-строки
     def _message_from_json(self, json_string):
@@ -58,46 +171,217 @@ class HTTPRequestHandler(BaseHTTPRequestHandler):
             return message
 
         except json.JSONDecodeError:
-            self._logger.error(f"Ошибка декодирования JSON: {json_string}")
+            self._logger.error("Ошибка декодирования JSON: %s", json_string)
             return None
 
     # Сериализация в JSON-строку
     def _json_from_message(self, message):
         return json.dumps(message).encode()
 
+    # Идентификатор запроса: из заголовка X-Request-ID или новый
+    def _request_id(self) -> str:
+        request_id = self.headers.get('X-Request-ID', '')
+        if _REQUEST_ID_PATTERN.fullmatch(request_id):
+            return request_id
+        return uuid.uuid4().hex
+
     # Обрабатка запросов
-    def _response(self, request):
+    def _response(self, request, request_id: str):
         # Новое сообщения для AI-агентов
         question = AIAgentMessage()
         question.content = request['prompt']
 
-        # Очистка контекста и получения ответа
-        self._agent_manadger.clear_context()
-        answer = self._agent_manadger.answer(question)
+        # Отдельный менеджер AI-агентов с собственным контекстом на каждый запрос
+        agent_manager = AIAgentManager()
+        with trace_request(request_id):
+            answer = agent_manager.answer(question)
 
         return {'response': answer.content}
 
+    # Запрошена ли потоковая передача ответа
+    def _is_stream(self, request) -> bool:
+        if request is not None and request.get('stream'):
+            return True
+        return 'text/event-stream' in self.headers.get('Accept', '')
+
+    # Отправка события Server-Sent Events
+    def _send_event(self, event: str, data: dict):
+        json_string = json.dumps(data, ensure_ascii=False)
+        self.wfile.write(f'event: {event}\ndata: {json_string}\n\n'.encode())
+        self.wfile.flush()
+
+    # Потоковая обработка запроса
+    def _stream_response(self, request, request_id: str):
+        # Статус и заголовки отправляются сразу, окончание ответа - закрытие соединения
+        self.send_response(200)
+        self.send_header('Content-type', 'text/event-stream; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.send_header('X-Request-ID', request_id)
+        self.end_headers()
+        self._send_event('start', {})
+
+        # Новое сообщения для AI-агентов
+        question = AIAgentMessage()
+        question.content = request['prompt']
+
+        try:
+            # Получение ответа с передачей хода работы клиенту
+            agent_manager = AIAgentManager()
+            with trace_request(request_id):
+                answer = agent_manager.answer(question, SSEObserver(self))
+
+        except (BrokenPipeError, ConnectionResetError):
+            # Клиент закрыл соединение - работа прекращается
+            self._logger.info("Клиент прервал потоковый запрос")
+            return
+
+        except Exception as e:
+            self._logger.error("Ошибка обработки потокового запроса: %s", e)
+            self._send_event('error', {'message': str(e)})
+            return
+
+        self._send_event('result', {'response': answer.content})
+
+    # Путь запроса без параметров
+    def _request_path(self) -> str:
+        return self.path.split('?', 1)[0].rstrip('/')
+
+    # Отправка ответа JSON
+    def _send_json(self, status: int, data: dict, headers: dict = None):
+        json_string = json.dumps(data, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(json_string)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, str(value))
+        self.end_headers()
+        self.wfile.write(json_string)
+
+    # Разрешены ли служебные запросы: по ключу администратора или, если он не задан, только с этого компьютера
+    def _is_admin(self) -> bool:
+        admin_token = config_value(None, 'MAIN', 'admin_token', None)
+        if admin_token:
+            return hmac.compare_digest(self.headers.get('X-Admin-Token', ''), str(admin_token))
+        return self.client_address[0] in ('127.0.0.1', '::1')
+
+    # Запуск перезагрузки метаданных
+    # При {"wait": true} в теле запроса ответ отправляется после окончания перезагрузки
+    def _admin_reload_metadata(self):
+        content_length = int(self.headers.get('Content-Length') or 0)
+        request = self._message_from_json(self.rfile.read(content_length)) if content_length else None
+
+        reloader = metadata_reloader()
+        if not reloader.start():
+            self._send_json(409, {'status': 'Перезагрузка метаданных уже выполняется', **reloader.status()})
+            return
+
+        if isinstance(request, dict) and request.get('wait'):
+            reloader.wait()
+            self._send_json(200, reloader.status())
+        else:
+            self._send_json(202, reloader.status())
+
+    # Клиент для ограничения частоты запросов: из заголовка X-Client-ID или адрес клиента
+    def _client_key(self) -> str:
+        client_id = self.headers.get('X-Client-ID', '')
+        if _REQUEST_ID_PATTERN.fullmatch(client_id):
+            return client_id
+        return self.client_address[0]
+
+    # Полоса приоритета запроса: пакетные задания передают {"priority": "batch"} или заголовок X-Priority: batch
+    # Неизвестное значение приоритета (в том числе не строка) означает полосу по умолчанию
+    def _lane(self, request) -> str:
+        priority = request.get('priority') if isinstance(request, dict) else None
+        lane = str(priority or self.headers.get('X-Priority') or LANES[0]).strip().lower()
+        return lane if lane in LANES else LANES[0]
+
+    # Прием запроса: место обработки на время контекста или AdmissionRejected
+    def _admit(self, request):
+        if self.server.admission is None:
+            return nullcontext()
+        return self.server.admission.admit(self._client_key(), self._lane(request))
+
+    # Отказ в приеме запроса с рекомендуемым временем повтора
+    def _send_rejection(self, rejection: AdmissionRejected, request_id: str):
+        self._logger.warning("Запрос %s отклонен: %s", request_id, rejection)
+        self._send_json(
+            rejection.status,
+            {'status': str(rejection), 'reason': rejection.reason, 'retry_after': rejection.retry_after},
+            {'Retry-After': rejection.retry_after, 'X-Request-ID': request_id}
+        )
+
     # Обрабатчик POST-запросов
     def do_POST(self):
+        # Служебные запросы
+        if self._request_path() == '/admin/reload_metadata':
+            if self._is_admin():
+                self._admin_reload_metadata()
+            else:
+                self._send_json(403, {'status': 'Доступ запрещен'})
+            return
+
         # Чтение входящего запроса
         content_length = int(self.headers['Content-Length'])
         json_string = self.rfile.read(content_length)
 
         # Десериализация из JSON-строки и получение ответа
         request = self._message_from_json(json_string)
-        response = self._response(request)
+        request_id = self._request_id()
+
+        # Ожидание места обработки; при перегрузке запрос отклоняется
+        try:
+            with self._admit(request):
+                self._answer(request, request_id)
+        except AdmissionRejected as e:
+            self._send_rejection(e, request_id)
+
+    # Получение и отправка ответа на запрос
+    def _answer(self, request, request_id: str):
+        # Потоковая передача хода работы и ответа
+        if self._is_stream(request):
+            self._stream_response(request, request_id)
+            return
+
+        response = self._response(request, request_id)
 
         # Формированиея статуса и заголовков
         self.send_response(200)
         self.send_header('Content-type', 'application/json')
+        self.send_header('X-Request-ID', request_id)
         self.end_headers()
 
         # Cериализация в JSON-строку и отправка ответа
         json_string = self._json_from_message(response)
         self.wfile.write(json_string)
 
+    # Отправка метрик в текстовом формате Prometheus
+    def _send_metrics(self):
+        text = metrics_registry().render()
+        if self.server.admission is not None:
+            text += self.server.admission.render()
+        text = text.encode()
+        self.send_response(200)
+        self.send_header('Content-type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(text)))
+        self.end_headers()
+        self.wfile.write(text)
+
     # Обрабатчик GET-запросов
     def do_GET(self):
+        # Метрики этапов обработки запросов
+        if self._request_path() == '/metrics':
+            self._send_metrics()
+            return
+
+        # Состояние перезагрузки метаданных
+        if self._request_path() == '/admin/metadata':
+            if self._is_admin():
+                self._send_json(200, metadata_reloader().status())
+            else:
+                self._send_json(403, {'status': 'Доступ запрещен'})
+            return
+
         # Формированиея статуса и заголовков
         self.send_response(200)
         self.send_header('Content-type', 'text/html; charset=utf-8')
@@ -107,17 +391,112 @@ class HTTPRequestHandler(BaseHTTPRequestHandler):
         self.wfile.write(b'<h1><b>SQL-assistant works.</b></h1>')
 
 # HTTP-сервер
+# Процесс-обработчик многопроцессного режима принимает соединения на сокете, открытом главным процессом
 class MainHTTPServer(HTTPServer):
+    def __init__(self, server_address, request_handler_class, max_workers: int, listen_socket: socket.socket = None):
+        super().__init__(server_address, request_handler_class, bind_and_activate=listen_socket is None)
+        self._is_worker = listen_socket is not None
+        self._parent_pid = os.getppid()
+        if self._is_worker:
+            self.socket.close()
+            self.socket = listen_socket
+            self.server_address = listen_socket.getsockname()
+            self.server_name, self.server_port = socket.getfqdn(self.server_address[0]), self.server_address[1]
+
+        # Прием запросов: max_workers мест обработки, очередь ожидающих и ограничение частоты запросов клиентов
+        self.admission = _admission_controller(max_workers)
+
+        # Ограниченный пул потоков обработки запросов: места обработки и ожидающие в очереди запросы
+        # Соединения сверх этого количества сразу отклоняются, если прием запросов включен
+        self._threads = max_workers + (self.admission.queue_size if self.admission is not None else 0)
+        self._pending = 0 # Соединения в пуле потоков
+        self._pending_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self._threads, thread_name_prefix='HTTPWorker')
+
+    # Прием соединения
+    # Общий сокет неблокирующий: соединение принимает один из процессов, остальные продолжают ожидание
+    def get_request(self):
+        request, client_address = self.socket.accept()
+        if self._is_worker:
+            request.setblocking(True)
+        return request, client_address
+
+    # Процесс-обработчик останавливается, если главный процесс завершился аварийно
+    def service_actions(self):
+        if self._is_worker and os.getppid() != self._parent_pid:
+            raise KeyboardInterrupt
+
+    # Передача запроса в пул потоков
+    def process_request(self, request, client_address):
+        with self._pending_lock:
+            overflow = self.admission is not None and self._pending >= self._threads
+            if not overflow:
+                self._pending += 1
+        if overflow:
+            self._reject_connection(request)
+            return
+        self._executor.submit(self._process_request_thread, request, client_address)
+
+    # Обработка запроса в потоке пула
+    def _process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self._pending_lock:
+                self._pending -= 1
+
+    # Отказ соединению без чтения запроса: все потоки заняты обработкой и ожиданием в очереди
+    def _reject_connection(self, request):
+        rejection = self.admission.reject(503, 'overflow', "Сервис перегружен", self.admission.max_queue_time)
+        body = json.dumps(
+            {'status': str(rejection), 'reason': rejection.reason, 'retry_after': rejection.retry_after},
+            ensure_ascii=False
+        ).encode()
+        try:
+            request.sendall(
+                f'HTTP/1.1 503 Service Unavailable\r\nContent-type: application/json; charset=utf-8\r\n'
+                f'Content-Length: {len(body)}\r\nRetry-After: {rejection.retry_after}\r\nConnection: close\r\n\r\n'.encode()
+                + body
+            )
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    # Закрытие сервера и остановка пула потоков
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
     def serve_forever(self):
-        print(f'\nВеб-сервис запущен (порт: {self.server_address[1]}). Для остановки нажмите Ctrl+C...')
+        if not self._is_worker:
+            print(f'\nВеб-сервис запущен (порт: {self.server_address[1]}). Для остановки нажмите Ctrl+C...')
 
         try:
             super().serve_forever()
 
         except KeyboardInterrupt:
-            print('\nВеб-сервис остановлен.')
+            if not self._is_worker:
+                print('\nВеб-сервис остановлен.')
             self.server_close()
 
+# Контроль приема запросов по настройкам секции ADMISSION, None - прием запросов без ограничений
+def _admission_controller(max_workers: int):
+    if config_value(None, 'ADMISSION', 'enabled', True) is not True:
+        return None
+    queue_size = config_value(None, 'ADMISSION', 'queue_size', 32)
+    if not isinstance(queue_size, int) or queue_size < 0:
+        raise ValueError("Некорректный размер очереди запросов")
+    return AdmissionController(
+        max_workers,
+        queue_size,
+        config_value(None, 'ADMISSION', 'max_queue_time', 30),
+        config_value(None, 'ADMISSION', 'client_rate', 0),
+        config_value(None, 'ADMISSION', 'client_burst', 10)
+    )
+
 # Старт веб-сервиса
 def run():
     # Определение порта
@@ -125,16 +504,176 @@ def run():
     if port is None:
         raise ValueError("Порт не задан")
 
+    # Определение количества одновременно обрабатываемых запросов
+    max_workers = config_value(None, 'MAIN', 'max_workers', 8)
+    if not isinstance(max_workers, int) or max_workers < 1:
+        raise ValueError("Некорректное количество потоков обработки запросов")
+
+    # Определение количества процессов веб-сервиса: параметр запуска или настройка
+    workers = _workers_argument()
+    if workers is None:
+        workers = config_value(None, 'MAIN', 'workers', 1)
+    if not isinstance(workers, int) or workers < 1:
+        raise ValueError("Некорректное количество процессов веб-сервиса")
+
+    # Перечитывание конфигурации по сигналу SIGHUP
+    install_reload_signal()
+
+    if workers > 1:
+        run_workers(port, max_workers, workers)
+        return
+
+    # Описания таблиц читаются из снимка метаданных: запуск без загрузки описаний из базы данных
+    if config_value(None, 'MAIN', 'metadata_snapshot', False) is True:
+        use_metadata_snapshot(prepare_metadata_snapshot())
+
+    # Перезагрузка метаданных при изменении файла метаданных
+    _watch_metadata()
+
     # Запуск веб-сервиса
     server_address = ('', port)
-    httpd = MainHTTPServer(server_address, HTTPRequestHandler)
+    httpd = MainHTTPServer(server_address, HTTPRequestHandler, max_workers)
     httpd.serve_forever()
 
+# Перезагрузка метаданных при изменении файла метаданных
+def _watch_metadata():
+    metadata_watch_interval = config_value(None, 'MAIN', 'metadata_watch_interval', 0)
+    if metadata_watch_interval > 0:
+        metadata_reloader().watch(metadata_watch_interval)
+
+# Время ожидания завершения процессов веб-сервиса при остановке, сек.
+WORKER_STOP_TIMEOUT = 30
+
+# Минимальное время работы процесса веб-сервиса, сек.
+# Процесс, завершившийся быстрее, перезапускается с задержкой, чтобы не перезапускать его непрерывно
+WORKER_MIN_UPTIME = 5
+
+# Процесс веб-сервиса: обрабатывает запросы на общем сокете, описания таблиц читает из снимка метаданных
+def _run_worker(listen_socket: socket.socket, snapshot_path: str, max_workers: int):
+    # Ctrl+C обрабатывает главный процесс, SIGTERM - остановка после завершения текущих запросов
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    def _on_sigterm(signum, frame):
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, _on_sigterm)
+    install_reload_signal()
+
+    use_metadata_snapshot(snapshot_path)
+    httpd = MainHTTPServer(listen_socket.getsockname(), HTTPRequestHandler, max_workers, listen_socket)
+    httpd.serve_forever()
+
+# Процесс отслеживания изменения файла метаданных многопроцессного режима
+# Пересобирает снимок метаданных, процессы веб-сервиса переходят на него при следующем обращении
+def _run_metadata_watcher(snapshot_path: str):
+    # Ctrl+C обрабатывает главный процесс, SIGTERM - немедленная остановка
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    install_reload_signal()
+
+    use_metadata_snapshot(snapshot_path)
+    _watch_metadata()
+
+    # Процесс завершается вместе с главным процессом
+    parent_pid = os.getppid()
+    while os.getppid() == parent_pid:
+        time.sleep(1)
+
+# Многопроцессный режим веб-сервиса
+# Главный процесс строит снимок метаданных, открывает сокет и запускает процессы веб-сервиса,
+# которые отображают снимок в память: описания таблиц хранятся в памяти в одном экземпляре.
+# Главный процесс перезапускает завершившиеся процессы и останавливает их по Ctrl+C или SIGTERM.
+# Главный процесс не запускает потоков: процессы порождаются копированием главного процесса,
+# поэтому файл метаданных отслеживает отдельный процесс
+def run_workers(port: int, max_workers: int, workers: int):
+    snapshot_path = prepare_metadata_snapshot()
+    use_metadata_snapshot(snapshot_path)
+
+    listen_socket = socket.create_server(('', port), backlog=128)
+    listen_socket.setblocking(False)
+
+    # Процессы порождаются копированием главного процесса, где это возможно (Linux)
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+    else:
+        context = multiprocessing.get_context('spawn')
+
+    # Процессы веб-сервиса и, если включено, процесс отслеживания файла метаданных
+    targets = [
+        (_run_worker, (listen_socket, snapshot_path, max_workers), f'HTTPWorker-{index}') for index in range(workers)
+    ]
+    if config_value(None, 'MAIN', 'metadata_watch_interval', 0) > 0:
+        targets.append((_run_metadata_watcher, (snapshot_path,), 'MetadataWatcher'))
+
+    processes: list = [None] * len(targets)
+    started_at = [0.0] * len(targets)
+
+    def start_process(index: int):
+        target, args, name = targets[index]
+        process = context.Process(target=target, args=args, name=name, daemon=True)
+        process.start()
+        processes[index] = process
+        started_at[index] = time.monotonic()
+
+    # SIGTERM останавливает главный процесс так же, как Ctrl+C
+    def _on_sigterm(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, _on_sigterm)
+
+    # SIGHUP передается процессам веб-сервиса
+    if hasattr(signal, 'SIGHUP'):
+        reload_config = signal.getsignal(signal.SIGHUP)
+        def _on_sighup(signum, frame):
+            if callable(reload_config):
+                reload_config(signum, frame)
+            for process in processes:
+                if process is not None and process.is_alive():
+                    os.kill(process.pid, signal.SIGHUP)
+        signal.signal(signal.SIGHUP, _on_sighup)
+
+    try:
+        for index in range(len(targets)):
+            start_process(index)
+        print(f'\nВеб-сервис запущен (порт: {port}, процессов: {workers}). Для остановки нажмите Ctrl+C...')
+
+        # Перезапуск завершившихся процессов
+        while True:
+            time.sleep(1)
+            for index, process in enumerate(processes):
+                if process.is_alive():
+                    continue
+                main_logger().error("Процесс веб-сервиса %s завершился с кодом %s, перезапуск", process.name, process.exitcode)
+                if time.monotonic() - started_at[index] < WORKER_MIN_UPTIME:
+                    time.sleep(WORKER_MIN_UPTIME)
+                start_process(index)
+
+    except KeyboardInterrupt:
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        print('\nОстановка процессов веб-сервиса...')
+
+    finally:
+        # Процессы завершают текущие запросы, не завершившиеся за отведенное время останавливаются принудительно
+        for process in processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + WORKER_STOP_TIMEOUT
+        for process in processes:
+            if process is not None:
+                process.join(max(0.0, deadline - time.monotonic()))
+                if process.is_alive():
+                    process.kill()
+                    process.join()
+        listen_socket.close()
+        print('\nВеб-сервис остановлен.')
+
 # Загрузка метаданных
 def load_md():
     print('\nЗагрузка метаданных в базу данных...')
-    if load_metadata():
-        print('Метаданные успешно загружены.')
+    stats = load_metadata()
+    if stats is not None:
+        print(f"Метаданные успешно загружены за {stats['seconds']} сек.: объектов {stats['total']}, "
+              f"добавлено {stats['inserted']}, изменено {stats['updated']}, удалено {stats['deleted']}.")
+        if 'snapshot' in stats:
+            print(f"Снимок метаданных записан: {stats['snapshot']}.")
     else:
         print('Файл метаданных не найден.')
 
@@ -170,6 +709,9 @@ if __name__ == '__main__':
                 mode = 'exit'
 
         if mode == 'console':
+            # Экземпляр менеджера AI-агентов
+            agent_manager = AIAgentManager()
+
             is_working = True
             while is_working:
                 try:
@@ -180,7 +722,7 @@ if __name__ == '__main__':
                     # Получения и вывод ответа
                     question = AIAgentMessage()
                     question.content = prompt
-                    answer = AGENT_MANAGER.answer(question)
+                    answer = agent_manager.answer(question)
                     
                     print(f'\nОтвет:\n{answer.content}')
 
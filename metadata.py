@@ -1,9 +1,184 @@
+from typing import Any, Callable, Iterator, Union
+
 import sqlite3
 import json
 
+import hashlib
 import os
+import pathlib
+import threading
+import time
+import zlib
+
+# Блокировка файлов между процессами (нет в Windows)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from caches import LRUCache
+from search import SearchIndex
+from snapshot import MetadataSnapshot, SnapshotWriter, write_snapshot
+from utilities import CONFIG_CHECK_INTERVAL, config_value, main_folder, main_logger
+
+# Описание элемента: краткое описание и подробное, если оно отличается
+def _compact_text(item: dict) -> str:
+    short = item.get('КраткоеОписание') or ''
+    detailed = item.get('ПодробноеОписание') or ''
+    if detailed and detailed != short:
+        return f'{short} ({detailed})' if short else detailed
+    return short
+
+# Компактное представление списка элементов: таблица с колонками через '|'
+def _compact_items(key: str, items: list, lines: list[str], indent: str):
+    # Элементы с вложенными списками (например, табличные части) выводятся как вложенные объекты
+    nested = [item for item in items if any(isinstance(value, (list, dict)) for value in item.values())]
+    flat = [item for item in items if item not in nested]
+
+    if flat:
+        # Колонки: простые свойства в порядке появления, описания объединяются в одну колонку
+        columns = []
+        for item in flat:
+            for name in item:
+                if name in ('КраткоеОписание', 'ПодробноеОписание'):
+                    name = 'Описание'
+                if name not in columns:
+                    columns.append(name)
+
+        lines.append(f'{indent}{key} ({" | ".join(columns)}):')
+        for item in flat:
+            cells = []
+            for name in columns:
+                value = _compact_text(item) if name == 'Описание' else item.get(name, '')
+                cells.append(str(value))
+            lines.append(f'{indent}{" | ".join(cells).rstrip(" |")}')
+
+    if nested:
+        lines.append(f'{indent}{key}:')
+        for item in nested:
+            _compact_object(item, lines, indent + '  ')
+
+# Компактное представление объекта метаданных
+def _compact_object(description: dict, lines: list[str], indent: str):
+    # Заголовок: имя и описание
+    name = description.get('ИмяОбъекта', description.get('Имя', ''))
+    text = _compact_text(description)
+    lines.append(f'{indent}{name} - {text}' if text and text != name else f'{indent}{name}')
+
+    # Остальные свойства
+    for key, value in description.items():
+        if key in ('ИмяОбъекта', 'Имя', 'КраткоеОписание', 'ПодробноеОписание'):
+            continue
+        if isinstance(value, list):
+            if not value:
+                continue
+            if all(isinstance(item, dict) for item in value):
+                _compact_items(key, value, lines, indent)
+            else:
+                lines.append(f'{indent}{key}: {", ".join(str(item) for item in value)}')
+        elif isinstance(value, dict):
+            lines.append(f'{indent}{key}:')
+            _compact_object(value, lines, indent + '  ')
+        elif value not in (None, ''):
+            lines.append(f'{indent}{key}: {value}')
+
+# Компактное текстовое представление описания таблицы
+# Списки реквизитов выводятся таблицами, совпадающие краткое и подробное описания не дублируются
+def compact_description(description: dict) -> str:
+    lines = []
+    _compact_object(description, lines, '')
+    return '\n'.join(lines)
+
+# Форматы хранения описаний таблиц:
+# json - описание JSON, модели передается описание JSON;
+# compact - сжатое описание JSON, модели передается компактное текстовое представление
+METADATA_STORAGE_FORMATS = ('json', 'compact')
+
+# Формат хранения описаний таблиц
+def _metadata_storage() -> str:
+    storage = config_value(None, 'MAIN', 'metadata_storage', 'json')
+    if storage not in METADATA_STORAGE_FORMATS:
+        raise ValueError(f"Неизвестный формат хранения метаданных: {storage}")
+    return storage
+
+# Готовый к передаче модели результат функции 'описание таблицы по имени'
+def render_description(description: dict, storage: str) -> str:
+    if storage == 'compact':
+        description = compact_description(description)
+    return json.dumps({'table_description': description}, ensure_ascii=False)
+
+# Начало результата функции 'описание таблицы по имени'
+_RENDERED_PREFIX = '{"table_description": '
+
+# Результат функции 'описание таблицы по имени' для описания в формате json: текст описания передается
+# как есть, без разбора и хранения второй копии (совпадает с render_description(description, 'json'))
+def _render_json_description(json_string: str) -> str:
+    return f'{_RENDERED_PREFIX}{json_string}}}'
+
+# Текст JSON описания из готового результата функции 'описание таблицы по имени', None - результат другого вида
+def rendered_value(rendered: str) -> Union[str, None]:
+    if rendered.startswith(_RENDERED_PREFIX) and rendered.endswith('}'):
+        return rendered[len(_RENDERED_PREFIX):-1]
+    return None
+
+# Результат функции 'описания нескольких таблиц по именам' из готовых результатов функции 'описание таблицы по имени'
+# Описания объединяются без разбора JSON, результат другого вида передается строкой
+def render_descriptions(rendered: dict[str, str]) -> str:
+    parts = []
+    for table_name, content in rendered.items():
+        value = rendered_value(content)
+        if value is None:
+            value = json.dumps(content, ensure_ascii=False)
+        parts.append(f'{json.dumps(table_name, ensure_ascii=False)}: {value}')
+    return f'{{"table_descriptions": {{{", ".join(parts)}}}}}'
+
+# Свойства заголовка описания, которые входят в любую выборку разделов
+_HEADER_KEYS = ('ИмяОбъекта', 'КраткоеОписание')
 
-from utilities import config_value, main_folder
+# Индекс разделов описания таблицы:
+# sections - разделы (свойства верхнего уровня) по имени в верхнем регистре,
+# fields - элементы разделов (реквизиты, измерения, ресурсы, табличные части) по имени в верхнем регистре
+def _section_index(description: dict) -> dict:
+    sections = {}
+    fields = {}
+    for key, value in description.items():
+        sections[key.upper()] = key
+        if not isinstance(value, list):
+            continue
+        for item in value:
+            if isinstance(item, dict) and item.get('Имя'):
+                fields.setdefault(item['Имя'].upper(), []).append((key, item))
+    return {'description': description, 'sections': sections, 'fields': fields}
+
+# Выборка разделов и полей описания таблицы по индексу разделов
+# Неизвестные имена перечисляются в свойстве 'НеНайдено'
+def _project_description(index: dict, names: list[str]) -> dict:
+    description = index['description']
+    result = {key: description[key] for key in _HEADER_KEYS if key in description}
+    not_found = []
+    for name in names:
+        key = index['sections'].get(str(name).strip().upper())
+        if key is not None:
+            result[key] = description[key]
+            continue
+        items = index['fields'].get(str(name).strip().upper())
+        if items is None:
+            not_found.append(name)
+            continue
+        for section, item in items:
+            selected = result.setdefault(section, [])
+            # Раздел, выбранный целиком, или уже выбранный элемент не дублируются
+            if selected is not description[section] and item not in selected:
+                selected.append(item)
+    if not_found:
+        result['НеНайдено'] = not_found
+    return result
+
+# Описание JSON из значения базы данных: текст или сжатый текст
+def _description_json(value: Union[str, bytes, None]) -> str:
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode()
+    return value or ''
 
 # Путь к база данных метаданных
 def _metadata_db_path():
@@ -15,123 +190,752 @@ def _metadata_db_path():
     # Путь к файлу базы данных
     return os.path.join(main_folder(), metadata_db_name)
 
-# Загрузка метаданных в базу данных
-def load_metadata() -> bool:
+# Путь к снимку метаданных
+# По умолчанию - имя базы данных метаданных с расширением .snapshot
+def _metadata_snapshot_path():
+    snapshot_name = config_value(None, 'MAIN', 'metadata_snapshot_name', '')
+    if snapshot_name:
+        return os.path.join(main_folder(), snapshot_name)
+    return str(pathlib.Path(_metadata_db_path()).with_suffix('.snapshot'))
+
+# Размер порции чтения файла метаданных, символов
+_LOAD_CHUNK_SIZE = 1 << 20
+# Количество описаний, записываемых в базу данных одной транзакцией
+_LOAD_BATCH_SIZE = 1000
+
+# Последовательное чтение элементов массива JSON из файла без загрузки всего файла в память
+def _iter_json_array(file) -> Iterator[Any]:
+    decoder = json.JSONDecoder()
+    buffer = file.read(_LOAD_CHUNK_SIZE)
+    eof = not buffer
+    # Метка порядка байтов в начале файла
+    buffer = buffer.lstrip('\ufeff')
+    position = 0
+
+    # Пропуск пробельных символов с дочитыванием файла
+    def skip_whitespace():
+        nonlocal buffer, position, eof
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer) or eof:
+                return
+            chunk = file.read(_LOAD_CHUNK_SIZE)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+
+    skip_whitespace()
+    if position >= len(buffer):
+        return
+    if buffer[position] != '[':
+        raise ValueError("Файл метаданных должен содержать массив JSON")
+    position += 1
+
+    expect_value = True
+    after_comma = False
+    while True:
+        skip_whitespace()
+        if position >= len(buffer):
+            raise ValueError("Неожиданный конец файла метаданных")
+        if buffer[position] == ']':
+            if after_comma:
+                raise ValueError("Лишняя ',' в конце массива в файле метаданных")
+            return
+        if not expect_value:
+            if buffer[position] != ',':
+                raise ValueError(f"Ожидается ',' в файле метаданных: '{buffer[position:position + 20]}'")
+            position += 1
+            expect_value = True
+            after_comma = True
+            continue
+
+        # Разбор элемента; при нехватке данных дочитываем файл и повторяем разбор
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+            complete = end < len(buffer) or eof
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            complete = False
+        if not complete:
+            chunk = file.read(_LOAD_CHUNK_SIZE)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+
+        yield value
+        expect_value = False
+        after_comma = False
+        position = end
+        # Разобранная часть буфера больше не нужна
+        if position > _LOAD_CHUNK_SIZE:
+            buffer, position = buffer[position:], 0
+
+# Подготовка базы данных метаданных: режим WAL, таблица описаний и промежуточная таблица загрузки соединения
+def _prepare_metadata_db(connection: sqlite3.Connection):
+    # Режим WAL: читатели работают во время загрузки
+    connection.execute("PRAGMA journal_mode=WAL")
+
+    with connection:
+        # Схема обновляется одной транзакцией: загрузки в других процессах ждут ее завершения
+        connection.execute("BEGIN IMMEDIATE")
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS table_descriptions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                Name VARCHAR(255) NOT NULL,
+                Description TEXT,
+                Hash TEXT,
+                Rendered TEXT
+            )
+        """)
+
+        # Хеш содержимого и готовый результат функции в базах данных, созданных прежними версиями
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(table_descriptions)")]
+        for column in ('Hash', 'Rendered'):
+            if column not in columns:
+                connection.execute(f"ALTER TABLE table_descriptions ADD COLUMN {column} TEXT")
+
+        # Готовый результат хранится только для формата compact, описание в формате json передается как есть
+        connection.execute(
+            "UPDATE table_descriptions SET Rendered = NULL WHERE Rendered IS NOT NULL AND typeof(Description) = 'text'"
+        )
+
+        # Уникальный индекс по имени таблицы
+        # В базах данных прежних версий имена могут повторяться: остается последнее описание с каждым именем
+        index = connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'table_descriptions_name'"
+        ).fetchone()
+        if index is None:
+            connection.execute("""
+                DELETE FROM table_descriptions
+                WHERE rowid NOT IN (SELECT MAX(rowid) FROM table_descriptions GROUP BY Name)
+            """)
+            connection.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS table_descriptions_name
+                ON table_descriptions (Name)
+            """)
+
+        # Промежуточная таблица для новых описаний
+        # Временная таблица видна только своему соединению: загрузки в других процессах ей не мешают
+        connection.execute("DROP TABLE IF EXISTS temp.table_descriptions_staging")
+        connection.execute("""
+            CREATE TEMP TABLE table_descriptions_staging (
+                Name VARCHAR(255) PRIMARY KEY,
+                Description TEXT,
+                Hash TEXT,
+                Rendered TEXT
+            )
+        """)
+
+# Загрузка описаний из файла в промежуточную таблицу порциями
+# Если задана запись снимка метаданных, описания одновременно записываются в снимок
+def _stage_metadata(
+    connection: sqlite3.Connection, metadata_file_path: str, storage: str, snapshot_writer: SnapshotWriter = None
+) -> int:
+    count = 0
+    batch = []
+
+    # Запись порции описаний (при повторе имени остается последнее описание)
+    def flush():
+        with connection:
+            connection.executemany("""
+                INSERT OR REPLACE INTO table_descriptions_staging (Name, Description, Hash, Rendered)
+                VALUES (?, ?, ?, ?)
+            """, batch)
+        batch.clear()
+
+    with open(metadata_file_path, 'r', encoding='utf-8') as metadata_file:
+        for description in _iter_json_array(metadata_file):
+            json_string = json.dumps(description, ensure_ascii=False)
+            # Формат хранения входит в хеш: при его смене описания перезаписываются
+            content_hash = hashlib.sha1(f'{storage}\n{json_string}'.encode()).hexdigest()
+            if storage == 'compact':
+                value = zlib.compress(json.dumps(description, ensure_ascii=False, separators=(',', ':')).encode(), 9)
+            else:
+                value = json_string
+            rendered = render_description(description, storage) if storage == 'compact' else None
+            batch.append((description['ИмяОбъекта'], value, content_hash, rendered))
+            if snapshot_writer is not None:
+                snapshot_writer.add(description['ИмяОбъекта'], value, rendered)
+            count += 1
+            if len(batch) >= _LOAD_BATCH_SIZE:
+                flush()
+    if batch:
+        flush()
+
+    return count
+
+# Применение загруженных описаний одной короткой транзакцией: добавляются и обновляются
+# только измененные описания, удаляются отсутствующие в файле
+def _apply_staged_metadata(connection: sqlite3.Connection) -> dict:
+    with connection:
+        cursor = connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+
+        # Статистика изменений
+        inserted = cursor.execute("""
+            SELECT COUNT(*) FROM table_descriptions_staging AS s
+            WHERE NOT EXISTS (SELECT 1 FROM table_descriptions AS t WHERE t.Name = s.Name)
+        """).fetchone()[0]
+        updated = cursor.execute("""
+            SELECT COUNT(*) FROM table_descriptions_staging AS s
+            JOIN table_descriptions AS t ON t.Name = s.Name
+            WHERE t.Hash IS NOT s.Hash
+        """).fetchone()[0]
+
+        # Добавление новых и обновление измененных описаний
+        cursor.execute("""
+            INSERT INTO table_descriptions (Name, Description, Hash, Rendered)
+            SELECT s.Name, s.Description, s.Hash, s.Rendered FROM table_descriptions_staging AS s
+            WHERE NOT EXISTS (SELECT 1 FROM table_descriptions AS t WHERE t.Name = s.Name AND t.Hash IS s.Hash)
+            ORDER BY s.rowid
+            ON CONFLICT (Name) DO UPDATE SET
+                Description = excluded.Description, Hash = excluded.Hash, Rendered = excluded.Rendered
+        """)
+
+        # Удаление описаний, отсутствующих в файле
+        deleted = cursor.execute("""
+            DELETE FROM table_descriptions
+            WHERE Name NOT IN (SELECT Name FROM table_descriptions_staging)
+        """).rowcount
+
+        total = cursor.execute("SELECT COUNT(*) FROM table_descriptions").fetchone()[0]
+        cursor.execute("DROP TABLE temp.table_descriptions_staging")
+
+    return {'total': total, 'inserted': inserted, 'updated': updated, 'deleted': deleted}
+
+# Путь к файлу метаданных
+def _metadata_file_path() -> str:
     # Имя файла метаданных
     metadata_file_name = config_value(None, 'MAIN', 'metadata_file_name', None)
     if metadata_file_name is None:
         raise ValueError("Не указано имя файла метаданных")
-    
+    return os.path.join(main_folder(), metadata_file_name)
+
+# Загрузка метаданных из файла в базу данных без замены хранилища метаданных
+# Если задан путь к снимку метаданных, снимок строится за то же чтение файла и подменяется после загрузки в базу данных
+def _load_metadata_db(snapshot_path: str = None) -> Union[dict, None]:
     # Путь к файлу метаданных
-    metadata_file_path = os.path.join(main_folder(), metadata_file_name)
+    metadata_file_path = _metadata_file_path()
     if not os.path.exists(metadata_file_path):
-        return False
+        return None
+
+    started = time.perf_counter()
 
     # Получение пути к файлу базы данных и соединение
     metadata_db_path = _metadata_db_path()
     connection = sqlite3.connect(metadata_db_path)
+    snapshot_writer = None
     try:
-        # Получение курсора базы данных
-        cursor = connection.cursor()
-        
-        # Проверка наличия таблицы описания
-        cursor.execute("""
-            SELECT name FROM sqlite_master
-            WHERE type='table' AND name='table_descriptions'
-        """)
-        if cursor.fetchone() is None:
-            # Создание таблицы описания
-            cursor.execute("""
-                CREATE TABLE table_descriptions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    Name VARCHAR(255) NOT NULL,
-                    Description TEXT
-                )
-            """)
-        else:
-            # Очистка таблицы описания
-            cursor.execute("DELETE FROM table_descriptions")
-        
-        # Загрузка метаданных из файла
-        with open(metadata_file_path, 'r', encoding='utf-8') as metadata_file:
-            json_string = metadata_file.read()
-            metadata = json.loads(json_string)
-        if metadata:
-            # Подготовка списка кортежей с данными
-            prepared_data = []
-            for description in metadata:
-                name = description['ИмяОбъекта']
-                prepared_data.append((name, json.dumps(description, ensure_ascii=False)))
-
-            # Загрузка данных в таблицу
-            cursor.executemany("""
-                INSERT INTO table_descriptions (Name, Description)
-                VALUES (?, ?)
-            """, prepared_data)
-        
-        # Фиксация транзакции
-        connection.commit()
-        
+        if snapshot_path is not None:
+            snapshot_writer = SnapshotWriter(snapshot_path)
+        _prepare_metadata_db(connection)
+        loaded = _stage_metadata(connection, metadata_file_path, _metadata_storage(), snapshot_writer)
+        stats = _apply_staged_metadata(connection)
+        if snapshot_writer is not None:
+            writer, snapshot_writer = snapshot_writer, None
+            writer.close()
+
     except Exception as e:
         raise ValueError(f"Ошибка загрузки метаданных: {e}")
 
     finally:
-        # Закрытие соединения с базой данных
+        # Закрытие соединения с базой данных и отмена незавершенного снимка
         connection.close()
+        if snapshot_writer is not None:
+            snapshot_writer.abort()
 
-    return True
+    stats['loaded'] = loaded
+    stats['seconds'] = round(time.perf_counter() - started, 3)
+    if snapshot_path is not None:
+        stats['snapshot'] = snapshot_path
+    return stats
 
-# Список таблиц метаданных
-def tables_list() -> list[str]:
-    result = []
+# Использовать ли снимок метаданных в однопроцессном режиме (снимок строится командой load_md)
+def _snapshot_enabled() -> bool:
+    return config_value(None, 'MAIN', 'metadata_snapshot', False) is True
 
-    # Получение пути к файлу базы данных и соединение
-    metadata_db_path = _metadata_db_path()
-    connection = sqlite3.connect(metadata_db_path)
+# Загрузка метаданных в базу данных и, если включен, в снимок метаданных
+# Возвращает статистику загрузки, None - файл метаданных не найден
+# Перезагрузка, начатая процессом веб-сервиса, сначала завершается
+def load_metadata() -> Union[dict, None]:
+    snapshot_path = _METADATA_SNAPSHOT_PATH
+    if snapshot_path is None and _snapshot_enabled():
+        snapshot_path = _metadata_snapshot_path()
+    lock_file = _lock_metadata_reload(True)
     try:
-        # Получение курсора базы данных
-        cursor = connection.cursor()
-        
-        # Получение имен таблиц порциями
-        cursor.execute("SELECT Name FROM table_descriptions")
-        while True:
-            rows = cursor.fetchmany(1000)
-            if not rows:
-                break
-            for row in rows:
-                result.append(row[0])
+        stats = _load_metadata_db(snapshot_path)
+    finally:
+        lock_file.close()
+    if stats is not None:
+        # Хранилище метаданных будет построено заново при следующем обращении
+        reset_metadata_store()
+    return stats
 
-    except Exception as e:
-        raise ValueError(f"Ошибка получения списка таблиц: {e}")
+# Хранилище метаданных
+# Загружает описания таблиц из базы данных один раз и отвечает на запросы из памяти.
+# Хранилище по снимку метаданных держит в памяти только имена таблиц, описания читаются из снимка
+class MetadataStore():
+    def __init__(self, metadata_db_path: str = None, snapshot: MetadataSnapshot = None):
+        self._names: list[str] = [] # Имена таблиц в порядке загрузки
+        self._descriptions: dict[str, Union[str, bytes]] = {} # Описания таблиц по имени: JSON или сжатый JSON
+        self._rendered: dict[str, str] = {} # Готовые результаты функции 'описание таблицы по имени' формата compact
+        # Индексы разделов описаний, строятся при первом обращении, давно не использованные вытесняются
+        self._section_indexes = LRUCache(config_value(None, 'MAIN', 'section_index_cache_size', 256), 0)
+        self._section_indexes_lock = threading.Lock()
+        self._snapshot = snapshot # Снимок метаданных
 
-    finally:
-        # Закрытие соединения с базой данных
-        connection.close()
+        if snapshot is not None:
+            self._names = list(snapshot.names())
+            self._version = snapshot.version
+        else:
+            self._load_db(metadata_db_path)
 
-    return result
+        # Имена таблиц без учета регистра и классы объектов метаданных для проверки запросов
+        self._upper_names = {name.upper(): name for name in self._names}
+        self._classes = {name.split('.', 1)[0].upper() for name in self._names}
 
-# Описание таблицы метаданных по имени
-def table_description(table_name: str) -> str:
-    result = ''
+        # Поисковый индекс строится при первом обращении
+        self._search_index: SearchIndex = None
+        self._search_index_lock = threading.Lock()
 
-    # Получение пути к файлу базы данных и соединение
-    metadata_db_path = _metadata_db_path()
-    connection = sqlite3.connect(metadata_db_path)
+    # Загрузка описаний таблиц из базы данных
+    def _load_db(self, metadata_db_path: str):
+        # Соединение с базой данных только для чтения
+        uri = pathlib.Path(metadata_db_path).as_uri() + '?mode=ro'
+        try:
+            connection = sqlite3.connect(uri, uri=True)
+        except sqlite3.Error as e:
+            raise ValueError(f"Ошибка открытия базы данных метаданных: {e}")
+
+        # Версия метаданных - хеш содержимого
+        version_hash = hashlib.sha1()
+        try:
+            # Получение курсора базы данных
+            cursor = connection.cursor()
+
+            # Готовые результаты функции формата compact есть в базах данных, загруженных этой версией
+            columns = [row[1] for row in cursor.execute("PRAGMA table_info(table_descriptions)")]
+            rendered_column = 'Rendered' if 'Rendered' in columns else 'NULL'
+
+            # Получение описаний таблиц порциями
+            cursor.execute(f"SELECT Name, Description, {rendered_column} FROM table_descriptions ORDER BY id")
+            while True:
+                rows = cursor.fetchmany(1000)
+                if not rows:
+                    break
+                for name, description, rendered in rows:
+                    if name not in self._descriptions:
+                        self._names.append(name)
+                    self._descriptions[name] = description or ''
+                    if rendered and isinstance(description, bytes):
+                        self._rendered[name] = rendered
+                    version_hash.update(name.encode())
+                    version_hash.update(description if isinstance(description, bytes) else (description or '').encode())
+
+        except Exception as e:
+            raise ValueError(f"Ошибка загрузки метаданных: {e}")
+
+        finally:
+            # Закрытие соединения с базой данных
+            connection.close()
+
+        self._version = version_hash.hexdigest()
+
+    # Версия метаданных
+    @property
+    def version(self) -> str:
+        return self._version
+
+    # Снимок метаданных, None - хранилище загружено из базы данных
+    @property
+    def snapshot(self) -> Union[MetadataSnapshot, None]:
+        return self._snapshot
+
+    # Описание таблицы в формате хранения: текст JSON или сжатый JSON, None при отсутствии
+    def _description_value(self, table_name: str) -> Union[str, bytes, None]:
+        if self._snapshot is not None:
+            return self._snapshot.description(table_name)
+        return self._descriptions.get(table_name)
+
+    # Количество таблиц метаданных
+    def __len__(self) -> int:
+        return len(self._names)
+
+    # Построение поискового индекса заранее, чтобы не задерживать первый запрос
+    def warm_up(self):
+        self._search()
+
+    # Список таблиц метаданных
+    def tables_list(self) -> list[str]:
+        return list(self._names)
+
+    # Описание таблицы метаданных по имени
+    def table_description(self, table_name: str) -> str:
+        return _description_json(self._description_value(table_name))
+
+    # Готовый результат функции 'описание таблицы по имени', пустая строка при отсутствии таблицы
+    def rendered_description(self, table_name: str) -> str:
+        if self._snapshot is not None:
+            rendered = self._snapshot.rendered(table_name)
+            if rendered is None:
+                return ''
+        else:
+            rendered = self._rendered.get(table_name)
+        if rendered:
+            return rendered
+
+        value = self._description_value(table_name)
+        if not value:
+            return ''
+        # Описание в формате json передается как есть
+        if isinstance(value, str):
+            return _render_json_description(value)
+        # База данных формата compact загружена прежней версией - результат формируется и запоминается
+        rendered = render_description(json.loads(_description_json(value)), 'compact')
+        self._rendered[table_name] = rendered
+        return rendered
+
+    # Компактное текстовое описание таблицы, пустая строка при отсутствии таблицы
+    # Для формата compact используется готовый результат функции без повторного формирования
+    def compact_text(self, table_name: str) -> str:
+        value = self._description_value(table_name)
+        if not value:
+            return ''
+        if isinstance(value, bytes):
+            value = rendered_value(self.rendered_description(table_name))
+            compact = json.loads(value) if value else ''
+            return compact if isinstance(compact, str) else ''
+        description = json.loads(value)
+        return compact_description(description) if isinstance(description, dict) else ''
+
+    # Результат функции 'описание таблицы по имени' только с указанными разделами и полями
+    # Без указания разделов возвращается полное описание, пустая строка при отсутствии таблицы
+    def rendered_projection(self, table_name: str, sections: list[str]) -> str:
+        if not sections:
+            return self.rendered_description(table_name)
+
+        index = self._section_indexes.get(table_name)
+        if index is None:
+            with self._section_indexes_lock:
+                # Индекс мог построить другой поток, пока ожидали блокировку
+                index = self._section_indexes.get(table_name)
+                if index is None:
+                    json_string = self.table_description(table_name)
+                    if not json_string:
+                        return ''
+                    index = _section_index(json.loads(json_string))
+                    self._section_indexes.put(table_name, index)
+
+        # Выборка передается модели в том же формате, что и полное описание
+        storage = 'compact' if isinstance(self._description_value(table_name), bytes) else 'json'
+        return render_description(_project_description(index, sections), storage)
+
+    # Имя таблицы метаданных без учета регистра, пустая строка при отсутствии
+    def resolve_name(self, table_name: str) -> str:
+        return self._upper_names.get(table_name.upper(), '')
+
+    # Классы объектов метаданных в верхнем регистре (СПРАВОЧНИК, ДОКУМЕНТ, ...)
+    def classes(self) -> set[str]:
+        return self._classes
+
+    # Текст для поиска по описанию таблицы: имя, краткое и подробное описание
+    def _search_text(self, table_name: str) -> str:
+        try:
+            description = json.loads(self.table_description(table_name))
+        except ValueError:
+            return table_name
+
+        parts = [description.get('ИмяОбъекта', table_name)]
+        for key in ('КраткоеОписание', 'ПодробноеОписание'):
+            value = description.get(key)
+            if value and value not in parts:
+                parts.append(value)
+        return '\n'.join(parts)
+
+    # Поисковый индекс по таблицам
+    def _search(self) -> SearchIndex:
+        if self._search_index is None:
+            with self._search_index_lock:
+                if self._search_index is None:
+                    self._search_index = SearchIndex(
+                        (name, self._search_text(name)) for name in self._names
+                    )
+        return self._search_index
+
+    # Список наиболее подходящих под описание задачи таблиц
+    def relevant_tables(self, query: str, top_k: int) -> list[str]:
+        return self._search().search(query, top_k)
+
+# Экземпляр хранилища метаданных
+_METADATA_STORE = None
+_METADATA_STORE_LOCK = threading.Lock()
+
+# Снимок метаданных, из которого строится хранилище; None - хранилище строится по базе данных
+_METADATA_SNAPSHOT_PATH = None
+_SNAPSHOT_CHECKED_AT = 0.0 # Время последней проверки подмены файла снимка
+
+# Хранилище метаданных, общее для всех агентов и запросов
+def metadata_store() -> MetadataStore:
+    global _METADATA_STORE
+    store = _METADATA_STORE
+    if store is None:
+        with _METADATA_STORE_LOCK:
+            if _METADATA_STORE is None:
+                if _METADATA_SNAPSHOT_PATH is None:
+                    _METADATA_STORE = MetadataStore(_metadata_db_path())
+                else:
+                    _METADATA_STORE = MetadataStore(snapshot=MetadataSnapshot(_METADATA_SNAPSHOT_PATH))
+            store = _METADATA_STORE
+    elif store.snapshot is not None:
+        store = _refresh_snapshot_store(store)
+    return store
+
+# Переход на новый снимок метаданных, если файл снимка подменен
+# Проверка выполняется не чаще CONFIG_CHECK_INTERVAL
+def _refresh_snapshot_store(store: MetadataStore) -> MetadataStore:
+    global _SNAPSHOT_CHECKED_AT
+    now = time.monotonic()
+    if now - _SNAPSHOT_CHECKED_AT < CONFIG_CHECK_INTERVAL:
+        return store
+    _SNAPSHOT_CHECKED_AT = now
+
+    path = store.snapshot.path
     try:
-        # Получение курсора базы данных
-        cursor = connection.cursor()
+        stat = os.stat(path)
+    except OSError:
+        return store
+    if (stat.st_ino, stat.st_size, stat.st_mtime_ns) == store.snapshot.identity:
+        return store
 
-        # Получение описания таблицы по имени
-        cursor.execute("SELECT Description FROM table_descriptions WHERE Name=?", (table_name,))
-        row = cursor.fetchone()
-        if row:
-            result = row[0]
+    try:
+        new_store = MetadataStore(snapshot=MetadataSnapshot(path))
+    except (OSError, ValueError) as e:
+        main_logger().error("Ошибка чтения снимка метаданных: %s", e)
+        return store
+    _swap_metadata_store(new_store)
+    main_logger().info("Снимок метаданных обновлен, версия: %s", new_store.version)
+    return new_store
 
-    except Exception as e:
-        raise ValueError(f"Ошибка получения описания таблицы: {e}")
+# Использование снимка метаданных вместо базы данных
+# Процессы веб-сервиса отображают один файл в память и не держат собственных копий описаний
+def use_metadata_snapshot(path: str):
+    global _METADATA_SNAPSHOT_PATH
+    _METADATA_SNAPSHOT_PATH = path
+    reset_metadata_store()
 
-    finally:
-        # Закрытие соединения с базой данных
-        connection.close()
+# Построение снимка метаданных по базе данных, возвращает путь к снимку
+def compile_metadata_snapshot(path: str = None) -> str:
+    path = path or _metadata_snapshot_path()
+    store = MetadataStore(_metadata_db_path())
+    # Готовый результат записывается только для формата compact
+    def entries():
+        for name in store.tables_list():
+            value = store._description_value(name)
+            yield name, value, store.rendered_description(name) if isinstance(value, bytes) else None
+
+    write_snapshot(path, entries())
+    return path
+
+# Снимок метаданных для веб-сервиса, возвращает путь к снимку
+# Снимок, построенный командой load_md, используется как есть, иначе снимок строится по базе данных
+def prepare_metadata_snapshot() -> str:
+    path = _metadata_snapshot_path()
+    if _snapshot_enabled():
+        try:
+            MetadataSnapshot(path).close()
+            return path
+        except (OSError, ValueError) as e:
+            main_logger().info("Снимок метаданных будет построен по базе данных: %s", e)
+    return compile_metadata_snapshot(path)
+
+# Сброс хранилища метаданных после перезагрузки
+def reset_metadata_store():
+    global _METADATA_STORE
+    with _METADATA_STORE_LOCK:
+        _METADATA_STORE = None
+
+# Обработчики смены версии метаданных
+_METADATA_LISTENERS: list[Callable[[MetadataStore], None]] = []
+
+# Добавление обработчика смены версии метаданных, например для сброса зависимых кэшей
+def add_metadata_listener(listener: Callable[[MetadataStore], None]):
+    _METADATA_LISTENERS.append(listener)
+
+# Замена хранилища метаданных готовым хранилищем
+# Читатели, получившие прежнее хранилище, дорабатывают с ним; возвращает признак смены версии
+def _swap_metadata_store(store: MetadataStore) -> bool:
+    global _METADATA_STORE
+    with _METADATA_STORE_LOCK:
+        previous = _METADATA_STORE
+        _METADATA_STORE = store
+
+    changed = previous is None or previous.version != store.version
+    if changed:
+        for listener in _METADATA_LISTENERS:
+            try:
+                listener(store)
+            except Exception as e:
+                main_logger().error("Ошибка обработчика смены метаданных: %s", e)
+    return changed
+
+# Перезагрузка метаданных в работающем веб-сервисе
+# Новое хранилище строится в фоне и подменяет прежнее, когда полностью готово
+class MetadataReloader():
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock() # Загрузки в базу данных не выполняются одновременно
+        self._thread: threading.Thread = None
+        self._watch_thread: threading.Thread = None
+        self._status = {'state': 'idle'} # Состояние последней перезагрузки
+
+    # Перезагрузка с ожиданием окончания, возвращает статистику
+    # Перезагрузка, начатая другим процессом веб-сервиса, сначала завершается
+    def reload(self) -> dict:
+        with self._reload_lock:
+            lock_file = _lock_metadata_reload(True)
+            try:
+                return self._reload()
+            finally:
+                lock_file.close()
+
+    # Загрузка файла метаданных и замена хранилища
+    def _reload(self) -> dict:
+        started = time.perf_counter()
+        # В режиме снимка снимок пересобирается, процессы веб-сервиса переходят на него при следующем обращении
+        stats = _load_metadata_db(_METADATA_SNAPSHOT_PATH)
+        if stats is None:
+            raise ValueError("Файл метаданных не найден")
+
+        # Новое хранилище с поисковым индексом
+        if _METADATA_SNAPSHOT_PATH is None:
+            store = MetadataStore(_metadata_db_path())
+        else:
+            store = MetadataStore(snapshot=MetadataSnapshot(_METADATA_SNAPSHOT_PATH))
+        store.warm_up()
+        stats['changed'] = _swap_metadata_store(store)
+        stats['version'] = store.version
+        stats['seconds'] = round(time.perf_counter() - started, 3)
+        return stats
+
+    # Фоновая перезагрузка, блокировка перезагрузки между процессами уже получена
+    def _run(self, lock_file):
+        try:
+            with self._reload_lock:
+                stats = self._reload()
+            status = {'state': 'done', 'stats': stats}
+            main_logger().info("Метаданные перезагружены: %s", stats)
+        except Exception as e:
+            status = {'state': 'error', 'error': str(e)}
+            main_logger().error("Ошибка перезагрузки метаданных: %s", e)
+        finally:
+            lock_file.close()
+        with self._lock:
+            self._status = {**self._status, **status, 'finished': time.time()}
+
+    # Запуск фоновой перезагрузки, False - перезагрузка уже выполняется этим или другим процессом веб-сервиса
+    def start(self) -> bool:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            lock_file = _lock_metadata_reload(False)
+            if lock_file is None:
+                return False
+            self._status = {'state': 'running', 'started': time.time()}
+            self._thread = threading.Thread(target=self._run, args=(lock_file,), name='MetadataReload', daemon=True)
+            self._thread.start()
+            return True
+
+    # Ожидание окончания фоновой перезагрузки
+    def wait(self, timeout: float = None):
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    # Состояние последней перезагрузки
+    def status(self) -> dict:
+        with self._lock:
+            status = dict(self._status)
+        store = _METADATA_STORE
+        if store is not None:
+            status['version'] = store.version
+            status['tables'] = len(store)
+        return status
+
+    # Отслеживание изменения файла метаданных
+    # Перезагрузка запускается, когда файл изменился и не меняется в течение интервала проверки
+    def watch(self, interval: float):
+        if self._watch_thread is not None:
+            return
+
+        def file_mtime():
+            try:
+                return os.stat(_metadata_file_path()).st_mtime_ns
+            except OSError:
+                return None
+
+        def watch_file():
+            loaded_mtime = last_mtime = file_mtime()
+            while True:
+                time.sleep(interval)
+                mtime = file_mtime()
+                if mtime is not None and mtime == last_mtime and mtime != loaded_mtime:
+                    if self.start():
+                        loaded_mtime = mtime
+                last_mtime = mtime
+
+        self._watch_thread = threading.Thread(target=watch_file, name='MetadataWatch', daemon=True)
+        self._watch_thread.start()
+
+# Блокировка перезагрузки метаданных между процессами веб-сервиса
+# Возвращает открытый файл блокировки (блокировка снимается при закрытии), None - перезагрузка уже выполняется.
+# Без fcntl (Windows) перезагрузки согласуются только внутри процесса
+def _lock_metadata_reload(wait: bool):
+    lock_file = open(f'{_metadata_db_path()}.lock', 'a')
+    if fcntl is not None:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+    return lock_file
+
+# Экземпляр перезагрузчика метаданных
+_METADATA_RELOADER = None
+_METADATA_RELOADER_LOCK = threading.Lock()
+
+# Перезагрузчик метаданных, общий для веб-сервиса
+def metadata_reloader() -> MetadataReloader:
+    global _METADATA_RELOADER
+    with _METADATA_RELOADER_LOCK:
+        if _METADATA_RELOADER is None:
+            _METADATA_RELOADER = MetadataReloader()
+        return _METADATA_RELOADER
+
+# Версия метаданных
+def metadata_version() -> str:
+    return metadata_store().version
+
+# Список таблиц метаданных
+# Если задано описание задачи и ограничение количества - возвращаются наиболее подходящие таблицы
+def tables_list(query: str = '', top_k: int = 0) -> list[str]:
+    store = metadata_store()
+    result = store.tables_list()
+    if not query or top_k <= 0 or len(result) <= top_k:
+        return result
+
+    # Если подходящих таблиц не нашлось - возвращается полный список
+    relevant = store.relevant_tables(query, top_k)
+    return relevant if relevant else result
+
+# Описание таблицы метаданных по имени
+def table_description(table_name: str) -> str:
+    return metadata_store().table_description(table_name)
+
+# Готовый результат функции 'описание таблицы по имени'
+def rendered_description(table_name: str) -> str:
+    return metadata_store().rendered_description(table_name)
 
-    return result
\ No newline at end of file
+# Результат функции 'описание таблицы по имени' только с указанными разделами и полями
+def rendered_projection(table_name: str, sections: list[str]) -> str:
+    return metadata_store().rendered_projection(table_name, sections)
\ No newline at end of file
@@ -0,0 +1,849 @@
+import json
+import re
+
+# Ключевые слова языка запросов 1С: английский вариант -> русский
+_KEYWORDS = {
+    'ВЫБРАТЬ': 'ВЫБРАТЬ', 'SELECT': 'ВЫБРАТЬ',
+    'РАЗРЕШЕННЫЕ': 'РАЗРЕШЕННЫЕ', 'ALLOWED': 'РАЗРЕШЕННЫЕ',
+    'РАЗЛИЧНЫЕ': 'РАЗЛИЧНЫЕ', 'DISTINCT': 'РАЗЛИЧНЫЕ',
+    'ПЕРВЫЕ': 'ПЕРВЫЕ', 'TOP': 'ПЕРВЫЕ',
+    'КАК': 'КАК', 'AS': 'КАК',
+    'ИЗ': 'ИЗ', 'FROM': 'ИЗ',
+    'ГДЕ': 'ГДЕ', 'WHERE': 'ГДЕ',
+    'И': 'И', 'AND': 'И',
+    'ИЛИ': 'ИЛИ', 'OR': 'ИЛИ',
+    'НЕ': 'НЕ', 'NOT': 'НЕ',
+    'В': 'В', 'IN': 'В',
+    'ИЕРАРХИИ': 'ИЕРАРХИИ', 'HIERARCHY': 'ИЕРАРХИИ',
+    'МЕЖДУ': 'МЕЖДУ', 'BETWEEN': 'МЕЖДУ',
+    'ПОДОБНО': 'ПОДОБНО', 'LIKE': 'ПОДОБНО',
+    'СПЕЦСИМВОЛ': 'СПЕЦСИМВОЛ', 'ESCAPE': 'СПЕЦСИМВОЛ',
+    'ЕСТЬ': 'ЕСТЬ', 'IS': 'ЕСТЬ',
+    'NULL': 'NULL',
+    'ИСТИНА': 'ИСТИНА', 'TRUE': 'ИСТИНА',
+    'ЛОЖЬ': 'ЛОЖЬ', 'FALSE': 'ЛОЖЬ',
+    'НЕОПРЕДЕЛЕНО': 'НЕОПРЕДЕЛЕНО', 'UNDEFINED': 'НЕОПРЕДЕЛЕНО',
+    'ВЫБОР': 'ВЫБОР', 'CASE': 'ВЫБОР',
+    'КОГДА': 'КОГДА', 'WHEN': 'КОГДА',
+    'ТОГДА': 'ТОГДА', 'THEN': 'ТОГДА',
+    'ИНАЧЕ': 'ИНАЧЕ', 'ELSE': 'ИНАЧЕ',
+    'КОНЕЦ': 'КОНЕЦ', 'END': 'КОНЕЦ',
+    'ЛЕВОЕ': 'ЛЕВОЕ', 'LEFT': 'ЛЕВОЕ',
+    'ПРАВОЕ': 'ПРАВОЕ', 'RIGHT': 'ПРАВОЕ',
+    'ПОЛНОЕ': 'ПОЛНОЕ', 'FULL': 'ПОЛНОЕ',
+    'ВНУТРЕННЕЕ': 'ВНУТРЕННЕЕ', 'INNER': 'ВНУТРЕННЕЕ',
+    'ВНЕШНЕЕ': 'ВНЕШНЕЕ', 'OUTER': 'ВНЕШНЕЕ',
+    'СОЕДИНЕНИЕ': 'СОЕДИНЕНИЕ', 'JOIN': 'СОЕДИНЕНИЕ',
+    'ПО': 'ПО', 'ON': 'ПО', 'BY': 'ПО',
+    'СГРУППИРОВАТЬ': 'СГРУППИРОВАТЬ', 'GROUP': 'СГРУППИРОВАТЬ',
+    'ИМЕЮЩИЕ': 'ИМЕЮЩИЕ', 'HAVING': 'ИМЕЮЩИЕ',
+    'ОБЪЕДИНИТЬ': 'ОБЪЕДИНИТЬ', 'UNION': 'ОБЪЕДИНИТЬ',
+    'ВСЕ': 'ВСЕ', 'ALL': 'ВСЕ',
+    'УПОРЯДОЧИТЬ': 'УПОРЯДОЧИТЬ', 'ORDER': 'УПОРЯДОЧИТЬ',
+    'ВОЗР': 'ВОЗР', 'ASC': 'ВОЗР',
+    'УБЫВ': 'УБЫВ', 'DESC': 'УБЫВ',
+    'ИТОГИ': 'ИТОГИ', 'TOTALS': 'ИТОГИ',
+    'ПОМЕСТИТЬ': 'ПОМЕСТИТЬ', 'INTO': 'ПОМЕСТИТЬ',
+    'УНИЧТОЖИТЬ': 'УНИЧТОЖИТЬ', 'DROP': 'УНИЧТОЖИТЬ',
+    'ДЛЯ': 'ДЛЯ', 'FOR': 'ДЛЯ',
+    'ИНДЕКСИРОВАТЬ': 'ИНДЕКСИРОВАТЬ', 'INDEX': 'ИНДЕКСИРОВАТЬ',
+    'АВТОУПОРЯДОЧИВАНИЕ': 'АВТОУПОРЯДОЧИВАНИЕ', 'AUTOORDER': 'АВТОУПОРЯДОЧИВАНИЕ',
+}
+
+# Классы объектов метаданных: английский вариант -> русский
+_METADATA_CLASSES = {
+    'СПРАВОЧНИК': 'Справочник', 'CATALOG': 'Справочник',
+    'ДОКУМЕНТ': 'Документ', 'DOCUMENT': 'Документ',
+    'ЖУРНАЛДОКУМЕНТОВ': 'ЖурналДокументов', 'DOCUMENTJOURNAL': 'ЖурналДокументов',
+    'ПЕРЕЧИСЛЕНИЕ': 'Перечисление', 'ENUM': 'Перечисление',
+    'КОНСТАНТА': 'Константа', 'CONSTANT': 'Константа',
+    'ПЛАНВИДОВХАРАКТЕРИСТИК': 'ПланВидовХарактеристик', 'CHARTOFCHARACTERISTICTYPES': 'ПланВидовХарактеристик',
+    'ПЛАНСЧЕТОВ': 'ПланСчетов', 'CHARTOFACCOUNTS': 'ПланСчетов',
+    'ПЛАНВИДОВРАСЧЕТА': 'ПланВидовРасчета', 'CHARTOFCALCULATIONTYPES': 'ПланВидовРасчета',
+    'РЕГИСТРСВЕДЕНИЙ': 'РегистрСведений', 'INFORMATIONREGISTER': 'РегистрСведений',
+    'РЕГИСТРНАКОПЛЕНИЯ': 'РегистрНакопления', 'ACCUMULATIONREGISTER': 'РегистрНакопления',
+    'РЕГИСТРБУХГАЛТЕРИИ': 'РегистрБухгалтерии', 'ACCOUNTINGREGISTER': 'РегистрБухгалтерии',
+    'РЕГИСТРРАСЧЕТА': 'РегистрРасчета', 'CALCULATIONREGISTER': 'РегистрРасчета',
+    'БИЗНЕСПРОЦЕСС': 'БизнесПроцесс', 'BUSINESSPROCESS': 'БизнесПроцесс',
+    'ЗАДАЧА': 'Задача', 'TASK': 'Задача',
+    'ПЛАНОБМЕНА': 'ПланОбмена', 'EXCHANGEPLAN': 'ПланОбмена',
+    'ПОСЛЕДОВАТЕЛЬНОСТЬ': 'Последовательность', 'SEQUENCE': 'Последовательность',
+    'ВНЕШНИЙИСТОЧНИКДАННЫХ': 'ВнешнийИсточникДанных', 'EXTERNALDATASOURCE': 'ВнешнийИсточникДанных',
+}
+
+# Максимальное количество параметров виртуальных таблиц
+_VIRTUAL_TABLE_PARAMETERS = {
+    ('РегистрНакопления', 'ОСТАТКИ'): 2,
+    ('РегистрНакопления', 'ОБОРОТЫ'): 4,
+    ('РегистрНакопления', 'ОСТАТКИИОБОРОТЫ'): 5,
+    ('РегистрСведений', 'СРЕЗПОСЛЕДНИХ'): 2,
+    ('РегистрСведений', 'СРЕЗПЕРВЫХ'): 2,
+}
+
+# Стандартные реквизиты объектов метаданных
+_STANDARD_FIELDS = {
+    'ССЫЛКА', 'REF', 'КОД', 'CODE', 'НАИМЕНОВАНИЕ', 'DESCRIPTION', 'ПОМЕТКАУДАЛЕНИЯ', 'DELETIONMARK',
+    'ПРЕДОПРЕДЕЛЕННЫЙ', 'PREDEFINED', 'ИМЯПРЕДОПРЕДЕЛЕННЫХДАННЫХ', 'PREDEFINEDDATANAME',
+    'РОДИТЕЛЬ', 'PARENT', 'ВЛАДЕЛЕЦ', 'OWNER', 'ЭТОГРУППА', 'ISFOLDER', 'ДАТА', 'DATE', 'НОМЕР', 'NUMBER',
+    'ПРОВЕДЕН', 'POSTED', 'РЕГИСТРАТОР', 'RECORDER', 'ПЕРИОД', 'PERIOD', 'НОМЕРСТРОКИ', 'LINENUMBER',
+    'АКТИВНОСТЬ', 'ACTIVE', 'ВИДДВИЖЕНИЯ', 'RECORDTYPE', 'МОМЕНТВРЕМЕНИ', 'POINTINTIME',
+    'ПРЕДСТАВЛЕНИЕ', 'PRESENTATION', 'ВЕРСИЯДАННЫХ', 'DATAVERSION', 'ПОРЯДОК', 'ORDER', 'ЗНАЧЕНИЕ', 'VALUE',
+}
+
+# Поля периодов виртуальных таблиц регистров
+_PERIOD_FIELDS = {
+    'ПЕРИОД', 'PERIOD', 'РЕГИСТРАТОР', 'RECORDER', 'МОМЕНТВРЕМЕНИ', 'POINTINTIME', 'НОМЕРСТРОКИ', 'LINENUMBER',
+    'СЕКУНДА', 'SECONDPERIOD', 'МИНУТА', 'MINUTEPERIOD', 'ЧАС', 'HOURPERIOD', 'ДЕНЬ', 'DAYPERIOD',
+    'НЕДЕЛЯ', 'WEEKPERIOD', 'ДЕКАДА', 'TENDAYSPERIOD', 'МЕСЯЦ', 'MONTHPERIOD', 'КВАРТАЛ', 'QUARTERPERIOD',
+    'ПОЛУГОДИЕ', 'HALFYEARPERIOD', 'ГОД', 'YEARPERIOD',
+}
+
+# Таблица изменений, доступная у объектов, входящих в планы обмена
+_CHANGES_TABLES = {'ИЗМЕНЕНИЯ', 'CHANGES'}
+
+# Лексемы: комментарий, пробелы, строка, число, параметр, слово, операторы
+_TOKEN_PATTERN = re.compile(r'''
+    (?P<comment>//[^\n]*)
+  | (?P<space>\s+)
+  | (?P<string>"(?:[^"]|"")*")
+  | (?P<unclosed>")
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<param>&[^\W\d]\w*)
+  | (?P<word>[^\W\d]\w*)
+  | (?P<op><=|>=|<>|[-+*/=<>(),.;])
+''', re.VERBOSE)
+
+# Ошибка в тексте запроса
+class QueryError(Exception):
+    def __init__(self, message: str, line: int, column: int):
+        super().__init__(f'{{({line}, {column})}}: {message}')
+
+# Конструкция, не поддерживаемая локальным разбором: запрос проверяется веб-сервисом
+class UnsupportedQueryError(QueryError):
+    pass
+
+# Лексема запроса
+class _Token():
+    __slots__ = ('kind', 'value', 'text', 'line', 'column')
+
+    def __init__(self, kind: str, value: str, text: str, line: int, column: int):
+        self.kind = kind # Вид: keyword, word, number, string, param, op, error, end
+        self.value = value # Значение: ключевое слово на русском, слово в верхнем регистре, ...
+        self.text = text # Исходный текст
+        self.line = line
+        self.column = column
+
+# Разбиение текста запроса на лексемы
+# При неизвестном символе разбор останавливается лексемой вида error
+def _tokenize(query: str) -> list[_Token]:
+    tokens = []
+    line, line_start, position = 1, 0, 0
+    while position < len(query):
+        match = _TOKEN_PATTERN.match(query, position)
+        column = position - line_start + 1
+        if match is None:
+            tokens.append(_Token('error', f'Неизвестный символ "{query[position]}"', query[position], line, column))
+            return tokens
+
+        kind, text = match.lastgroup, match.group()
+        if kind == 'unclosed':
+            tokens.append(_Token('error', 'Незакрытая строковая константа', text, line, column))
+            return tokens
+        if kind == 'word':
+            value = text.upper().replace('Ё', 'Е')
+            if value in _KEYWORDS:
+                tokens.append(_Token('keyword', _KEYWORDS[value], text, line, column))
+            else:
+                tokens.append(_Token('word', value, text, line, column))
+        elif kind not in ('comment', 'space'):
+            tokens.append(_Token(kind, text, text, line, column))
+
+        # Учет переводов строк для позиций лексем
+        newlines = text.count('\n')
+        if newlines:
+            line += newlines
+            line_start = match.start() + text.rindex('\n') + 1
+        position = match.end()
+
+    tokens.append(_Token('end', '', '', line, position - line_start + 1))
+    return tokens
+
+# Таблица источника запроса
+class _TableInfo():
+    def __init__(self, name: str, fields: set = None, prefixes: tuple = ()):
+        self.name = name # Имя таблицы для сообщений
+        self.fields = fields # Поля таблицы в верхнем регистре, None - состав полей неизвестен
+        self.prefixes = prefixes # Начала имен полей виртуальных таблиц (ресурсы)
+
+    # Наличие поля в таблице
+    def has_field(self, field: str) -> bool:
+        if self.fields is None or field in self.fields:
+            return True
+        return any(field.startswith(prefix) for prefix in self.prefixes)
+
+# Область видимости запроса: псевдонимы источников и ссылки на поля
+class _Scope():
+    def __init__(self, parent: '_Scope'):
+        self.parent = parent
+        self.aliases: dict[str, _TableInfo] = {}
+        self.references: list[list[_Token]] = []
+
+    # Источник по псевдониму с учетом внешних запросов
+    def find(self, alias: str) -> _TableInfo:
+        scope = self
+        while scope is not None:
+            if alias in scope.aliases:
+                return scope.aliases[alias]
+            scope = scope.parent
+        return None
+
+# Разбор и проверка запроса
+class _QueryParser():
+    def __init__(self, tokens: list[_Token], store):
+        self._tokens = tokens
+        self._position = 0
+        self._store = store # Хранилище метаданных, None - без проверки таблиц и полей
+        self._descriptions: dict[str, dict] = {} # Разобранные описания таблиц
+        self._temp_tables: set[str] = set() # Временные таблицы пакета
+        self._scope: _Scope = None
+        self._errors: list[QueryError] = [] # Ошибки таблиц и полей в порядке обнаружения
+
+    ###########################################################################
+    # Работа с лексемами
+
+    # Текущая лексема
+    @property
+    def _token(self) -> _Token:
+        return self._tokens[self._position]
+
+    # Следующая лексема
+    def _peek(self, offset: int = 1) -> _Token:
+        return self._tokens[min(self._position + offset, len(self._tokens) - 1)]
+
+    # Переход к следующей лексеме
+    def _next(self) -> _Token:
+        token = self._token
+        if token.kind == 'error':
+            raise QueryError(token.value, token.line, token.column)
+        if token.kind != 'end':
+            self._position += 1
+        return token
+
+    # Текущая лексема - ключевое слово из списка
+    def _is_keyword(self, *keywords: str) -> bool:
+        return self._token.kind == 'keyword' and self._token.value in keywords
+
+    # Текущая лексема - оператор из списка
+    def _is_op(self, *ops: str) -> bool:
+        return self._token.kind == 'op' and self._token.value in ops
+
+    # Текущая лексема - слово из списка (контекстные ключевые слова)
+    def _is_word(self, *words: str) -> bool:
+        return self._token.kind == 'word' and self._token.value in words
+
+    # Пропуск ключевого слова, если оно есть
+    def _accept_keyword(self, *keywords: str) -> bool:
+        if self._is_keyword(*keywords):
+            self._next()
+            return True
+        return False
+
+    # Пропуск оператора, если он есть
+    def _accept_op(self, op: str) -> bool:
+        if self._is_op(op):
+            self._next()
+            return True
+        return False
+
+    # Ошибка в текущей лексеме
+    # Разбор поддерживает не всю грамматику языка запросов, поэтому синтаксическая ошибка
+    # означает только, что конструкция не распознана
+    def _error(self, message: str = None) -> QueryError:
+        token = self._token
+        if token.kind == 'error':
+            return QueryError(token.value, token.line, token.column)
+        if message is None:
+            if token.kind == 'end':
+                message = 'Неожиданный конец текста запроса'
+            else:
+                message = f'Синтаксическая ошибка "{token.text}"'
+        return UnsupportedQueryError(message, token.line, token.column)
+
+    # Обязательное ключевое слово
+    def _expect_keyword(self, keyword: str):
+        if not self._accept_keyword(keyword):
+            raise self._error(f'Ожидается "{keyword}"' if self._token.kind != 'error' else None)
+
+    # Обязательный оператор
+    def _expect_op(self, op: str):
+        if not self._accept_op(op):
+            raise self._error(f'Ожидается "{op}"' if self._token.kind != 'error' else None)
+
+    # Обязательное имя (псевдоним, временная таблица)
+    def _expect_name(self) -> _Token:
+        if self._token.kind != 'word':
+            raise self._error()
+        return self._next()
+
+    ###########################################################################
+    # Пакет запросов
+
+    # Проверка пакета запросов
+    def parse(self):
+        # Запрос должен начинаться с ВЫБРАТЬ или УНИЧТОЖИТЬ
+        if not self._is_keyword('ВЫБРАТЬ', 'УНИЧТОЖИТЬ'):
+            raise QueryError('Ожидается выражение "ВЫБРАТЬ"', 1, 1)
+
+        self._check_brackets()
+
+        while True:
+            if self._accept_keyword('УНИЧТОЖИТЬ'):
+                self._expect_name()
+            else:
+                self._query(None)
+
+            if self._accept_op(';'):
+                if self._token.kind == 'end':
+                    break
+                continue
+            if self._token.kind != 'end':
+                raise self._error()
+            break
+
+        if self._errors:
+            raise self._errors[0]
+
+    # Проверка парности скобок
+    def _check_brackets(self):
+        opened = []
+        for token in self._tokens:
+            if token.kind == 'error':
+                break
+            if token.kind == 'op' and token.value == '(':
+                opened.append(token)
+            elif token.kind == 'op' and token.value == ')':
+                if not opened:
+                    raise QueryError('Лишняя закрывающая скобка', token.line, token.column)
+                opened.pop()
+        if opened:
+            raise QueryError('Не закрыта скобка', opened[-1].line, opened[-1].column)
+
+    # Запрос с объединениями, упорядочиванием и итогами
+    def _query(self, parent: _Scope):
+        first = self._select(parent)
+        while self._accept_keyword('ОБЪЕДИНИТЬ'):
+            self._accept_keyword('ВСЕ')
+            if not self._is_keyword('ВЫБРАТЬ'):
+                raise self._error('Ожидается выражение "ВЫБРАТЬ"')
+            self._select(parent)
+
+        # Завершающие предложения запроса ссылаются на источники первого запроса объединения
+        scope = _Scope(parent)
+        scope.aliases = first.aliases
+        outer_scope, self._scope = self._scope, scope
+        while True:
+            if self._accept_keyword('УПОРЯДОЧИТЬ'):
+                self._expect_keyword('ПО')
+                self._order_list()
+            elif self._accept_keyword('АВТОУПОРЯДОЧИВАНИЕ'):
+                pass
+            elif self._accept_keyword('ИТОГИ'):
+                self._totals()
+            elif self._accept_keyword('ДЛЯ'):
+                if not self._is_word('ИЗМЕНЕНИЯ', 'UPDATE'):
+                    raise self._error()
+                self._next()
+                if self._token.kind == 'word' and not self._is_op(';'):
+                    self._table_name()
+                    while self._accept_op(','):
+                        self._table_name()
+            elif self._accept_keyword('ИНДЕКСИРОВАТЬ'):
+                self._expect_keyword('ПО')
+                self._expression_list()
+            else:
+                break
+
+        self._check_references(scope)
+        self._scope = outer_scope
+
+    # Запрос ВЫБРАТЬ
+    def _select(self, parent: _Scope) -> _Scope:
+        self._expect_keyword('ВЫБРАТЬ')
+        scope = _Scope(parent)
+        outer_scope, self._scope = self._scope, scope
+
+        # Модификаторы выборки
+        while True:
+            if self._accept_keyword('РАЗРЕШЕННЫЕ', 'РАЗЛИЧНЫЕ'):
+                continue
+            if self._accept_keyword('ПЕРВЫЕ'):
+                if self._token.kind != 'number':
+                    raise self._error()
+                self._next()
+                continue
+            break
+
+        # Список полей
+        self._select_item()
+        while self._accept_op(','):
+            self._select_item()
+
+        # Временная таблица
+        if self._accept_keyword('ПОМЕСТИТЬ'):
+            self._temp_tables.add(self._expect_name().value)
+
+        # Источники
+        if self._accept_keyword('ИЗ'):
+            self._source()
+            while self._accept_op(','):
+                self._source()
+
+        if self._accept_keyword('ГДЕ'):
+            self._expression()
+
+        if self._accept_keyword('СГРУППИРОВАТЬ'):
+            self._expect_keyword('ПО')
+            if self._is_word('ГРУППИРУЮЩИМ', 'GROUPING'):
+                self._next()
+                if not self._is_word('НАБОРАМ', 'SETS'):
+                    raise self._error()
+                self._next()
+                self._expect_op('(')
+                self._expression_list()
+                self._expect_op(')')
+            else:
+                self._expression_list()
+
+        if self._accept_keyword('ИМЕЮЩИЕ'):
+            self._expression()
+
+        # Проверка ссылок на поля после разбора всех источников
+        self._check_references(scope)
+        self._scope = outer_scope
+        return scope
+
+    # Поле списка выборки
+    def _select_item(self):
+        if self._accept_op('*'):
+            return
+        self._expression()
+        if self._accept_keyword('КАК'):
+            self._expect_name()
+        elif self._token.kind == 'word':
+            self._next()
+
+    # Список упорядочивания
+    def _order_list(self):
+        while True:
+            self._expression()
+            self._accept_keyword('ВОЗР', 'УБЫВ')
+            self._accept_keyword('ИЕРАРХИИ')
+            if not self._accept_op(','):
+                break
+
+    # Итоги
+    def _totals(self):
+        # Агрегатные выражения итогов
+        if not self._is_keyword('ПО'):
+            self._select_item()
+            while self._accept_op(','):
+                self._select_item()
+        self._expect_keyword('ПО')
+
+        # Группировки итогов
+        while True:
+            if self._is_word('ОБЩИЕ', 'OVERALL'):
+                self._next()
+            else:
+                self._expression()
+                if self._is_word('ТОЛЬКО', 'ONLY'):
+                    self._next()
+                if self._is_word('ИЕРАРХИЯ', 'HIERARCHY') or self._is_keyword('ИЕРАРХИИ'):
+                    self._next()
+                if self._is_word('ПЕРИОДАМИ', 'PERIODS'):
+                    self._next()
+                    self._expect_op('(')
+                    self._expression_list()
+                    self._expect_op(')')
+                if self._accept_keyword('КАК'):
+                    self._expect_name()
+            if not self._accept_op(','):
+                break
+
+    ###########################################################################
+    # Источники
+
+    # Источник с соединениями
+    def _source(self):
+        self._table_reference()
+        while self._is_keyword('ЛЕВОЕ', 'ПРАВОЕ', 'ПОЛНОЕ', 'ВНУТРЕННЕЕ', 'СОЕДИНЕНИЕ'):
+            self._accept_keyword('ЛЕВОЕ', 'ПРАВОЕ', 'ПОЛНОЕ', 'ВНУТРЕННЕЕ')
+            self._accept_keyword('ВНЕШНЕЕ')
+            self._expect_keyword('СОЕДИНЕНИЕ')
+            self._table_reference()
+            self._expect_keyword('ПО')
+            self._expression()
+
+    # Таблица, виртуальная таблица или вложенный запрос с псевдонимом
+    def _table_reference(self):
+        if self._accept_op('('):
+            # Вложенный запрос
+            if self._is_keyword('ВЫБРАТЬ'):
+                self._query(self._scope)
+                self._expect_op(')')
+                self._alias(_TableInfo('(вложенный запрос)'))
+            # Соединения в скобках
+            else:
+                self._source()
+                self._expect_op(')')
+            return
+
+        token = self._token
+        parts = self._table_name()
+        table = self._resolve_table(parts)
+
+        # Параметры виртуальной таблицы
+        if self._accept_op('('):
+            count = 0
+            while True:
+                count += 1
+                if not self._is_op(',', ')'):
+                    self._expression()
+                if not self._accept_op(','):
+                    break
+            self._expect_op(')')
+            self._check_parameters(parts, table, count, token)
+
+        self._alias(table)
+
+    # Имя таблицы через точку
+    def _table_name(self) -> list[_Token]:
+        if self._token.kind != 'word':
+            raise self._error()
+        parts = [self._next()]
+        while self._accept_op('.'):
+            if self._token.kind not in ('word', 'keyword'):
+                raise self._error()
+            parts.append(self._next())
+        return parts
+
+    # Псевдоним источника
+    def _alias(self, table: _TableInfo):
+        if self._accept_keyword('КАК'):
+            alias = self._expect_name()
+        elif self._token.kind == 'word':
+            alias = self._next()
+        else:
+            # Без псевдонима к таблице обращаются по последней части имени
+            alias = None
+        if alias is not None:
+            self._scope.aliases[alias.value] = table
+
+    ###########################################################################
+    # Выражения
+
+    # Список выражений
+    def _expression_list(self):
+        self._expression()
+        while self._accept_op(','):
+            self._expression()
+
+    # Выражение: ИЛИ
+    def _expression(self):
+        self._and_expression()
+        while self._accept_keyword('ИЛИ'):
+            self._and_expression()
+
+    # Выражение: И
+    def _and_expression(self):
+        self._not_expression()
+        while self._accept_keyword('И'):
+            self._not_expression()
+
+    # Выражение: НЕ
+    def _not_expression(self):
+        if self._accept_keyword('НЕ'):
+            self._not_expression()
+        else:
+            self._comparison()
+
+    # Сравнение и проверки значений
+    def _comparison(self):
+        self._additive()
+
+        if self._is_op('=', '<>', '<', '>', '<=', '>='):
+            self._next()
+            self._additive()
+            return
+
+        if self._accept_keyword('ЕСТЬ'):
+            self._accept_keyword('НЕ')
+            self._expect_keyword('NULL')
+            return
+
+        if self._is_word('ССЫЛКА', 'REFS'):
+            self._next()
+            self._table_name()
+            return
+
+        negative = self._accept_keyword('НЕ')
+        if self._accept_keyword('В'):
+            self._accept_keyword('ИЕРАРХИИ')
+            self._expect_op('(')
+            if self._is_keyword('ВЫБРАТЬ'):
+                self._query(self._scope)
+            else:
+                self._expression_list()
+            self._expect_op(')')
+        elif self._accept_keyword('МЕЖДУ'):
+            self._additive()
+            self._expect_keyword('И')
+            self._additive()
+        elif self._accept_keyword('ПОДОБНО'):
+            self._additive()
+            if self._accept_keyword('СПЕЦСИМВОЛ'):
+                self._additive()
+        elif negative:
+            raise self._error()
+
+    # Сложение и вычитание
+    def _additive(self):
+        self._multiplicative()
+        while self._is_op('+', '-'):
+            self._next()
+            self._multiplicative()
+
+    # Умножение и деление
+    def _multiplicative(self):
+        self._unary()
+        while self._is_op('*', '/'):
+            self._next()
+            self._unary()
+
+    # Унарный минус
+    def _unary(self):
+        if self._is_op('-', '+'):
+            self._next()
+        self._primary()
+
+    # Первичное выражение
+    def _primary(self):
+        token = self._token
+
+        if token.kind in ('number', 'string', 'param'):
+            self._next()
+            return
+
+        if self._accept_keyword('NULL', 'ИСТИНА', 'ЛОЖЬ', 'НЕОПРЕДЕЛЕНО'):
+            return
+
+        if self._accept_keyword('ВЫБОР'):
+            self._case()
+            return
+
+        # Выражение или список значений в скобках, вложенный запрос
+        if self._accept_op('('):
+            if self._is_keyword('ВЫБРАТЬ'):
+                self._query(self._scope)
+            else:
+                self._expression_list()
+            self._expect_op(')')
+            self._fields()
+            return
+
+        if token.kind == 'word':
+            # Вызов функции
+            if self._peek().kind == 'op' and self._peek().value == '(':
+                self._function()
+                self._fields()
+            else:
+                self._path()
+            return
+
+        raise self._error()
+
+    # Обращение к полям результата выражения: ВЫРАЗИТЬ(... КАК Справочник.Товары).Владелец.Наименование
+    def _fields(self):
+        while self._accept_op('.'):
+            if self._token.kind not in ('word', 'keyword'):
+                raise self._error()
+            self._next()
+
+    # Выражение ВЫБОР
+    def _case(self):
+        if not self._is_keyword('КОГДА'):
+            self._expression()
+        if not self._is_keyword('КОГДА'):
+            raise self._error('Ожидается "КОГДА"')
+        while self._accept_keyword('КОГДА'):
+            self._expression()
+            self._expect_keyword('ТОГДА')
+            self._expression()
+        if self._accept_keyword('ИНАЧЕ'):
+            self._expression()
+        self._expect_keyword('КОНЕЦ')
+
+    # Вызов функции
+    def _function(self):
+        name = self._next()
+        self._expect_op('(')
+        if self._accept_op(')'):
+            return
+
+        # Агрегатные функции: КОЛИЧЕСТВО(*), КОЛИЧЕСТВО(РАЗЛИЧНЫЕ ...)
+        self._accept_keyword('РАЗЛИЧНЫЕ')
+        if self._accept_op('*'):
+            self._expect_op(')')
+            return
+
+        self._expression()
+        # Приведение типа: ВЫРАЗИТЬ(Выражение КАК Тип)
+        if name.value in ('ВЫРАЗИТЬ', 'CAST'):
+            self._expect_keyword('КАК')
+            self._table_name()
+            if self._accept_op('('):
+                self._expression_list()
+                self._expect_op(')')
+        while self._accept_op(','):
+            self._expression()
+        self._expect_op(')')
+
+    # Путь к полю через точку
+    def _path(self):
+        parts = [self._next()]
+        while self._accept_op('.'):
+            # Все поля таблицы
+            if self._accept_op('*'):
+                break
+            # Вложенная таблица: Т.ТабличнаяЧасть.(Поле1, Поле2)
+            if self._accept_op('('):
+                self._expression_list()
+                self._expect_op(')')
+                break
+            if self._token.kind not in ('word', 'keyword'):
+                raise self._error()
+            parts.append(self._next())
+        self._scope.references.append(parts)
+
+    ###########################################################################
+    # Проверка таблиц и полей по метаданным
+
+    # Описание объекта метаданных по имени
+    def _description(self, name: str) -> dict:
+        if name not in self._descriptions:
+            try:
+                self._descriptions[name] = json.loads(self._store.table_description(name))
+            except ValueError:
+                self._descriptions[name] = {}
+        return self._descriptions[name]
+
+    # Добавление ошибки таблиц и полей
+    def _add_error(self, message: str, token: _Token):
+        self._errors.append(QueryError(message, token.line, token.column))
+
+    # Источник по имени таблицы
+    def _resolve_table(self, parts: list[_Token]) -> _TableInfo:
+        full_name = '.'.join(part.text for part in parts)
+
+        # Временная таблица
+        if len(parts) == 1:
+            if parts[0].value not in self._temp_tables:
+                self._add_error(f'Таблица не найдена "{full_name}"', parts[0])
+            return _TableInfo(full_name)
+
+        metadata_class = _METADATA_CLASSES.get(parts[0].value)
+        if metadata_class is None:
+            self._add_error(f'Таблица не найдена "{full_name}"', parts[0])
+            return _TableInfo(full_name)
+
+        # Без метаданных или при отсутствии в них объектов класса проверка невозможна
+        if self._store is None or metadata_class == 'ВнешнийИсточникДанных':
+            return _TableInfo(full_name)
+        if metadata_class.upper() not in self._store.classes():
+            return _TableInfo(full_name)
+
+        name = self._store.resolve_name(f'{metadata_class}.{parts[1].text}')
+        if not name or len(parts) > 3:
+            self._add_error(f'Таблица не найдена "{full_name}"', parts[0])
+            return _TableInfo(full_name)
+
+        description = self._description(name)
+        if len(parts) == 2:
+            return _TableInfo(full_name, self._object_fields(description))
+
+        # Табличная часть, виртуальная таблица или таблица изменений
+        table_part = parts[2].value
+        if table_part in _CHANGES_TABLES:
+            return _TableInfo(full_name)
+        for section in description.get('ТабличныеЧасти', []):
+            if str(section.get('Имя', '')).upper() == table_part:
+                fields = {'ССЫЛКА', 'REF', 'НОМЕРСТРОКИ', 'LINENUMBER'}
+                fields.update(self._names(section.get('Реквизиты', [])))
+                return _TableInfo(full_name, fields)
+        virtual_tables = description.get('ВиртуальныеТаблицы')
+        if virtual_tables is None:
+            return _TableInfo(full_name)
+        if table_part in (str(virtual_table).upper() for virtual_table in virtual_tables):
+            return self._virtual_table(full_name, description)
+
+        self._add_error(f'Таблица не найдена "{full_name}"', parts[0])
+        return _TableInfo(full_name)
+
+    # Имена элементов списка в верхнем регистре
+    def _names(self, items: list) -> set[str]:
+        return {str(item.get('Имя', '')).upper() for item in items if isinstance(item, dict)}
+
+    # Поля объекта метаданных, None - состав полей неизвестен
+    def _object_fields(self, description: dict) -> set[str]:
+        if not description.get('Реквизиты'):
+            return None
+        fields = set(_STANDARD_FIELDS)
+        for key in ('Реквизиты', 'Измерения', 'Ресурсы', 'ТабличныеЧасти'):
+            fields.update(self._names(description.get(key, [])))
+        return fields
+
+    # Поля виртуальной таблицы регистра: измерения, реквизиты, периоды и поля ресурсов
+    def _virtual_table(self, full_name: str, description: dict) -> _TableInfo:
+        fields = set(_PERIOD_FIELDS) | {'ПРЕДСТАВЛЕНИЕ', 'PRESENTATION'}
+        for key in ('Измерения', 'Реквизиты', 'Ресурсы'):
+            fields.update(self._names(description.get(key, [])))
+        prefixes = tuple(self._names(description.get('Ресурсы', [])))
+        return _TableInfo(full_name, fields, prefixes)
+
+    # Проверка количества параметров таблицы
+    def _check_parameters(self, parts: list[_Token], table: _TableInfo, count: int, token: _Token):
+        if len(parts) < 3:
+            # Параметры есть только у виртуальных таблиц
+            if len(parts) == 2 and parts[0].value in _METADATA_CLASSES and table.fields is not None:
+                self._add_error(f'Таблица не может иметь параметров "{table.name}"', token)
+            return
+
+        metadata_class = _METADATA_CLASSES.get(parts[0].value)
+        maximum = _VIRTUAL_TABLE_PARAMETERS.get((metadata_class, parts[2].value))
+        if maximum is not None and count > maximum:
+            self._add_error(f'Слишком много параметров виртуальной таблицы "{table.name}"', token)
+
+    # Проверка ссылок на поля источников с псевдонимами
+    def _check_references(self, scope: _Scope):
+        for parts in scope.references:
+            if len(parts) < 2:
+                continue
+            table = scope.find(parts[0].value)
+            if table is None:
+                continue
+            if not table.has_field(parts[1].value):
+                self._add_error(f'Поле не найдено "{parts[0].text}.{parts[1].text}"', parts[0])
+
+# Проверка текста запроса
+# Возвращает пустую строку, если ошибок не найдено, иначе описание первой ошибки
+def check_query_text(query: str, store=None) -> str:
+    parser = _QueryParser(_tokenize(query), store)
+    try:
+        parser.parse()
+    except UnsupportedQueryError:
+        # Ошибки таблиц, найденные до нераспознанной конструкции, достоверны, остальное проверяет веб-сервис
+        if parser._errors:
+            return str(parser._errors[0])
+    except QueryError as e:
+        return str(e)
+    return ''
\ No newline at end of file
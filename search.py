@@ -0,0 +1,90 @@
+from collections import Counter
+from typing import Iterable
+
+import math
+import re
+
+# Слова, не влияющие на релевантность
+_STOP_WORDS = {
+    'а', 'без', 'в', 'во', 'все', 'всех', 'для', 'до', 'его', 'ее', 'за', 'и', 'из', 'или', 'их',
+    'к', 'как', 'ко', 'ли', 'на', 'над', 'не', 'но', 'о', 'об', 'от', 'по', 'под', 'при', 'про',
+    'с', 'со', 'то', 'у', 'что', 'это'
+}
+
+# Окончания, отбрасываемые упрощенным стеммингом (от длинных к коротким)
+_ENDINGS = sorted([
+    'иями', 'ями', 'ами', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ией', 'иям', 'иях', 'ием',
+    'ах', 'ях', 'ам', 'ям', 'ом', 'ем', 'ой', 'ей', 'ий', 'ый', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие',
+    'ов', 'ев', 'ию', 'ью', 'ия', 'ья', 'ую', 'юю',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'й', 'ь'
+], key=len, reverse=True)
+
+# Минимальная длина основы слова после отбрасывания окончания
+_MIN_STEM_LENGTH = 3
+
+# Слова текста, в т.ч. части идентификаторов 1С вида ТоварыНаСкладах
+_WORD_PATTERN = re.compile(r'[А-ЯЁA-Z]?[а-яёa-z]+|[А-ЯЁA-Z]+(?![а-яёa-z])|\d+')
+
+# Основа слова
+def stem(word: str) -> str:
+    word = word.lower().replace('ё', 'е')
+    for ending in _ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= _MIN_STEM_LENGTH:
+            return word[:-len(ending)]
+    return word
+
+# Список основ слов текста
+def tokenize(text: str) -> list[str]:
+    result = []
+    for word in _WORD_PATTERN.findall(text):
+        word = word.lower()
+        if word not in _STOP_WORDS:
+            result.append(stem(word))
+    return result
+
+# Инвертированный индекс с ранжированием BM25
+class SearchIndex():
+    def __init__(self, documents: Iterable[tuple[str, str]], k1: float = 1.5, b: float = 0.75):
+        self._k1 = k1
+        self._b = b
+
+        self._names: list[str] = [] # Имена документов
+        self._lengths: list[int] = [] # Количество слов в документах
+        self._postings: dict[str, list[tuple[int, int]]] = {} # Основа -> (номер документа, частота)
+
+        # Построение индекса
+        for name, text in documents:
+            number = len(self._names)
+            tokens = tokenize(text)
+            self._names.append(name)
+            self._lengths.append(len(tokens))
+            for token, frequency in Counter(tokens).items():
+                self._postings.setdefault(token, []).append((number, frequency))
+
+        self._average_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+
+    # Количество документов для функции len()
+    def __len__(self) -> int:
+        return len(self._names)
+
+    # Обратная частота документов для основы
+    def _idf(self, token: str) -> float:
+        count = len(self._postings.get(token, ()))
+        return math.log(1 + (len(self._names) - count + 0.5) / (count + 0.5))
+
+    # Имена наиболее релевантных документов в порядке убывания релевантности
+    def search(self, query: str, top_k: int) -> list[str]:
+        scores: dict[int, float] = {}
+        for token in set(tokenize(query)):
+            postings = self._postings.get(token)
+            if not postings:
+                continue
+
+            idf = self._idf(token)
+            for number, frequency in postings:
+                length_norm = 1 - self._b + self._b * self._lengths[number] / self._average_length
+                score = idf * frequency * (self._k1 + 1) / (frequency + self._k1 * length_norm)
+                scores[number] = scores.get(number, 0.0) + score
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [self._names[number] for number, _ in ranked[:top_k]]
\ No newline at end of file
@@ -0,0 +1,209 @@
+from typing import Iterable, Iterator, Union
+import hashlib
+import mmap
+import os
+import struct
+import zlib
+
+# Снимок метаданных - неизменяемый файл, который процессы веб-сервиса отображают в память (mmap)
+# и читают без копирования: страницы файла общие для всех процессов через кэш операционной системы.
+# Структура файла:
+# - заголовок: сигнатура, версия метаданных, количество таблиц, смещения таблиц записей, порядка и хеш-таблицы,
+#   размер хеш-таблицы;
+# - данные: имена, описания и готовые результаты функции 'описание таблицы по имени';
+# - таблица записей, упорядоченная по имени в UTF-8: смещения и длины имени, описания и результата, признаки;
+# - таблица порядка: номера записей в порядке загрузки таблиц;
+# - хеш-таблица имен (открытая адресация): номер записи + 1, 0 - пустая ячейка.
+SNAPSHOT_MAGIC = b'SQLAMDS2'
+_HEADER = struct.Struct('<8s40sIQQQI') # сигнатура, версия, количество, смещения записей, порядка и хеш-таблицы, размер
+_ENTRY = struct.Struct('<QIQIQII') # имя, описание, результат (смещение, длина), признаки
+_ORDER = struct.Struct('<I')
+_SLOT = struct.Struct('<I')
+
+# Признак записи: описание хранится сжатым
+FLAG_COMPRESSED = 1
+
+# Хеш имени таблицы для хеш-таблицы снимка
+def _name_hash(name: bytes) -> int:
+    return zlib.crc32(name)
+
+# Размер хеш-таблицы: степень двойки, заполнение не более половины
+def _hash_size(count: int) -> int:
+    size = 1
+    while size < count * 2:
+        size <<= 1
+    return size
+
+# Запись снимка метаданных по мере чтения описаний
+# Данные пишутся во временный файл, который подменяет прежний снимок только после успешного завершения;
+# версия метаданных - хеш имен и описаний в порядке добавления, как у хранилища метаданных
+class SnapshotWriter():
+    def __init__(self, path: str):
+        self.path = path
+        self._temp_path = f"{path}.{os.getpid()}.tmp"
+        self._file = open(self._temp_path, 'wb')
+        self._file.write(b'\0' * _HEADER.size)
+        self._offset = _HEADER.size
+        self._records: dict[bytes, list] = {} # Имя -> [порядковый номер, смещения и длины, признаки]
+        self._version_hash = hashlib.sha1()
+
+    # Добавление описания таблицы: текст JSON или сжатый JSON и готовый результат функции
+    # (None - результат формируется по описанию). При повторе имени остается последнее описание
+    def add(self, name: str, description: Union[str, bytes], rendered: Union[str, None]):
+        flags = 0
+        if isinstance(description, bytes):
+            flags |= FLAG_COMPRESSED
+        else:
+            description = description.encode()
+        key = name.encode()
+        previous = self._records.get(key)
+        record = [len(self._records) if previous is None else previous[0]]
+        for value in (key, description, (rendered or '').encode()):
+            self._file.write(value)
+            record.extend((self._offset, len(value)))
+            self._offset += len(value)
+        record.append(flags)
+        self._records[key] = record
+        self._version_hash.update(key)
+        self._version_hash.update(description)
+
+    # Завершение записи и подмена прежнего снимка, возвращает версию метаданных
+    def close(self) -> str:
+        version = self._version_hash.hexdigest()
+        try:
+            # Таблица записей по имени
+            names = sorted(self._records)
+            entries_offset = self._offset
+            for name in names:
+                self._file.write(_ENTRY.pack(*self._records[name][1:]))
+
+            # Таблица порядка загрузки
+            order = [0] * len(names)
+            for position, name in enumerate(names):
+                order[self._records[name][0]] = position
+            order_offset = entries_offset + _ENTRY.size * len(names)
+            for position in order:
+                self._file.write(_ORDER.pack(position))
+
+            # Хеш-таблица имен
+            hash_size = _hash_size(len(names))
+            slots = [0] * hash_size
+            for position, name in enumerate(names):
+                slot = _name_hash(name) & (hash_size - 1)
+                while slots[slot]:
+                    slot = (slot + 1) & (hash_size - 1)
+                slots[slot] = position + 1
+            hash_offset = order_offset + _ORDER.size * len(names)
+            self._file.write(struct.pack(f'<{hash_size}I', *slots))
+
+            self._file.seek(0)
+            self._file.write(_HEADER.pack(
+                SNAPSHOT_MAGIC, version.encode(), len(names), entries_offset, order_offset, hash_offset, hash_size
+            ))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            os.replace(self._temp_path, self.path)
+        except BaseException:
+            self.abort()
+            raise
+        return version
+
+    # Отмена записи: прежний снимок остается
+    def abort(self):
+        self._file.close()
+        try:
+            os.remove(self._temp_path)
+        except OSError:
+            pass
+
+# Запись снимка метаданных: имена, описания и результаты в порядке загрузки, возвращает версию метаданных
+def write_snapshot(path: str, entries: Iterable[tuple[str, Union[str, bytes], str]]) -> str:
+    writer = SnapshotWriter(path)
+    try:
+        for name, description, rendered in entries:
+            writer.add(name, description, rendered)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.close()
+
+# Снимок метаданных, отображенный в память
+class MetadataSnapshot():
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as snapshot_file:
+            stat = os.fstat(snapshot_file.fileno())
+            self.identity = (stat.st_ino, stat.st_size, stat.st_mtime_ns) # Признак подмены файла
+            try:
+                self._map = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:
+                raise ValueError(f"Некорректный снимок метаданных {path}: {e}")
+
+        if len(self._map) < _HEADER.size:
+            raise ValueError(f"Некорректный снимок метаданных {path}")
+        magic, version, count, entries_offset, order_offset, hash_offset, hash_size = _HEADER.unpack_from(self._map, 0)
+        if magic != SNAPSHOT_MAGIC or hash_offset + _SLOT.size * hash_size > len(self._map) or hash_size < count:
+            raise ValueError(f"Некорректный снимок метаданных {path}")
+        self.version = version.decode()
+        self._count = count
+        self._entries_offset = entries_offset
+        self._order_offset = order_offset
+        self._hash_offset = hash_offset
+        self._hash_mask = hash_size - 1
+        self._view = memoryview(self._map)
+
+    # Закрытие отображения файла
+    def close(self):
+        self._view.release()
+        self._map.close()
+
+    # Количество таблиц
+    def __len__(self) -> int:
+        return self._count
+
+    # Запись по номеру в таблице записей
+    def _entry(self, position: int) -> tuple:
+        return _ENTRY.unpack_from(self._map, self._entries_offset + _ENTRY.size * position)
+
+    # Имя записи в UTF-8
+    def _name(self, entry: tuple) -> bytes:
+        return self._map[entry[0]:entry[0] + entry[1]]
+
+    # Номер записи по имени таблицы (хеш-таблица), -1 при отсутствии
+    def find(self, table_name: str) -> int:
+        key = table_name.encode()
+        slot = _name_hash(key) & self._hash_mask
+        while True:
+            position = _SLOT.unpack_from(self._map, self._hash_offset + _SLOT.size * slot)[0]
+            if not position:
+                return -1
+            if self._name(self._entry(position - 1)) == key:
+                return position - 1
+            slot = (slot + 1) & self._hash_mask
+
+    # Имена таблиц в порядке загрузки
+    def names(self) -> Iterator[str]:
+        for index in range(self._count):
+            position = _ORDER.unpack_from(self._map, self._order_offset + _ORDER.size * index)[0]
+            yield self._name(self._entry(position)).decode()
+
+    # Описание таблицы: текст JSON или сжатый JSON, None при отсутствии
+    def description(self, table_name: str) -> Union[str, bytes, None]:
+        position = self.find(table_name)
+        if position < 0:
+            return None
+        entry = self._entry(position)
+        value = self._view[entry[2]:entry[2] + entry[3]]
+        if entry[6] & FLAG_COMPRESSED:
+            return bytes(value)
+        return str(value, 'utf-8')
+
+    # Готовый результат функции 'описание таблицы по имени', None при отсутствии таблицы,
+    # пустая строка - результат не записан и формируется по описанию
+    def rendered(self, table_name: str) -> Union[str, None]:
+        position = self.find(table_name)
+        if position < 0:
+            return None
+        entry = self._entry(position)
+        return str(self._view[entry[4]:entry[4] + entry[5]], 'utf-8')
\ No newline at end of file
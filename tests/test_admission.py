@@ -0,0 +1,117 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from admission import AdmissionController, AdmissionRejected
+
+# Ожидание условия в течение ограниченного времени
+def _wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+# Запрос, занимающий место обработки до установки события
+def _hold(controller: AdmissionController, release: threading.Event) -> threading.Thread:
+    def run():
+        with controller.admit():
+            release.wait()
+    thread = threading.Thread(target=run)
+    thread.start()
+    _wait_for(lambda: controller.status()['active'] == 1)
+    return thread
+
+def test_client_rate_limit():
+    controller = AdmissionController(4, 10, 5, client_rate=1, client_burst=1)
+    with controller.admit('client'):
+        pass
+    with pytest.raises(AdmissionRejected) as error:
+        with controller.admit('client'):
+            pass
+    assert error.value.status == 429
+    assert error.value.reason == 'rate_limit'
+    assert error.value.retry_after >= 1
+
+    # Частота запросов других клиентов ограничивается отдельно
+    with controller.admit('other'):
+        pass
+
+def test_queue_full():
+    controller = AdmissionController(1, 0, 5)
+    release = threading.Event()
+    holder = _hold(controller, release)
+    try:
+        with pytest.raises(AdmissionRejected) as error:
+            with controller.admit():
+                pass
+        assert error.value.status == 503
+        assert error.value.reason == 'queue_full'
+    finally:
+        release.set()
+        holder.join()
+
+def test_overload_by_expected_wait():
+    controller = AdmissionController(1, 10, 1)
+    controller._service_time = 5
+    release = threading.Event()
+    holder = _hold(controller, release)
+    try:
+        with pytest.raises(AdmissionRejected) as error:
+            with controller.admit():
+                pass
+        assert error.value.status == 503
+        assert error.value.reason == 'overload'
+        assert error.value.retry_after == 5
+    finally:
+        release.set()
+        holder.join()
+
+def test_queue_timeout():
+    controller = AdmissionController(1, 10, 0.1)
+    release = threading.Event()
+    holder = _hold(controller, release)
+    try:
+        with pytest.raises(AdmissionRejected) as error:
+            with controller.admit():
+                pass
+        assert error.value.status == 503
+        assert error.value.reason == 'queue_timeout'
+        assert controller.status()['queued'] == {'interactive': 0, 'batch': 0}
+    finally:
+        release.set()
+        holder.join()
+
+def test_interactive_lane_served_first():
+    controller = AdmissionController(1, 10, 5)
+    release = threading.Event()
+    holder = _hold(controller, release)
+    started = []
+
+    def run(lane: str):
+        with controller.admit(lane=lane):
+            started.append(lane)
+
+    # Пакетный запрос встал в очередь раньше интерактивного
+    batch = threading.Thread(target=run, args=('batch',))
+    batch.start()
+    _wait_for(lambda: controller.status()['queued']['batch'] == 1)
+    interactive = threading.Thread(target=run, args=('interactive',))
+    interactive.start()
+    _wait_for(lambda: controller.status()['queued']['interactive'] == 1)
+
+    release.set()
+    for thread in (holder, batch, interactive):
+        thread.join()
+    assert started == ['interactive', 'batch']
+
+@pytest.mark.parametrize('lane', ['urgent', None, 1])
+def test_unknown_lane_is_interactive(lane):
+    controller = AdmissionController(1, 10, 5)
+    with controller.admit(lane=lane):
+        pass
+    assert 'admission_admitted_total{lane="interactive"} 1' in controller.render()
\ No newline at end of file
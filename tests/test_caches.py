@@ -0,0 +1,112 @@
+import itertools
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import caches
+import utilities
+from caches import LRUCache, ResponseCache, SQLiteCache, TieredCache
+
+# Папка AI-ассистента для теста: лог ошибок кэша пишется в нее
+@pytest.fixture
+def main_folder(tmp_path, monkeypatch):
+    (tmp_path / 'config.ini').write_text('[MAIN]\nlog_file_name=events.log\n', encoding='utf-8')
+    monkeypatch.setattr(utilities, '_MAIN_FOLDER_PATH', str(tmp_path))
+    return tmp_path
+
+# Часы, которые при каждом обращении идут вперед на секунду
+@pytest.fixture
+def clock(monkeypatch):
+    now = {'time': 1000.0}
+    ticks = itertools.count()
+    monkeypatch.setattr(caches.time, 'time', lambda: now['time'] + next(ticks))
+    return now
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(2, 0)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert len(cache) == 2
+
+def test_lru_cache_ttl(clock):
+    cache = LRUCache(10, 100)
+    cache.put('a', 1)
+    assert cache.get('a') == 1
+    clock['time'] += 200
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+def test_sqlite_cache_evicts_least_recently_used(tmp_path, clock):
+    cache = SQLiteCache(str(tmp_path / 'cache.db'), 'test_cache', 3, 0)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, key.upper())
+    # Отметка об использовании отложена, но учитывается при вытеснении
+    assert cache.get('a') == 'A'
+    cache.put('d', 'D')
+    assert [key for key, _ in cache.items()] == ['d', 'a', 'c']
+    assert cache.get('b') is None
+
+def test_sqlite_cache_ttl(tmp_path, clock):
+    cache = SQLiteCache(str(tmp_path / 'cache.db'), 'test_cache', 10, 100)
+    cache.put('a', 'A')
+    assert cache.get('a') == 'A'
+    clock['time'] += 200
+    assert cache.get('a') is None
+    assert cache.items() == []
+
+def test_sqlite_cache_shared_between_connections(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    SQLiteCache(path, 'test_cache', 10, 0).put('a', 'A')
+    assert SQLiteCache(path, 'test_cache', 10, 0).get('a') == 'A'
+
+def test_tiered_cache_falls_back_to_memory(tmp_path, main_folder):
+    persistent = SQLiteCache(str(tmp_path / 'cache.db'), 'test_cache', 10, 0)
+    cache = TieredCache(LRUCache(10, 0), persistent)
+    cache.put('a', 'A')
+    assert cache._memory.get('a') == 'A'
+
+    # Ошибки базы данных не прерывают работу кэша
+    persistent._connection.close()
+    cache.put('b', 'B')
+    assert cache.get('b') == 'B'
+    assert cache.get('c') is None
+    assert cache.persistent_items() == []
+    cache.clear()
+    assert cache.get('a') is None
+
+def test_response_cache_exact_match():
+    cache = ResponseCache(TieredCache(LRUCache(10, 0)), 10)
+    cache.put('v1', 'Продажи  за Ёлки', 'ответ')
+    assert cache.get('v1', ' продажи за елки ') == 'ответ'
+    assert cache.get('v1', 'продажи за елки!') is None
+    # Ответы другой области не находятся
+    assert cache.get('v2', 'продажи за елки') is None
+
+def test_response_cache_similarity_threshold():
+    cache = ResponseCache(TieredCache(LRUCache(10, 0)), 10, similarity_threshold=0.8)
+    cache.put('v1', 'продажи товаров за март по складам', 'ответ')
+    assert cache.get('v1', 'продажи товаров за март по складу') == 'ответ'
+    assert cache.get('v1', 'остатки товаров на складах') is None
+    assert cache.get('v2', 'продажи товаров за март по складу') is None
+
+    # Порог выше сходства запросов - находится только точное совпадение
+    strict = ResponseCache(TieredCache(LRUCache(10, 0)), 10, similarity_threshold=0.99)
+    strict.put('v1', 'продажи товаров за март по складам', 'ответ')
+    assert strict.get('v1', 'продажи товаров за март по складу') is None
+    assert strict.get('v1', 'продажи товаров за март по складам') == 'ответ'
+
+def test_response_cache_index_restored_from_database(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    cache = ResponseCache(TieredCache(LRUCache(10, 0), SQLiteCache(path, 'response_cache', 10, 0)), 10, 0.8)
+    cache.put('v1', 'продажи товаров за март по складам', 'ответ')
+
+    restored = ResponseCache(TieredCache(LRUCache(10, 0), SQLiteCache(path, 'response_cache', 10, 0)), 10, 0.8)
+    assert restored.get('v1', 'продажи товаров за март по складу') == 'ответ'
\ No newline at end of file
@@ -0,0 +1,116 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gigachat.exceptions import ResponseError
+from gigachat.models import FunctionCall, Messages, MessagesRole
+
+import utilities
+from gigagents import _REPEATED_RESULT, EstimateTokenCounter, GigaChatHistory, GigaChatRateLimiter
+
+# Папка AI-ассистента для теста: размер контекста 100 токенов
+@pytest.fixture
+def main_folder(tmp_path, monkeypatch):
+    (tmp_path / 'config.ini').write_text(
+        '[GIGACHAT]\nmax_context_length=100\ncontext_compaction=true\n', encoding='utf-8'
+    )
+    monkeypatch.setattr(utilities, '_MAIN_FOLDER_PATH', str(tmp_path))
+    return tmp_path
+
+# Ответ GigaChat с ошибкой
+def _response_error(status: int, headers: dict = None) -> ResponseError:
+    return ResponseError('https://gigachat/chat/completions', status, b'', headers or {})
+
+# История сообщений, в которой токен - один символ
+def _history(compactors: dict = None) -> GigaChatHistory:
+    return GigaChatHistory('система', EstimateTokenCounter(1), compactors)
+
+# Размер контекста, посчитанный заново по сообщениям истории
+def _recount(history: GigaChatHistory) -> int:
+    return sum(history._message_size(message) for message in history.messages())
+
+def test_rate_limiter_reserve_and_settle():
+    limiter = GigaChatRateLimiter(0, 600, 1, 60)
+    assert limiter.acquire(500) < 0.1
+    assert limiter._tokens == pytest.approx(100, abs=1)
+
+    # Оценка заменяется фактическим расходом
+    limiter.settle(500, 200)
+    assert limiter._tokens == pytest.approx(400, abs=1)
+
+    # Запас исчерпан - следующее обращение ждет пополнения
+    limiter.settle(0, 1000)
+    assert limiter._reserve(1) > 50
+
+def test_rate_limiter_request_rate():
+    limiter = GigaChatRateLimiter(2, 0, 1, 60)
+    assert limiter._reserve(0) == 0
+    assert limiter._reserve(0) == 0
+    assert 0 < limiter._reserve(0) <= 0.5
+
+def test_rate_limiter_throttled():
+    limiter = GigaChatRateLimiter(0, 600, 1, 4)
+    limiter.acquire(300)
+
+    # Резерв неудачного обращения возвращается, обращения приостанавливаются на Retry-After
+    assert limiter.throttled(_response_error(429, {'Retry-After': '2'}), 300) == 2
+    assert limiter._tokens == pytest.approx(600, abs=1)
+    assert 1 < limiter._reserve(1) <= 2
+
+    # Без Retry-After пауза удваивается до максимальной
+    assert [limiter.throttled(_response_error(429)) for _ in range(4)] == [1, 2, 4, 4]
+    assert limiter._factor == pytest.approx(0.1)
+
+    # Успешный ответ сбрасывает паузу
+    limiter.settle(0, 0)
+    assert limiter.throttled(_response_error(429)) == 1
+
+def test_rate_limiter_other_errors():
+    limiter = GigaChatRateLimiter(0, 600, 1, 4)
+    limiter.acquire(300)
+    assert limiter.throttled(_response_error(500), 300) is None
+    assert limiter._tokens == pytest.approx(600, abs=1)
+    assert limiter._reserve(1) == 0
+
+def test_history_token_accounting(main_folder):
+    history = _history()
+    assert history.context_length() == len('система')
+
+    history.add_user_content('вопрос')
+    history.add_message(Messages(
+        role=MessagesRole.ASSISTANT,
+        content='',
+        function_call=FunctionCall(name='tables_list', arguments={'query': 'продажи'})
+    ))
+    history.add_function_content('["Документ.Продажи"]', 'tables_list')
+    history.add_assistant_content('ответ')
+    assert len(history) == 5
+    assert history.context_length() == _recount(history)
+
+def test_history_context_limit(main_folder):
+    history = _history()
+    history.add_user_content('у' * 40)
+    history.add_assistant_content('а' * 40)
+    history.add_user_content('в' * 40)
+
+    # Удаляются самые старые сообщения; второе сообщение - от пользователя
+    messages = history.messages()
+    assert [message.content for message in messages] == ['система', 'в' * 40]
+    assert history.context_length() == _recount(history) == 47
+
+def test_history_compact(main_folder):
+    history = _history({'table_description': lambda content: content[:10]})
+    history.add_user_content('задача')
+    history.add_function_content('x' * 30, 'table_description')
+    history.add_function_content('x' * 30, 'table_description')
+    history.add_function_content('y' * 30, 'tables_list')
+
+    # При переполнении результаты сжимаются, а не удаляются; более старый повтор заменяется ссылкой
+    messages = history.messages()
+    assert [message.content for message in messages] == ['система', 'задача', _REPEATED_RESULT, 'x' * 10, 'y' * 30]
+    assert history.context_length() == _recount(history)
+    assert history.context_length() <= 100
+    assert history._uncompacted_count == 0
\ No newline at end of file
@@ -0,0 +1,110 @@
+import json
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metadata
+import utilities
+from metadata import MetadataSnapshot, MetadataStore, compile_metadata_snapshot, load_metadata
+
+# Описание таблицы метаданных
+def _description(name: str, comment: str = '') -> dict:
+    return {
+        'ИмяОбъекта': name,
+        'КраткоеОписание': comment or name,
+        'Реквизиты': [{'Имя': 'Код'}, {'Имя': 'Наименование'}]
+    }
+
+# Запись файла метаданных
+def _write_metadata(folder, descriptions: list):
+    with open(folder / 'metadata.json', 'w', encoding='utf-8') as metadata_file:
+        json.dump(descriptions, metadata_file, ensure_ascii=False, indent=1)
+
+# Строки базы данных метаданных: имя -> (id, хеш)
+def _rows(folder) -> dict:
+    connection = sqlite3.connect(folder / 'metadata.db')
+    try:
+        return {name: (id, hash) for id, name, hash in connection.execute("SELECT id, Name, Hash FROM table_descriptions")}
+    finally:
+        connection.close()
+
+# Папка AI-ассистента для теста; файл метаданных читается и записывается малыми порциями
+@pytest.fixture(params=['json', 'compact'])
+def main_folder(request, tmp_path, monkeypatch):
+    (tmp_path / 'config.ini').write_text(
+        '[MAIN]\nmetadata_db_name=metadata.db\nmetadata_file_name=metadata.json\n'
+        f'metadata_storage={request.param}\n',
+        encoding='utf-8'
+    )
+    monkeypatch.setattr(utilities, '_MAIN_FOLDER_PATH', str(tmp_path))
+    monkeypatch.setattr(metadata, '_LOAD_CHUNK_SIZE', 64)
+    monkeypatch.setattr(metadata, '_LOAD_BATCH_SIZE', 2)
+    return tmp_path
+
+# Статистика изменений загрузки
+def _changes(stats: dict) -> tuple:
+    return stats['total'], stats['inserted'], stats['updated'], stats['deleted']
+
+def test_load_is_idempotent(main_folder):
+    names = [f'Справочник.Таблица{index}' for index in range(5)]
+    _write_metadata(main_folder, [_description(name) for name in names])
+    assert _changes(load_metadata()) == (5, 5, 0, 0)
+    rows = _rows(main_folder)
+
+    # Повторная загрузка того же файла ничего не меняет
+    assert _changes(load_metadata()) == (5, 0, 0, 0)
+    assert _rows(main_folder) == rows
+
+    store = MetadataStore(metadata._metadata_db_path())
+    assert store.tables_list() == names
+    assert json.loads(store.table_description(names[0])) == _description(names[0])
+
+def test_load_upserts_and_deletes(main_folder):
+    names = [f'Справочник.Таблица{index}' for index in range(5)]
+    _write_metadata(main_folder, [_description(name) for name in names])
+    load_metadata()
+    rows = _rows(main_folder)
+
+    # Изменено одно описание, удалено одно, добавлено одно
+    descriptions = [_description(name) for name in names[1:]]
+    descriptions[0] = _description(names[1], 'Измененное описание')
+    descriptions.append(_description('Документ.Новый'))
+    _write_metadata(main_folder, descriptions)
+    assert _changes(load_metadata()) == (5, 1, 1, 1)
+
+    changed = _rows(main_folder)
+    assert names[0] not in changed
+    assert changed[names[1]][0] == rows[names[1]][0]
+    assert changed[names[1]][1] != rows[names[1]][1]
+    assert all(changed[name] == rows[name] for name in names[2:])
+
+    # Повтор загрузки после изменений снова ничего не меняет
+    assert _changes(load_metadata()) == (5, 0, 0, 0)
+    assert _rows(main_folder) == changed
+
+def test_load_keeps_last_duplicate(main_folder):
+    _write_metadata(main_folder, [_description('Справочник.А', 'первое'), _description('Справочник.А', 'второе')])
+    assert _changes(load_metadata()) == (1, 1, 0, 0)
+    store = MetadataStore(metadata._metadata_db_path())
+    assert json.loads(store.table_description('Справочник.А'))['КраткоеОписание'] == 'второе'
+
+def test_snapshot_matches_database(main_folder):
+    names = [f'Справочник.Таблица{index}' for index in range(20)]
+    _write_metadata(main_folder, [_description(name) for name in names])
+    load_metadata()
+    store = MetadataStore(metadata._metadata_db_path())
+
+    snapshot = MetadataSnapshot(compile_metadata_snapshot(str(main_folder / 'metadata.snapshot')))
+    try:
+        snapshot_store = MetadataStore(snapshot=snapshot)
+        assert snapshot_store.version == store.version
+        assert snapshot_store.tables_list() == names
+        for name in names:
+            assert snapshot_store.rendered_description(name) == store.rendered_description(name)
+        assert snapshot_store.rendered_description('Справочник.Нет') == ''
+    finally:
+        snapshot.close()
\ No newline at end of file
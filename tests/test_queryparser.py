@@ -0,0 +1,140 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from queryparser import _QueryParser, _tokenize, check_query_text
+
+# Описания таблиц тестовых метаданных
+_DESCRIPTIONS = {
+    'Справочник.Номенклатура': {
+        'Реквизиты': [{'Имя': 'Артикул'}, {'Имя': 'ВидНоменклатуры'}],
+        'ТабличныеЧасти': [{'Имя': 'Штрихкоды', 'Реквизиты': [{'Имя': 'Штрихкод'}]}]
+    },
+    'Справочник.Контрагенты': {
+        'Реквизиты': [{'Имя': 'ИНН'}, {'Имя': 'ГоловнойКонтрагент'}]
+    },
+    'Документ.РеализацияТоваровУслуг': {
+        'Реквизиты': [{'Имя': 'Контрагент'}, {'Имя': 'СуммаДокумента'}],
+        'ТабличныеЧасти': [{'Имя': 'Товары', 'Реквизиты': [{'Имя': 'Номенклатура'}, {'Имя': 'Количество'}]}]
+    },
+    'РегистрНакопления.ТоварыНаСкладах': {
+        'Измерения': [{'Имя': 'Номенклатура'}, {'Имя': 'Склад'}],
+        'Ресурсы': [{'Имя': 'Количество'}],
+        'ВиртуальныеТаблицы': ['Остатки', 'Обороты', 'ОстаткиИОбороты']
+    },
+}
+
+# Хранилище метаданных с интерфейсом MetadataStore, используемым при проверке
+class _Store():
+    def __init__(self):
+        self._upper_names = {name.upper(): name for name in _DESCRIPTIONS}
+        self._classes = {name.split('.')[0].upper() for name in _DESCRIPTIONS}
+
+    def table_description(self, table_name: str) -> str:
+        return json.dumps(_DESCRIPTIONS[table_name], ensure_ascii=False)
+
+    def resolve_name(self, table_name: str) -> str:
+        return self._upper_names.get(table_name.upper(), '')
+
+    def classes(self) -> set[str]:
+        return self._classes
+
+# Корректные запросы
+_VALID_QUERIES = [
+    'ВЫБРАТЬ Т.Ссылка, Т.Наименование ИЗ Справочник.Номенклатура КАК Т',
+    'SELECT T.Ref AS Ref FROM Catalog.Номенклатура AS T WHERE T.DeletionMark = FALSE',
+    'ВЫБРАТЬ РАЗРЕШЕННЫЕ ПЕРВЫЕ 10 Т.Артикул ИЗ Справочник.Номенклатура КАК Т УПОРЯДОЧИТЬ ПО Т.Артикул УБЫВ',
+    # Приведение типа с обращением к полю результата
+    'ВЫБРАТЬ ВЫРАЗИТЬ(Т.Номенклатура КАК Справочник.Номенклатура).Наименование '
+    'ИЗ Документ.РеализацияТоваровУслуг.Товары КАК Т',
+    'ВЫБРАТЬ ВЫРАЗИТЬ(Т.Контрагент КАК Справочник.Контрагенты).ГоловнойКонтрагент.ИНН КАК ИНН '
+    'ИЗ Документ.РеализацияТоваровУслуг КАК Т',
+    'ВЫБРАТЬ ВЫРАЗИТЬ(Т.Артикул КАК СТРОКА(50)) КАК Артикул ИЗ Справочник.Номенклатура КАК Т',
+    'ВЫБРАТЬ Т.Ссылка ИЗ Справочник.Номенклатура КАК Т '
+    'ГДЕ ВЫРАЗИТЬ(Т.ВидНоменклатуры КАК Справочник.Номенклатура).Ссылка = &Вид',
+    # Поля выражений в скобках и вложенные поля
+    'ВЫБРАТЬ (Т.Контрагент).ИНН ИЗ Документ.РеализацияТоваровУслуг КАК Т',
+    'ВЫБРАТЬ Т.Контрагент.ГоловнойКонтрагент.Наименование ИЗ Документ.РеализацияТоваровУслуг КАК Т',
+    'ВЫБРАТЬ Т.Ссылка, Т.Товары.(Номенклатура, Количество) ИЗ Документ.РеализацияТоваровУслуг КАК Т',
+    'ВЫБРАТЬ Т.Ссылка.Дата ИЗ Документ.РеализацияТоваровУслуг.Товары КАК Т',
+    # Агрегатные функции, группировка, итоги
+    'ВЫБРАТЬ Т.Номенклатура, СУММА(Т.Количество) КАК Количество, КОЛИЧЕСТВО(РАЗЛИЧНЫЕ Т.Ссылка) '
+    'ИЗ Документ.РеализацияТоваровУслуг.Товары КАК Т СГРУППИРОВАТЬ ПО Т.Номенклатура '
+    'ИМЕЮЩИЕ СУММА(Т.Количество) > 0',
+    'ВЫБРАТЬ КОЛИЧЕСТВО(*) ИЗ Справочник.Контрагенты КАК Т',
+    'ВЫБРАТЬ Т.Контрагент, Т.СуммаДокумента ИЗ Документ.РеализацияТоваровУслуг КАК Т '
+    'ИТОГИ СУММА(СуммаДокумента) ПО ОБЩИЕ, Контрагент',
+    # Виртуальные таблицы
+    'ВЫБРАТЬ Остатки.Номенклатура, Остатки.КоличествоОстаток '
+    'ИЗ РегистрНакопления.ТоварыНаСкладах.Остатки(&Дата, Склад = &Склад) КАК Остатки',
+    'ВЫБРАТЬ О.Номенклатура, О.КоличествоПриход, О.Период '
+    'ИЗ РегистрНакопления.ТоварыНаСкладах.Обороты(&Начало, &Конец, Месяц, ) КАК О',
+    # Соединения, ВЫБОР, условия
+    'ВЫБРАТЬ Д.Ссылка, ВЫБОР КОГДА Д.СуммаДокумента > 1000 ТОГДА "Крупная" ИНАЧЕ "Мелкая" КОНЕЦ КАК Вид '
+    'ИЗ Документ.РеализацияТоваровУслуг КАК Д '
+    'ЛЕВОЕ СОЕДИНЕНИЕ Справочник.Контрагенты КАК К ПО Д.Контрагент = К.Ссылка '
+    'ГДЕ Д.Дата МЕЖДУ &Начало И &Конец И НЕ Д.ПометкаУдаления И К.ИНН ПОДОБНО "77%"',
+    'ВЫБРАТЬ Т.Ссылка ИЗ Справочник.Номенклатура КАК Т '
+    'ГДЕ Т.Ссылка В ИЕРАРХИИ (&Группа) И Т.ВидНоменклатуры ЕСТЬ НЕ NULL',
+    'ВЫБРАТЬ Д.Ссылка ИЗ Документ.РеализацияТоваровУслуг КАК Д '
+    'ГДЕ Д.Контрагент ССЫЛКА Справочник.Контрагенты',
+    # Вложенные запросы, объединения, временные таблицы
+    'ВЫБРАТЬ Вложенный.Ссылка ИЗ (ВЫБРАТЬ Т.Ссылка КАК Ссылка ИЗ Справочник.Номенклатура КАК Т) КАК Вложенный',
+    'ВЫБРАТЬ Т.Ссылка ИЗ Справочник.Номенклатура КАК Т ГДЕ Т.Ссылка В '
+    '(ВЫБРАТЬ Товары.Номенклатура ИЗ Документ.РеализацияТоваровУслуг.Товары КАК Товары)',
+    'ВЫБРАТЬ Т.Ссылка ИЗ Справочник.Номенклатура КАК Т ОБЪЕДИНИТЬ ВСЕ ВЫБРАТЬ К.Ссылка ИЗ Справочник.Контрагенты КАК К',
+    'ВЫБРАТЬ Т.Ссылка ПОМЕСТИТЬ ВТТовары ИЗ Справочник.Номенклатура КАК Т ИНДЕКСИРОВАТЬ ПО Ссылка;\n'
+    'ВЫБРАТЬ ВТ.Ссылка ИЗ ВТТовары КАК ВТ;\n'
+    'УНИЧТОЖИТЬ ВТТовары',
+    # Комментарии, функции даты и ключевые слова в другом регистре
+    '// Продажи за период\nвыбрать НАЧАЛОПЕРИОДА(Д.Дата, МЕСЯЦ) как Месяц, ЕСТЬNULL(Д.СуммаДокумента, 0) '
+    'из Документ.РеализацияТоваровУслуг как Д',
+    'ВЫБРАТЬ Т.Ссылка ИЗ Справочник.Номенклатура КАК Т ДЛЯ ИЗМЕНЕНИЯ',
+]
+
+# Запросы с ошибками и начало ожидаемого сообщения
+_INVALID_QUERIES = [
+    ('ИЗ Справочник.Номенклатура', 'Ожидается выражение "ВЫБРАТЬ"'),
+    ('ВЫБРАТЬ Т.Ссылка ИЗ Справочник.Номенклатура КАК Т ГДЕ (Т.Артикул = "1"', 'Не закрыта скобка'),
+    ('ВЫБРАТЬ Т.Ссылка ИЗ Справочник.Номенклатура КАК Т ГДЕ Т.Артикул = "1', 'Незакрытая строковая константа'),
+    ('ВЫБРАТЬ Т.Ссылка ИЗ Справочник.Товары КАК Т', 'Таблица не найдена "Справочник.Товары"'),
+    ('ВЫБРАТЬ Т.Цена ИЗ Справочник.Номенклатура КАК Т', 'Поле не найдено "Т.Цена"'),
+    (
+        'ВЫБРАТЬ ВЫРАЗИТЬ(Т.Номенклатура КАК Справочник.Номенклатура).Наименование '
+        'ИЗ Документ.РеализацияТоваровУслуг.Товары КАК Т ГДЕ Т.Цена > 0',
+        'Поле не найдено "Т.Цена"'
+    ),
+    (
+        'ВЫБРАТЬ О.Номенклатура ИЗ РегистрНакопления.ТоварыНаСкладах.Остатки(&Дата, , , ) КАК О',
+        'Слишком много параметров виртуальной таблицы'
+    ),
+]
+
+# Конструкции, которые предварительная проверка не распознает: ошибка не сообщается
+_UNSUPPORTED_QUERIES = [
+    'ВЫБРАТЬ Т.Ссылка ИЗ Справочник.Номенклатура КАК Т ГДЕ Т.Артикул НЕОИЗВЕСТНО 1',
+    'ВЫБРАТЬ Т.Ссылка ИЗ Справочник.Номенклатура КАК Т СГРУППИРОВАТЬ ПО КУБ(Т.Ссылка) ВСЕ',
+]
+
+@pytest.mark.parametrize('query', _VALID_QUERIES)
+def test_valid_query(query):
+    # Корректный запрос разбирается полностью, без передачи на проверку веб-сервису
+    _QueryParser(_tokenize(query), _Store()).parse()
+    _QueryParser(_tokenize(query), None).parse()
+    assert check_query_text(query, _Store()) == ''
+
+@pytest.mark.parametrize('query,message', _INVALID_QUERIES)
+def test_invalid_query(query, message):
+    assert message in check_query_text(query, _Store())
+
+@pytest.mark.parametrize('query', _UNSUPPORTED_QUERIES)
+def test_unsupported_query(query):
+    assert check_query_text(query, _Store()) == ''
+
+def test_unsupported_query_keeps_table_errors():
+    query = 'ВЫБРАТЬ Т.Ссылка ИЗ Справочник.Товары КАК Т ГДЕ Т.Артикул НЕОИЗВЕСТНО 1'
+    assert 'Таблица не найдена "Справочник.Товары"' in check_query_text(query, _Store())
\ No newline at end of file
@@ -0,0 +1,63 @@
+import os
+import sys
+import zlib
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snapshot import MetadataSnapshot, write_snapshot
+
+# Количество таблиц тестового снимка: достаточно для коллизий в хеш-таблице
+_COUNT = 300
+
+# Записи снимка: имя, описание (текст или сжатый текст), готовый результат
+def _entries() -> list[tuple]:
+    entries = []
+    for index in range(_COUNT):
+        name = f'РегистрСведений.Таблица{index}'
+        description = f'{{"ИмяОбъекта": "{name}"}}'
+        if index % 2:
+            entries.append((name, zlib.compress(description.encode()), f'{{"table_description": "{name}"}}'))
+        else:
+            entries.append((name, description, None))
+    return entries
+
+# Снимок, записанный во временную папку
+@pytest.fixture
+def snapshot(tmp_path):
+    path = str(tmp_path / 'metadata.snapshot')
+    write_snapshot(path, _entries())
+    snapshot = MetadataSnapshot(path)
+    yield snapshot
+    snapshot.close()
+
+def test_find_every_name(snapshot):
+    positions = set()
+    for name, description, rendered in _entries():
+        position = snapshot.find(name)
+        assert position >= 0
+        positions.add(position)
+        assert snapshot.description(name) == description
+        assert snapshot.rendered(name) == (rendered or '')
+    assert len(positions) == len(snapshot) == _COUNT
+
+def test_missing_name(snapshot):
+    for name in ('РегистрСведений.Таблица', 'РегистрСведений.Таблица300', 'регистрсведений.таблица1', ''):
+        assert snapshot.find(name) == -1
+        assert snapshot.description(name) is None
+        assert snapshot.rendered(name) is None
+
+def test_names_in_load_order(snapshot):
+    assert list(snapshot.names()) == [name for name, _, _ in _entries()]
+
+def test_duplicate_keeps_last_description(tmp_path):
+    path = str(tmp_path / 'metadata.snapshot')
+    version = write_snapshot(path, [('Справочник.А', '1', None), ('Справочник.Б', '2', None), ('Справочник.А', '3', None)])
+    snapshot = MetadataSnapshot(path)
+    try:
+        assert snapshot.version == version
+        assert list(snapshot.names()) == ['Справочник.А', 'Справочник.Б']
+        assert snapshot.description('Справочник.А') == '3'
+    finally:
+        snapshot.close()
\ No newline at end of file
@@ -0,0 +1,85 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utilities
+from utilities import Config, _parse_value
+
+# Запись конфигурационного файла с новым временем изменения
+def _write_config(path, text: str):
+    mtime = os.stat(path).st_mtime_ns + 1_000_000_000 if os.path.exists(path) else None
+    path.write_text(text, encoding='utf-8')
+    if mtime is not None:
+        os.utime(path, ns=(mtime, mtime))
+
+@pytest.mark.parametrize('value_str,value_type,expected', [
+    ('8000', int, 8000),
+    ('3', float, 3.0),
+    ('yes', bool, True),
+    ('Off', bool, False),
+    ('001', str, '001'),
+    ('', int, None),
+    ('', str, ''),
+    ('true', None, True),
+    ('12', None, 12),
+    ('0.5', None, 0.5),
+    ('GigaChat-Pro', None, 'GigaChat-Pro'),
+])
+def test_parse_value(value_str, value_type, expected):
+    value = _parse_value(value_str, value_type)
+    assert value == expected
+    assert type(value) is type(expected)
+
+@pytest.mark.parametrize('value_str,value_type', [('abc', int), ('1,5', float), ('maybe', bool)])
+def test_parse_invalid_value(value_str, value_type):
+    with pytest.raises(ValueError):
+        _parse_value(value_str, value_type)
+
+def test_config_typed_values(tmp_path):
+    path = tmp_path / 'config.ini'
+    _write_config(path, '[MAIN]\nport=8000\nmetadata_snapshot=yes\nadmin_token=007\ntables_list_top_k=\n')
+    config = Config(str(path))
+    assert config.get('MAIN', 'port') == 8000
+    assert config.get('MAIN', 'metadata_snapshot') is True
+    assert config.get('MAIN', 'admin_token') == '007'
+    # Пустое значение типизированного ключа равносильно его отсутствию
+    assert config.get('MAIN', 'tables_list_top_k', 30) == 30
+    assert config.get('MAIN', 'missing', 'default') == 'default'
+
+def test_config_invalid_value(tmp_path):
+    path = tmp_path / 'config.ini'
+    _write_config(path, '[MAIN]\nport=восемь тысяч\n')
+    with pytest.raises(Exception, match='MAIN/port'):
+        Config(str(path))
+
+def test_config_reload_on_change(tmp_path, monkeypatch):
+    monkeypatch.setattr(utilities, 'CONFIG_CHECK_INTERVAL', 0)
+    path = tmp_path / 'config.ini'
+    _write_config(path, '[GIGACHAT]\nmax_context_length=28000\n')
+    config = Config(str(path))
+    assert config.get('GIGACHAT', 'max_context_length') == 28000
+
+    _write_config(path, '[GIGACHAT]\nmax_context_length=16000\n')
+    assert config.get('GIGACHAT', 'max_context_length') == 16000
+
+    # Ошибочные изменения не применяются - остаются прежние значения
+    _write_config(path, '[GIGACHAT]\nmax_context_length=много\n')
+    assert config.get('GIGACHAT', 'max_context_length') == 16000
+
+def test_config_reload_when_marked_stale(tmp_path, monkeypatch):
+    monkeypatch.setattr(utilities, 'CONFIG_CHECK_INTERVAL', 3600)
+    path = tmp_path / 'config.ini'
+    _write_config(path, '[CHECK_QUERY]\nlocal_check=true\n')
+    config = Config(str(path))
+    assert config.get('CHECK_QUERY', 'local_check') is True
+
+    # Изменение файла до истечения интервала проверки не замечается
+    _write_config(path, '[CHECK_QUERY]\nlocal_check=false\n')
+    assert config.get('CHECK_QUERY', 'local_check') is True
+
+    # Пометка (например, по сигналу SIGHUP) перечитывает файл при следующем обращении
+    config.mark_stale()
+    assert config.get('CHECK_QUERY', 'local_check') is False
\ No newline at end of file
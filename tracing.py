@@ -0,0 +1,225 @@
+from contextlib import contextmanager
+from typing import Any, Iterator, Union
+import contextvars
+import json
+
+import os
+import threading
+import time
+import uuid
+
+from utilities import config_value, main_folder, main_logger
+
+# Границы интервалов гистограммы длительности этапов, сек.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Префикс имен метрик
+METRICS_PREFIX = 'sql_assistant'
+
+# Этап обработки запроса: имя, длительность и атрибуты (размеры, количество повторов, ...)
+class Span():
+    def __init__(self, name: str, attributes: dict):
+        self.name = name
+        self.attributes = attributes
+        self.offset = 0.0 # Начало этапа от начала запроса, сек.
+        self.duration = 0.0 # Длительность этапа, сек.
+        self._started = time.perf_counter()
+
+    # Установка атрибута
+    def set(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    # Увеличение числового атрибута
+    def add(self, key: str, value: Union[int, float] = 1):
+        self.attributes[key] = self.attributes.get(key, 0) + value
+
+    # Представление для экспорта
+    def as_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'offset_ms': round(self.offset * 1000, 3),
+            'duration_ms': round(self.duration * 1000, 3),
+            **self.attributes
+        }
+
+# Заглушка этапа вне трассируемого запроса: атрибуты не сохраняются
+class _NullSpan():
+    def set(self, key: str, value: Any):
+        pass
+
+    def add(self, key: str, value: Union[int, float] = 1):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+# Трасса запроса: идентификатор и этапы обработки
+# Этапы пакета сообщений завершаются в разных потоках, поэтому добавление защищено блокировкой
+class Trace():
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.started_at = time.time()
+        self.spans: list[Span] = []
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    # Добавление завершенного этапа
+    def add(self, span: Span):
+        span.offset = span._started - self._started
+        with self._lock:
+            self.spans.append(span)
+
+    # Представление для экспорта
+    def as_dict(self) -> dict:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.offset)
+        return {
+            'request_id': self.request_id,
+            'started_at': round(self.started_at, 3),
+            'spans': [span.as_dict() for span in spans]
+        }
+
+# Экранирование значения метки Prometheus
+def _label_value(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+# Метрики этапов обработки запросов в памяти процесса
+# Для каждого этапа: гистограмма длительности, количество ошибок и суммы числовых атрибутов
+class MetricsRegistry():
+    def __init__(self, buckets: tuple = DURATION_BUCKETS):
+        self._buckets = buckets
+        self._durations: dict[str, list] = {} # Этап -> [счетчики интервалов, сумма, количество]
+        self._errors: dict[str, int] = {} # Этап -> количество ошибок
+        self._values: dict[tuple[str, str], float] = {} # (этап, атрибут) -> сумма значений
+        self._lock = threading.Lock()
+
+    # Учет завершенного этапа
+    def observe(self, span: Span):
+        with self._lock:
+            duration = self._durations.get(span.name)
+            if duration is None:
+                duration = [[0] * len(self._buckets), 0.0, 0]
+                self._durations[span.name] = duration
+            for index, bound in enumerate(self._buckets):
+                if span.duration <= bound:
+                    duration[0][index] += 1
+            duration[1] += span.duration
+            duration[2] += 1
+
+            if 'error' in span.attributes:
+                self._errors[span.name] = self._errors.get(span.name, 0) + 1
+            for key, value in span.attributes.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    self._values[(span.name, key)] = self._values.get((span.name, key), 0) + value
+
+    # Метрики в текстовом формате Prometheus
+    def render(self) -> str:
+        with self._lock:
+            durations = {name: ([*counts], total, count) for name, (counts, total, count) in self._durations.items()}
+            errors = dict(self._errors)
+            values = dict(self._values)
+
+        lines = [
+            f'# HELP {METRICS_PREFIX}_span_duration_seconds Длительность этапов обработки запросов',
+            f'# TYPE {METRICS_PREFIX}_span_duration_seconds histogram'
+        ]
+        for name, (counts, total, count) in sorted(durations.items()):
+            label = f'span="{_label_value(name)}"'
+            for bound, bucket_count in zip(self._buckets, counts):
+                lines.append(f'{METRICS_PREFIX}_span_duration_seconds_bucket{{{label},le="{bound}"}} {bucket_count}')
+            lines.append(f'{METRICS_PREFIX}_span_duration_seconds_bucket{{{label},le="+Inf"}} {count}')
+            lines.append(f'{METRICS_PREFIX}_span_duration_seconds_sum{{{label}}} {total}')
+            lines.append(f'{METRICS_PREFIX}_span_duration_seconds_count{{{label}}} {count}')
+
+        lines.append(f'# HELP {METRICS_PREFIX}_span_errors_total Количество этапов, завершенных ошибкой')
+        lines.append(f'# TYPE {METRICS_PREFIX}_span_errors_total counter')
+        for name, count in sorted(errors.items()):
+            lines.append(f'{METRICS_PREFIX}_span_errors_total{{span="{_label_value(name)}"}} {count}')
+
+        lines.append(f'# HELP {METRICS_PREFIX}_span_value_total Суммы числовых атрибутов этапов (размеры, повторы, ...)')
+        lines.append(f'# TYPE {METRICS_PREFIX}_span_value_total counter')
+        for (name, key), value in sorted(values.items()):
+            lines.append(
+                f'{METRICS_PREFIX}_span_value_total{{span="{_label_value(name)}",attribute="{_label_value(key)}"}} {value}'
+            )
+        return '\n'.join(lines) + '\n'
+
+# Экземпляр реестра метрик
+_METRICS_REGISTRY = None
+_METRICS_REGISTRY_LOCK = threading.Lock()
+
+# Реестр метрик, общий для всех запросов
+def metrics_registry() -> MetricsRegistry:
+    global _METRICS_REGISTRY
+    with _METRICS_REGISTRY_LOCK:
+        if _METRICS_REGISTRY is None:
+            _METRICS_REGISTRY = MetricsRegistry()
+        return _METRICS_REGISTRY
+
+# Запись трасс в файл JSON Lines: одна строка на запрос
+class TraceWriter():
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    # Запись трассы
+    def write(self, trace: Trace):
+        file_name = config_value(None, 'TRACING', 'file_name', '')
+        if not file_name:
+            return
+        line = json.dumps(trace.as_dict(), ensure_ascii=False)
+        try:
+            with self._lock:
+                with open(os.path.join(main_folder(), file_name), 'a', encoding='utf-8') as trace_file:
+                    trace_file.write(line + '\n')
+        except OSError as e:
+            main_logger().error("Ошибка записи трассы запроса: %s", e)
+
+_TRACE_WRITER = TraceWriter()
+
+# Трасса текущего запроса
+_CURRENT_TRACE: contextvars.ContextVar = contextvars.ContextVar('trace', default=None)
+
+# Включена ли трассировка
+def tracing_enabled() -> bool:
+    return config_value(None, 'TRACING', 'enabled', True) is True
+
+# Трасса текущего запроса, None вне трассируемого запроса
+def current_trace() -> Union[Trace, None]:
+    return _CURRENT_TRACE.get()
+
+# Трассировка запроса: этапы внутри контекста собираются в одну трассу
+# Вложенный вызов продолжает трассу внешнего, по завершении трасса записывается в файл
+@contextmanager
+def trace_request(request_id: str = None) -> Iterator[Union[Trace, None]]:
+    trace = _CURRENT_TRACE.get()
+    if trace is not None or not tracing_enabled():
+        yield trace
+        return
+
+    trace = Trace(request_id or uuid.uuid4().hex)
+    token = _CURRENT_TRACE.set(trace)
+    try:
+        with span('request'):
+            yield trace
+    finally:
+        _CURRENT_TRACE.reset(token)
+        _TRACE_WRITER.write(trace)
+
+# Этап обработки текущего запроса
+# Вне трассируемого запроса возвращается заглушка без замера времени
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Union[Span, _NullSpan]]:
+    trace = _CURRENT_TRACE.get()
+    if trace is None:
+        yield _NULL_SPAN
+        return
+
+    current = Span(name, attributes)
+    try:
+        yield current
+    except BaseException as e:
+        current.set('error', type(e).__name__)
+        raise
+    finally:
+        current.duration = time.perf_counter() - current._started
+        trace.add(current)
+        metrics_registry().observe(current)
\ No newline at end of file
@@ -1,6 +1,9 @@
-from typing import Any, Union
+from typing import Any, AsyncGenerator, Union
 
 import os
+import signal
+import threading
+import time
 
 import configparser
 import logging
@@ -19,38 +22,206 @@ def main_folder() -> str:
         raise Exception('Путь к папке AI-асистента не установлен')
     return _MAIN_FOLDER_PATH
 
-# Значение из конфигурационного файла
-def config_value(path: Union[str, None], section: str, key: str, fallback: Any = None) -> Union[str, int, float, bool, None]:
-    # Чтение конфигурационного файла
-    config_path = os.path.join(main_folder(), 'config.ini') if path is None else path
-    parser = configparser.ConfigParser()
-    parser.read(config_path)
+# Типы значений конфигурационных файлов: (секция, ключ) -> тип
+# Значения ключей, не описанных в схеме, приводятся к типу по представлению
+CONFIG_SCHEMA: dict[tuple[str, str], type] = {
+    ('MAIN', 'metadata_db_name'): str,
+    ('MAIN', 'metadata_file_name'): str,
+    ('MAIN', 'log_file_name'): str,
+    ('MAIN', 'port'): int,
+    ('MAIN', 'max_workers'): int,
+    ('MAIN', 'workers'): int,
+    ('MAIN', 'metadata_snapshot'): bool,
+    ('MAIN', 'metadata_snapshot_name'): str,
+    ('MAIN', 'tables_list_top_k'): int,
+    ('MAIN', 'admin_token'): str,
+    ('MAIN', 'metadata_watch_interval'): float,
+    ('MAIN', 'metadata_storage'): str,
+    ('MAIN', 'section_index_cache_size'): int,
+    ('GIGACHAT', 'authorization_key'): str,
+    ('GIGACHAT', 'session_id'): str,
+    ('GIGACHAT', 'base_url'): str,
+    ('GIGACHAT', 'auth_url'): str,
+    ('GIGACHAT', 'model'): str,
+    ('GIGACHAT', 'max_context_length'): int,
+    ('GIGACHAT', 'chars_per_token'): float,
+    ('GIGACHAT', 'context_compaction'): bool,
+    ('GIGACHAT', 'client_pool_size'): int,
+    ('GIGACHAT', 'token_refresh_margin'): int,
+    ('GIGACHAT', 'prefetch_tables'): int,
+    ('GIGACHAT', 'requests_per_second'): float,
+    ('GIGACHAT', 'tokens_per_minute'): float,
+    ('GIGACHAT', 'rate_limit_retries'): int,
+    ('GIGACHAT', 'rate_limit_backoff'): float,
+    ('GIGACHAT', 'rate_limit_max_backoff'): float,
+    ('GIGACHAT', 'request_token_budget'): int,
+    ('CHECK_QUERY', 'url'): str,
+    ('CHECK_QUERY', 'cache_size'): int,
+    ('CHECK_QUERY', 'cache_ttl'): int,
+    ('CHECK_QUERY', 'cache_db_name'): str,
+    ('CHECK_QUERY', 'local_check'): bool,
+    ('CHECK_QUERY', 'pool_size'): int,
+    ('CHECK_QUERY', 'connect_timeout'): float,
+    ('CHECK_QUERY', 'read_timeout'): float,
+    ('CHECK_QUERY', 'retries'): int,
+    ('CHECK_QUERY', 'retry_backoff'): float,
+    ('CHECK_QUERY', 'failure_threshold'): int,
+    ('CHECK_QUERY', 'recovery_time'): float,
+    ('RESPONSE_CACHE', 'enabled'): bool,
+    ('RESPONSE_CACHE', 'cache_size'): int,
+    ('RESPONSE_CACHE', 'cache_ttl'): int,
+    ('RESPONSE_CACHE', 'cache_db_name'): str,
+    ('RESPONSE_CACHE', 'similarity_threshold'): float,
+    ('RESPONSE_CACHE', 'ngram_size'): int,
+    ('ADMISSION', 'enabled'): bool,
+    ('ADMISSION', 'queue_size'): int,
+    ('ADMISSION', 'max_queue_time'): float,
+    ('ADMISSION', 'client_rate'): float,
+    ('ADMISSION', 'client_burst'): float,
+    ('TRACING', 'enabled'): bool,
+    ('TRACING', 'file_name'): str,
+}
 
-    # Приведение представления значения к соответствующему типу
-    try:
-        value_str = parser.get(section, key, fallback=fallback)
-        if value_str is None:
-            return fallback
-        if value_str.lower() in ('true', 'yes', '1', 'on'):
+# Минимальный интервал в секундах между проверками изменения конфигурационного файла
+CONFIG_CHECK_INTERVAL = 2.0
+
+# Представления логических значений
+_TRUE_VALUES = ('true', 'yes', '1', 'on')
+_FALSE_VALUES = ('false', 'no', '0', 'off')
+
+# Приведение представления значения к типу схемы или к типу по представлению
+def _parse_value(value_str: str, value_type: type = None) -> Union[str, int, float, bool, None]:
+    if value_type is str:
+        return value_str
+    # Пустое значение типизированного ключа равносильно его отсутствию
+    if value_type is not None and not value_str:
+        return None
+    if value_type is bool:
+        if value_str.lower() in _TRUE_VALUES:
             return True
-        if value_str.lower() in ('false', 'no', '0', 'off'):
+        if value_str.lower() in _FALSE_VALUES:
             return False
-            
-        try:
-            return int(value_str)
-        except ValueError:
-            pass
-            
+        raise ValueError(f"ожидается логическое значение, получено '{value_str}'")
+    if value_type is not None:
+        return value_type(value_str)
+
+    if value_str.lower() in _TRUE_VALUES:
+        return True
+    if value_str.lower() in _FALSE_VALUES:
+        return False
+
+    try:
+        return int(value_str)
+    except ValueError:
+        pass
+
+    try:
+        return float(value_str)
+    except ValueError:
+        pass
+
+    return value_str
+
+# Конфигурационный файл, загруженный в память
+# Перечитывается при изменении файла (проверка не чаще CONFIG_CHECK_INTERVAL) или по запросу
+class Config():
+    def __init__(self, path: str):
+        self._path = path
+        self._values: dict[tuple[str, str], Any] = {} # Значения по секции и ключу
+        self._mtime: int = None # Время изменения загруженного файла
+        self._checked_at = 0.0 # Время последней проверки изменения файла
+        self._stale = False # Требуется перечитать файл при следующем обращении
+        self._lock = threading.Lock()
+        self.reload()
+
+    # Время изменения файла, None - файл отсутствует
+    def _file_mtime(self) -> Union[int, None]:
         try:
-            return float(value_str)
-        except ValueError:
-            pass
+            return os.stat(self._path).st_mtime_ns
+        except OSError:
+            return None
 
-        return value_str
+    # Чтение и проверка файла по схеме
+    def reload(self):
+        with self._lock:
+            mtime = self._file_mtime()
+            parser = configparser.ConfigParser()
+            parser.read(self._path)
+
+            values = {}
+            for section in parser.sections():
+                for key in parser.options(section):
+                    try:
+                        value = _parse_value(parser.get(section, key), CONFIG_SCHEMA.get((section, key)))
+                    except (ValueError, configparser.Error) as e:
+                        raise Exception(f"Некорректное значение параметра {section}/{key} в файле {self._path}: {e}")
+                    if value is not None:
+                        values[(section, key)] = value
+
+            self._values = values
+            self._mtime = mtime
+            self._checked_at = time.monotonic()
+            self._stale = False
+
+    # Пометка о необходимости перечитать файл
+    def mark_stale(self):
+        self._stale = True
+
+    # Перечитывание файла при его изменении
+    def _refresh(self):
+        now = time.monotonic()
+        if not self._stale and now - self._checked_at < CONFIG_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        if self._stale or self._file_mtime() != self._mtime:
+            try:
+                self.reload()
+            except Exception as e:
+                # Ошибочные изменения не применяются - работаем с прежними значениями
+                self._stale = False
+                logging.getLogger('WebAssistant').error("Ошибка перечитывания конфигурации: %s", e)
+
+    # Значение по секции и ключу
+    def get(self, section: str, key: str, fallback: Any = None) -> Union[str, int, float, bool, None]:
+        self._refresh()
+        return self._values.get((section, key.lower()), fallback)
+
+# Загруженные конфигурационные файлы по пути
+_CONFIGS: dict[str, Config] = {}
+_CONFIGS_LOCK = threading.Lock()
+
+# Конфигурационный файл по пути, загружается при первом обращении
+def _config(path: str) -> Config:
+    config = _CONFIGS.get(path)
+    if config is None:
+        with _CONFIGS_LOCK:
+            config = _CONFIGS.get(path)
+            if config is None:
+                config = Config(path)
+                _CONFIGS[path] = config
+    return config
 
-    # Возврат значения по умолчанию при отсутствии раздела или ключа
-    except (configparser.NoSectionError, configparser.NoOptionError):
-        return fallback
+# Значение из конфигурационного файла
+def config_value(path: Union[str, None], section: str, key: str, fallback: Any = None) -> Union[str, int, float, bool, None]:
+    config_path = os.path.join(main_folder(), 'config.ini') if path is None else path
+    return _config(config_path).get(section, key, fallback)
+
+# Перечитывание всех загруженных конфигурационных файлов
+def reload_config():
+    with _CONFIGS_LOCK:
+        configs = list(_CONFIGS.values())
+    for config in configs:
+        config.reload()
+
+# Перечитывание конфигурации по сигналу SIGHUP, если он поддерживается платформой
+# Обработчик только помечает файлы - они перечитываются при следующем обращении
+def install_reload_signal():
+    if not hasattr(signal, 'SIGHUP'):
+        return
+    def _on_sighup(signum, frame):
+        for config in list(_CONFIGS.values()):
+            config.mark_stale()
+    signal.signal(signal.SIGHUP, _on_sighup)
 
 # Экземпляр логгера
 _MAIN_LOGGER = None
@@ -80,4 +251,22 @@ def _create_logger():
 def main_logger() -> logging.Logger:
     if _MAIN_LOGGER is None:
         _create_logger()
-    return _MAIN_LOGGER
\ No newline at end of file
+    return _MAIN_LOGGER
+
+# Закрытие ресурсов (объектов с методом aclose) при завершении текущего цикла событий
+# asyncio.run перед закрытием цикла завершает асинхронные генераторы: возвращаемый генератор закрывает ресурсы,
+# пока их соединения привязаны к работающему циклу. Генератор нужно хранить, пока используются ресурсы
+async def aclose_on_loop_shutdown(resources: list) -> AsyncGenerator:
+    async def closer():
+        try:
+            yield
+        finally:
+            for resource in resources:
+                try:
+                    await resource.aclose()
+                except Exception as e:
+                    main_logger().debug("Ошибка закрытия ресурса %s: %s", resource, e)
+
+    generator = closer()
+    await generator.__anext__()
+    return generator
\ No newline at end of file